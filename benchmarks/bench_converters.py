@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+"""Usage:
+    bench_converters [--records=<n>] [--converters=<list>] [--output=<path>] [--compare=<path>]
+
+Replicate the fixtures in test_data into a synthetic corpus and time each
+converter over it, one record at a time. Each converter runs in its own
+process, so that peak RSS is measured for that converter alone.
+
+Options:
+    --records=<n>        Number of records each converter converts.
+                         [default: 1000]
+    --converters=<list>  Comma separated converter names, e.g.
+                         soc_sci_maps_dc,soc_sci_maps_edm. Defaults to all of
+                         them.
+    --output=<path>      Write the results to this file as JSON.
+    --compare=<path>     Results from an earlier run, e.g. on another commit,
+                         to report changes in records/sec against.
+"""
+
+import json, os, platform, resource, subprocess, sys, time
+import xml.etree.ElementTree as ElementTree
+
+from concurrent.futures import ProcessPoolExecutor
+from docopt import docopt
+from multiprocessing import get_context
+from pymarc import Record, record_to_xml_node
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'metadata_converters'))
+from bench_marc2dc_batch import PAIRS, read_fixture, suffix_identifiers
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+MARC = 'http://www.loc.gov/MARC21/slim'
+VRA = 'http://www.vraweb.org/vracore4.htm'
+
+
+def build_corpus(record_count):
+    """Copies of the fixture pairs, with identifiers made unique.
+
+    Returns:
+        list: (digital record, print record, noid) tuples.
+    """
+    fixtures = [(read_fixture(d).as_marc(), read_fixture(p).as_marc()) for d, p in PAIRS]
+    corpus = []
+    for n in range(record_count):
+        digital_marc, print_marc = fixtures[n % len(fixtures)]
+        corpus.append((
+            suffix_identifiers(Record(data=digital_marc), ('776',), n),
+            suffix_identifiers(Record(data=print_marc), ('035',), n),
+            'b2bench{:06d}'.format(n)
+        ))
+    return corpus
+
+def marcxml(record):
+    """A MARCXML collection with a single record, as the MarcXmlConverter
+    classes expect."""
+    collection = ElementTree.Element('{{{}}}collection'.format(MARC))
+    collection.append(record_to_xml_node(record, namespace=True))
+    return ElementTree.tostring(collection, encoding='unicode')
+
+def vra(record):
+    """A VRA Core work for MepaToEDM, with the title, creator, date and
+    subjects of a MARC record."""
+    def sub(parent, tag, text=None, **attrib):
+        e = ElementTree.SubElement(parent, '{{{}}}{}'.format(VRA, tag), attrib)
+        e.text = text
+        return e
+
+    root = ElementTree.Element('{{{}}}vra'.format(VRA))
+    work = sub(root, 'work', id=record['001'].value(), refid=record['001'].value())
+    sub(sub(work, 'titleSet'), 'title', record.title or '', pref='true')
+    agent = sub(sub(work, 'agentSet'), 'agent')
+    ElementTree.SubElement(agent, 'name').text = record.author or 'Unknown'
+    sub(sub(work, 'dateSet'), 'display', record.pubyear or '')
+    subjects = sub(work, 'subjectSet')
+    for f in record.get_fields('650', '651'):
+        sub(sub(subjects, 'subject'), 'term', f.format_field())
+    return root
+
+def load_script(name):
+    """Import one of the extensionless scripts in metadata_converters."""
+    from importlib.machinery import SourceFileLoader
+    from importlib.util import module_from_spec, spec_from_loader
+
+    loader = SourceFileLoader(name, os.path.join(ROOT, 'metadata_converters', name))
+    module = module_from_spec(spec_from_loader(name, loader))
+    loader.exec_module(module)
+    return module
+
+# each converter's setup function takes the corpus and returns a function to
+# convert a single record, and the inputs to call it with.
+
+def setup_marc_xml_converter(corpus):
+    from classes import MarcXmlConverter
+    def convert(xml):
+        return MarcXmlConverter(xml).get_marc_field('245', '[a-z]', '.', '.')
+    return convert, [marcxml(d) for d, _, _ in corpus]
+
+def setup_schema_dot_org(corpus):
+    from classes import MarcXmlToSchemaDotOrg
+    def convert(xml):
+        return str(MarcXmlToSchemaDotOrg(xml))
+    return convert, [marcxml(p) for _, p, _ in corpus]
+
+def setup_soc_sci_maps_dc(corpus):
+    from classes import SocSciMapsMarcXmlToDc
+    def convert(job):
+        return str(SocSciMapsMarcXmlToDc(*job))
+    return convert, corpus
+
+def setup_soc_sci_maps_edm(corpus):
+    from ssmaps_edm import build_record_triples
+    def convert(job):
+        return build_record_triples(*job, [])
+    return convert, [(d.as_marc(), p.as_marc(), noid) for d, p, noid in corpus]
+
+def setup_mvol_edm(corpus):
+    # needs the IIIF file tree and the databases named by ARK_DB and
+    # VALIDATION_DB, so it only runs on the production servers.
+    MvolToEDM = load_script('mvol_edm').MvolToEDM
+    def convert(job):
+        return MvolToEDM(*job).graph.serialize(format='turtle')
+    return convert, [
+        (noid, 'mvol-0001-{:04d}-{:04d}'.format(n // 10000, n % 10000), 1, d.title, p.title, p.pubyear)
+        for n, (d, p, noid) in enumerate(corpus)
+    ]
+
+def setup_mepa_edm(corpus):
+    from mepa_edm import MepaToEDM
+    def convert(job):
+        edm = MepaToEDM(*job)
+        edm.build_work_triples()
+        return edm.graph.serialize(format='turtle')
+    return convert, [(vra(p), noid) for _, p, noid in corpus]
+
+CONVERTERS = {
+    'marc_xml_converter': setup_marc_xml_converter,
+    'mepa_edm':           setup_mepa_edm,
+    'mvol_edm':           setup_mvol_edm,
+    'schema_dot_org':     setup_schema_dot_org,
+    'soc_sci_maps_dc':    setup_soc_sci_maps_dc,
+    'soc_sci_maps_edm':   setup_soc_sci_maps_edm
+}
+
+def percentile(values, q):
+    """Nearest rank percentile of sorted values."""
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS.
+    if sys.platform == 'darwin':
+        rss = rss / 1024
+    return rss / 1024
+
+def run(name, record_count):
+    """Time a single converter. Runs in a fresh process.
+
+    Returns:
+        dict: records/sec, p50 and p99 latency and peak RSS, or the reason
+        the converter was skipped.
+    """
+    os.chdir(os.path.join(ROOT, 'metadata_converters'))
+    corpus = build_corpus(record_count)
+    try:
+        convert, inputs = CONVERTERS[name](corpus)
+        convert(inputs[0])
+    except Exception as e:
+        return {'skipped': '{}: {}'.format(type(e).__name__, e)}
+
+    latencies = []
+    start = time.perf_counter()
+    for i in inputs:
+        t = time.perf_counter()
+        convert(i)
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'records': len(latencies),
+        'records_per_second': round(len(latencies) / elapsed, 1)
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            capture_output=True,
+            check=True,
+            cwd=ROOT,
+            text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+if __name__ == "__main__":
+    options = docopt(__doc__)
+    record_count = int(options['--records'])
+
+    if options['--converters']:
+        names = options['--converters'].split(',')
+        for name in names:
+            if name not in CONVERTERS:
+                sys.stderr.write('unknown converter {}.\n'.format(name))
+                sys.exit(1)
+    else:
+        names = sorted(CONVERTERS)
+
+    previous = {}
+    if options['--compare']:
+        with open(options['--compare']) as f:
+            previous = json.load(f)['results']
+
+    results = {}
+    for name in names:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+            result = executor.submit(run, name, record_count).result()
+        results[name] = result
+
+        if 'skipped' in result:
+            sys.stdout.write('{} skipped, {}\n'.format(name, result['skipped']))
+            continue
+        line = '{} records={} records/sec={:.1f} p50={:.3f}ms p99={:.3f}ms peak_rss={:.1f}MB'.format(
+            name,
+            result['records'],
+            result['records_per_second'],
+            result['p50_ms'],
+            result['p99_ms'],
+            result['peak_rss_mb']
+        )
+        if 'records_per_second' in previous.get(name, {}):
+            line += ' change={:+.1f}%'.format(
+                (result['records_per_second'] / previous[name]['records_per_second'] - 1) * 100
+            )
+        sys.stdout.write(line + '\n')
+
+    if options['--output']:
+        with open(options['--output'], 'w') as f:
+            json.dump({
+                'commit': git_commit(),
+                'platform': platform.platform(),
+                'python': platform.python_version(),
+                'records': record_count,
+                'results': results
+            }, f, indent=4, sort_keys=True)
+            f.write('\n')
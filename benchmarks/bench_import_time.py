@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""Usage:
+    bench_import_time [--repeat=<n>] [--update]
+
+Measure how long each console script takes to import with python -X
+importtime, and fail if any of them goes over its budget in
+import_time_budgets.json, or imports a library it shouldn't need.
+
+Options:
+    --repeat=<n>  Number of runs for each script, the fastest is
+                  reported. [default: 5]
+    --update      Write new budgets, at twice the measured times.
+"""
+
+import json, os, re, subprocess, sys
+from docopt import docopt
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+BUDGETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'import_time_budgets.json')
+
+IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def measure(module):
+    """Import a module in a fresh interpreter.
+
+    Returns:
+        tuple: cumulative import time in milliseconds for the package and the
+        module, and a list of every module that was imported.
+    """
+    p = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)],
+        capture_output=True,
+        check=True,
+        cwd=ROOT,
+        text=True
+    )
+    milliseconds = 0.0
+    imported = []
+    for line in p.stderr.splitlines():
+        m = IMPORT_TIME.match(line)
+        if not m:
+            continue
+        imported.append(m.group(4))
+        # count top level imports of the package, which include everything
+        # they import in turn.
+        if m.group(3) == ' ' and m.group(4).split('.')[0] == 'metadata_converters':
+            milliseconds += int(m.group(2)) / 1000
+    return milliseconds, imported
+
+if __name__ == "__main__":
+    options = docopt(__doc__)
+
+    with open(BUDGETS) as f:
+        budgets = json.load(f)
+
+    failures = []
+    for module, budget in sorted(budgets.items()):
+        runs = [measure(module) for _ in range(int(options['--repeat']))]
+        milliseconds = min(r[0] for r in runs)
+        imported = runs[0][1]
+
+        loaded = sorted(set(
+            l for l in budget['forbidden']
+            if any(i == l or i.startswith('{}.'.format(l)) for i in imported)
+        ))
+
+        sys.stdout.write('{} {:.1f}ms budget={:.1f}ms{}\n'.format(
+            module,
+            milliseconds,
+            budget['milliseconds'],
+            ' imports {}'.format(', '.join(loaded)) if loaded else ''
+        ))
+
+        if options['--update']:
+            budget['milliseconds'] = round(milliseconds * 2, 1)
+        elif milliseconds > budget['milliseconds'] or loaded:
+            failures.append(module)
+
+    if options['--update']:
+        with open(BUDGETS, 'w') as f:
+            json.dump(budgets, f, indent=4, sort_keys=True)
+            f.write('\n')
+    elif failures:
+        sys.stdout.write('over budget: {}\n'.format(', '.join(failures)))
+        sys.exit(1)
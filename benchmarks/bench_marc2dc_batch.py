@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""Usage:
+    bench_marc2dc_batch [--records=<n>] [--chunksize=<n>] [--workers=<list>]
+
+Replicate the social scientists map fixtures in test_data into a single
+binary MARC file, then time marc2dc's batch mode over it with different
+numbers of worker processes.
+
+Options:
+    --records=<n>     Number of digital records to convert. [default: 100000]
+    --chunksize=<n>   Records sent to a worker at a time. [default: 64]
+    --workers=<list>  Comma separated worker counts, e.g. 1,2,4. Defaults to
+                      powers of two up to the number of CPUs.
+"""
+
+import os, sys, tempfile, time
+from docopt import docopt
+from pymarc import MARCReader, Subfield
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'metadata_converters'))
+from classes import SocSciMapsMarcXmlToDc
+from marc2dc import marc_to_dc_batch
+
+TEST_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test_data')
+
+# (digital, print) record pairs in test_data.
+PAIRS = (('7641168', '3451312'), ('5999566', '7368094'), ('11435665', '7368097'))
+
+def read_fixture(identifier):
+    with open(os.path.join(TEST_DATA, '{}.mrc'.format(identifier)), 'rb') as fh:
+        return next(iter(MARCReader(fh)))
+
+def suffix_identifiers(record, tags, n):
+    """Make the identifiers in a copy of a fixture unique, so that every
+       digital record still links to its own print record."""
+    record['001'].data = '{}-{}'.format(record['001'].data, n)
+    for f in record.get_fields(*tags):
+        f.subfields = [
+            Subfield(sf.code, '{}-{}'.format(sf.value, n)) if sf.code in 'aw' and sf.value.startswith('(') else sf
+            for sf in f.subfields
+        ]
+    return record
+
+def build_corpus(path, record_count):
+    with open(path, 'wb') as f:
+        for n in range(record_count):
+            digital_id, print_id = PAIRS[n % len(PAIRS)]
+            f.write(suffix_identifiers(read_fixture(digital_id), ('776',), n).as_marc())
+            f.write(suffix_identifiers(read_fixture(print_id), ('035',), n).as_marc())
+
+if __name__ == "__main__":
+    options = docopt(__doc__)
+    record_count = int(options['--records'])
+
+    if options['--workers']:
+        worker_counts = [int(w) for w in options['--workers'].split(',')]
+    else:
+        worker_counts = [1]
+        while worker_counts[-1] * 2 <= os.cpu_count():
+            worker_counts.append(worker_counts[-1] * 2)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = os.path.join(tmp, 'corpus.mrc')
+        build_corpus(corpus, record_count)
+
+        baseline = None
+        for workers in worker_counts:
+            start = time.perf_counter()
+            converted = 0
+            for _ in marc_to_dc_batch([corpus], SocSciMapsMarcXmlToDc, {}, workers, int(options['--chunksize'])):
+                converted += 1
+            elapsed = time.perf_counter() - start
+            if baseline is None:
+                baseline = elapsed
+            sys.stdout.write('workers={} records={} seconds={:.2f} records/sec={:.0f} speedup={:.2f}\n'.format(
+                workers, converted, elapsed, converted / elapsed, baseline / elapsed))
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""Usage:
+    bench_normalize [--repeat=<n>] [--number=<n>]
+
+Time the text normalization functions over every subfield value in the
+binary MARC fixtures in test_data, against the original uncompiled
+regular expression versions.
+
+Options:
+    --repeat=<n>  Number of timing runs, the best is reported. [default: 5]
+    --number=<n>  Passes over the subfield values per run. [default: 100]
+"""
+
+import glob, os, re, sys, timeit
+from docopt import docopt
+from pymarc import MARCReader
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'metadata_converters'))
+import normalize
+
+TEST_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test_data')
+
+
+def original_remove_marc_punctuation(s):
+    s = re.sub(r'^\s*', '', s)
+    s = re.sub('[ .,:;]*$', '', s)
+    if s[0] == '[' and s[-1] == ']':
+        s = s[1:-1]
+    return s
+
+def original_process_date_string(s):
+    dates = re.findall('[0-9]{3}[0-9-]', s)
+    if len(dates) == 2:
+        return '/'.join(dates)
+    elif len(dates) == 1 and dates[0][-1] == '-':
+        return '{0}0/{0}9'.format(dates[0][:3])
+    elif len(dates) == 1:
+        return dates[0]
+    else:
+        return ''
+
+def subfield_values():
+    """Return every non-empty subfield value, and every 260/264 $c, from the
+       fixtures."""
+    values = []
+    dates = []
+    for path in sorted(glob.glob(os.path.join(TEST_DATA, '*.mrc'))):
+        with open(path, 'rb') as fh:
+            for record in MARCReader(fh):
+                for f in record.get_fields():
+                    if f.is_control_field():
+                        continue
+                    for sf in f.subfields:
+                        if sf.value.strip():
+                            values.append(sf.value)
+                    if f.tag in ('260', '264'):
+                        dates.extend(f.get_subfields('c'))
+    return values, dates
+
+def best(fn, values, repeat, number):
+    def run():
+        for v in values:
+            fn(v)
+    return min(timeit.repeat(run, repeat=repeat, number=number)) / (number * len(values))
+
+if __name__ == "__main__":
+    options = docopt(__doc__)
+    repeat = int(options['--repeat'])
+    number = int(options['--number'])
+
+    values, dates = subfield_values()
+    for new, old, inputs in (
+        (normalize.remove_marc_punctuation, original_remove_marc_punctuation, values),
+        (normalize.process_date_string,     original_process_date_string,     dates)
+    ):
+        assert [new(v) for v in inputs] == [old(v) for v in inputs]
+
+        new_time = best(new, inputs, repeat, number)
+        new.cache_clear()
+        uncached_time = best(new.__wrapped__, inputs, repeat, number)
+        old_time = best(old, inputs, repeat, number)
+
+        sys.stdout.write(
+            '{} values={} original={:.0f}ns uncached={:.0f}ns cached={:.0f}ns speedup={:.1f}x\n'.format(
+                new.__name__,
+                len(inputs),
+                old_time * 1e9,
+                uncached_time * 1e9,
+                new_time * 1e9,
+                old_time / new_time
+            )
+        )
@@ -1 +1,20 @@
-from .classes import MarcXmlConverter, MarcXmlToOpenGraph, MarcXmlToSchemaDotOrg, MarcXmlToTwitterCard, SocSciMapsMarcXmlToDc, SocSciMapsMarcXmlToEDM
+import importlib
+
+# converters are imported the first time they're used, so that each console
+# script only loads the libraries that its own converter needs.
+CONVERTERS = {
+    'MarcXmlConverter':       'classes',
+    'MarcXmlToOpenGraph':     'classes',
+    'MarcXmlToSchemaDotOrg':  'classes',
+    'MarcXmlToTwitterCard':   'classes',
+    'MarcXmlToWebMetadata':   'classes',
+    'SocSciMapsMarcXmlToDc':  'classes',
+    'SocSciMapsMarcXmlToEDM': 'ssmaps_edm'
+}
+
+__all__ = list(CONVERTERS)
+
+def __getattr__(name):
+    if name in CONVERTERS:
+        return getattr(importlib.import_module('.{}'.format(CONVERTERS[name]), __name__), name)
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
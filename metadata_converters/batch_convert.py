@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+"""Usage:
+    batch_convert (--dc|--edm) [--no_images] [--journal=<path>] [--workers=<n>] [--retries=<n>] [--backoff=<s>] <csv> <outdir>
+    batch_convert --status [--journal=<path>] <outdir>
+
+Convert a collection of social scientists maps records, listed in a two
+column CSV of digital record ids and NOIDs, to one file per record in
+outdir: <digital_record_id>.dc.xml for DC, or <noid>.ttl for EDM.
+
+Each record's status is kept in a SQLite journal. A record that fails is
+retried with exponential backoff, and if it still fails it is recorded as
+failed without stopping the rest of the run. Running the same command again
+skips every finished record, and retries the ones that failed or were
+interrupted.
+
+Options:
+    --dc              Convert to DC.
+    --edm             Convert to EDM.
+    --no_images       Leave master file data out of EDM.
+    --journal=<path>  Journal file. Defaults to <outdir>/journal.sqlite.
+    --workers=<n>     Number of records to convert at a time. [default: 4]
+    --retries=<n>     Number of times to retry a failed record. [default: 3]
+    --backoff=<s>     Seconds to wait before the first retry, doubled for
+                      each retry after that. [default: 1.0]
+    --status          Report how many records are finished, failed or
+                      still to do, and why each failure failed.
+"""
+
+import concurrent.futures, datetime, json, os, random, sqlite3, sys, threading, time
+from docopt import docopt
+
+try:
+    from .metrics import metrics
+except ImportError:
+    from metrics import metrics
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Journal:
+    """Per-record status for a batch run, in a SQLite database.
+
+    A record is marked running before each attempt, so a record that was in
+    progress when a run was killed is retried on the next run. Like
+    upload_to_marklogic's Checkpoint, a journal records the settings of the
+    run that created it, and refuses to be reused with different ones.
+    Pass settings=None to open an existing journal whatever its settings.
+    """
+
+    def __init__(self, path, settings=None):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS settings (settings TEXT NOT NULL)')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS records (
+            key TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            updated TEXT
+        )''')
+
+        row = self.conn.execute('SELECT settings FROM settings').fetchone()
+        if row is None:
+            self.conn.execute('INSERT INTO settings VALUES (?)', (json.dumps(settings, sort_keys=True),))
+        elif settings is not None and json.loads(row[0]) != settings:
+            self.conn.close()
+            raise ValueError('{} was written for a different batch.'.format(path))
+        self.conn.commit()
+
+    def add(self, keys):
+        """Add records that aren't in the journal yet."""
+        with self.lock:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO records (key, status) VALUES (?, ?)',
+                ((k, PENDING) for k in keys)
+            )
+            self.conn.commit()
+
+    def unfinished(self):
+        """Keys of records that aren't done, in the order they were added."""
+        with self.lock:
+            return [k for k, in self.conn.execute(
+                'SELECT key FROM records WHERE status != ? ORDER BY rowid', (DONE,)
+            )]
+
+    def set_status(self, key, status, error=None, attempt=False):
+        with self.lock:
+            self.conn.execute(
+                'UPDATE records SET status = ?, error = ?, updated = ?, attempts = attempts + ? WHERE key = ?',
+                (status, error, datetime.datetime.utcnow().isoformat(timespec='seconds'), int(attempt), key)
+            )
+            self.conn.commit()
+
+    def start(self, key):
+        self.set_status(key, RUNNING, attempt=True)
+
+    def done(self, key):
+        self.set_status(key, DONE)
+
+    def failed(self, key, error):
+        self.set_status(key, FAILED, error)
+
+    def counts(self):
+        with self.lock:
+            counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            for status, n in self.conn.execute('SELECT status, COUNT(*) FROM records GROUP BY status'):
+                counts[status] = n
+            return counts
+
+    def failures(self):
+        """(key, attempts, error) for each failed record."""
+        with self.lock:
+            return self.conn.execute(
+                'SELECT key, attempts, error FROM records WHERE status = ? ORDER BY rowid', (FAILED,)
+            ).fetchall()
+
+    def close(self):
+        self.conn.close()
+
+def convert_with_retries(journal, key, job, convert, retries, backoff, sleep=time.sleep):
+    """Convert one record, retrying with exponential backoff. Exceptions are
+    recorded in the journal instead of raised, so one bad record doesn't
+    stop the run.
+
+    Returns:
+        bool: True if the record was converted.
+    """
+    attempt = 0
+    while True:
+        journal.start(key)
+        try:
+            convert(job)
+        except Exception as e:
+            metrics.count('errors_total', kind=type(e).__name__)
+            if attempt >= retries:
+                journal.failed(key, '{}: {}'.format(type(e).__name__, e))
+                return False
+            metrics.count('retries_total')
+            sleep(backoff * 2 ** attempt * (1 + random.random()))
+            attempt += 1
+        else:
+            journal.done(key)
+            metrics.count('records_total')
+            return True
+
+def run(journal, jobs, convert, workers=4, retries=3, backoff=1.0, sleep=time.sleep):
+    """Convert every record in jobs that the journal doesn't have as done.
+
+    Args:
+        journal (Journal)
+        jobs (list): (key, job) tuples. convert is called with job.
+        convert (function): converts a single record, raising on failure.
+        workers (int): number of records to convert at a time.
+        retries (int): number of times to retry a failed record.
+        backoff (float): seconds before the first retry.
+
+    Returns:
+        dict: numbers of records converted, failed and skipped.
+    """
+    journal.add(k for k, _ in jobs)
+    unfinished = set(journal.unfinished())
+    todo = [(k, job) for k, job in jobs if k in unfinished]
+
+    stats = {'converted': 0, 'failed': 0, 'skipped': len(jobs) - len(todo)}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(convert_with_retries, journal, k, job, convert, retries, backoff, sleep)
+            for k, job in todo
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            if future.result():
+                stats['converted'] += 1
+            else:
+                stats['failed'] += 1
+    return stats
+
+def write_atomic(path, text):
+    """Write a file so that it's either complete or not there at all."""
+    tmp = '{}.tmp'.format(path)
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def dc_converter(ssh, outdir):
+    """Returns a function to convert one (digital_record_id, noid) to DC."""
+    try:
+        from .classes import SocSciMapsMarcXmlToDc
+        from .ssmaps_edm import get_digital_record, get_print_record
+    except ImportError:
+        from classes import SocSciMapsMarcXmlToDc
+        from ssmaps_edm import get_digital_record, get_print_record
+
+    def convert(job):
+        digital_record_id, noid = job
+        digital_record = get_digital_record(ssh, digital_record_id)
+        print_record = get_print_record(ssh, digital_record)
+        write_atomic(
+            os.path.join(outdir, '{}.dc.xml'.format(digital_record_id)),
+            str(SocSciMapsMarcXmlToDc(digital_record, print_record, noid))
+        )
+    return convert
+
+def edm_converter(ssh, outdir, no_images):
+    """Returns a function to convert one (digital_record_id, noid) to EDM."""
+    try:
+        from .ssmaps_edm import build_record_triples, get_digital_record, get_identifier, get_image_data, get_print_record, get_tiff
+    except ImportError:
+        from ssmaps_edm import build_record_triples, get_digital_record, get_identifier, get_image_data, get_print_record, get_tiff
+
+    def convert(job):
+        digital_record_id, noid = job
+        digital_record = get_digital_record(ssh, digital_record_id)
+        print_record = get_print_record(ssh, digital_record)
+        if no_images:
+            image_data = []
+        else:
+            image_data = get_image_data(get_tiff(noid), get_identifier(digital_record))
+        write_atomic(
+            os.path.join(outdir, '{}.ttl'.format(noid)),
+            build_record_triples(digital_record.as_marc(), print_record.as_marc(), noid, image_data)
+        )
+    return convert
+
+def main():
+    options = docopt(__doc__)
+    outdir = options['<outdir>']
+    journal_path = options['--journal'] or os.path.join(outdir, 'journal.sqlite')
+
+    if options['--status']:
+        if not os.path.exists(journal_path):
+            sys.stderr.write('no journal at {}.\n'.format(journal_path))
+            sys.exit(1)
+        journal = Journal(journal_path)
+        sys.stdout.write(' '.join('{}={}'.format(k, v) for k, v in sorted(journal.counts().items())) + '\n')
+        for key, attempts, error in journal.failures():
+            sys.stdout.write('{}\t{}\t{}\n'.format(key, attempts, error))
+        journal.close()
+        return
+
+    try:
+        from .ssmaps_edm import get_ssh_client, read_collection
+    except ImportError:
+        from ssmaps_edm import get_ssh_client, read_collection
+
+    os.makedirs(outdir, exist_ok=True)
+    journal = Journal(
+        journal_path,
+        {'format': 'dc' if options['--dc'] else 'edm', 'no_images': options['--no_images']}
+    )
+    ssh = get_ssh_client()
+    try:
+        if options['--dc']:
+            convert = dc_converter(ssh, outdir)
+        else:
+            convert = edm_converter(ssh, outdir, options['--no_images'])
+        jobs = [('{},{}'.format(d, n), (d, n)) for d, n in read_collection(options['<csv>'])]
+        stats = run(
+            journal,
+            jobs,
+            convert,
+            int(options['--workers']),
+            int(options['--retries']),
+            float(options['--backoff'])
+        )
+    finally:
+        ssh.close()
+        journal.close()
+
+    sys.stderr.write('converted {} records, {} failed, skipped {} finished records.\n'.format(
+        stats['converted'], stats['failed'], stats['skipped']))
+    if stats['failed']:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,27 @@
-import datetime, getpass, hashlib, jinja2, json, magic, os, \
-       pymarc, random, re, string, sys
+import collections, functools, json, os, random, re, string
 import xml.etree.ElementTree as ElementTree
 
-from rdflib import Graph, Literal, Namespace, URIRef
-from rdflib.namespace import RDF, DC, DCTERMS, XSD
-from rdflib.plugins.sparql import prepareQuery
+try:
+    from .normalize import process_date_string, remove_marc_punctuation
+except ImportError:
+    from normalize import process_date_string, remove_marc_punctuation
 
 
-ARK = Namespace('ark:/61001/')
-BF = Namespace('http://id.loc.gov/ontologies/bibframe/')
-EDM = Namespace('http://www.europeana.eu/schemas/edm/')
-ERC = Namespace('https://www.dublincore.org/groups/kernel/spec/')
-MADSRDF = Namespace('http://www.loc.gov/mads/rdf/v1#')
-MIX = Namespace('http://www.loc.gov/mix/v20/')
-OAI = Namespace('http://www.openarchives.org/OAI/2.0/')
-ORE = Namespace('http://www.openarchives.org/ore/terms/')
-PREMIS = Namespace('info:lc/xmlns/premis-v2/')
-PREMIS2 = Namespace('http://www.loc.gov/premis/rdf/v1#')
-PREMIS3 = Namespace('http://www.loc.gov/premis/rdf/v3/')
-VRA = Namespace('http://purl.org/vra/')
+# rdflib and jinja2 are slow to import, and most converters only need one of
+# them, so they're loaded the first time they're used. Names defined in
+# edm.py are available from this module as well.
+EDM_ATTRIBUTES = ('ARK', 'BF', 'EDM', 'ERC', 'MADSRDF', 'MIX', 'OAI', 'ORE',
+                  'PREMIS', 'PREMIS2', 'PREMIS3', 'VRA',
+                  'DigitalCollectionToEDM')
 
-
-def remove_marc_punctuation(s):
-    s = re.sub('^\s*', '', s)
-    s = re.sub('[ .,:;]*$', '', s)
-    if s[0] == '[' and s[-1] == ']':
-        s = s[1:-1]
-    return s
+def __getattr__(name):
+    if name in EDM_ATTRIBUTES:
+        try:
+            from . import edm
+        except ImportError:
+            import edm
+        return getattr(edm, name)
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
 
 def convert_034_coords_to_marc_rda(s):
     s = s.split(' ')
@@ -49,43 +44,39 @@ def convert_034_coords_to_marc_rda(s):
         s[3][6:8]
     )
 
-def list_is_a_subset_of_lists(l, lists_to_check):
-    for lst in lists_to_check:
-        if set(l).issubset(set(lst)):
-            return True
-    return False
-
 def remove_subsets(list_of_lists):
+    """Remove empty lists, and lists whose elements all appear in another
+    list. Longer lists come first, and when two lists have the same elements
+    the first one is kept.
+
+    Each list is converted to a frozenset once. Lists that are kept are
+    indexed by element, so a list is only compared against the kept lists
+    that contain its least common element.
+
+    Args:
+        list_of_lists (list): e.g. [['Illinois', 'Chicago'], ['Illinois']]
+
+    Returns:
+        list: e.g. [['Illinois', 'Chicago']]
+    """
     list_of_lists = sorted(list_of_lists, key=lambda l: len(l), reverse=True)
 
-    i = len(list_of_lists) - 1
-    while i >= 0:
-        if len(list_of_lists[i]) == 0:
-            del list_of_lists[i]
-        elif list_is_a_subset_of_lists(list_of_lists[i], list_of_lists[0:i]):
-            del list_of_lists[i]
-        i -= 1
-
-    return list_of_lists
-
-def process_date_string(s):
-    date_str = False
-    # find every occurrence of either four digits in a row or three
-    # digits followed by a dash.
-    dates = re.findall('[0-9]{3}[0-9-]', s)
-    # if there are two date chunks in the string, assume they are a date
-    # range. (e.g. 'yyyy-yyyy'
-    if len(dates) == 2:
-        return '/'.join(dates)
-    # if the date is three digits followed by a dash, assume it is a
-    # date range for a decade. (e.g. 'yyy0-yyy9')
-    elif len(dates) == 1 and dates[0][-1] == '-':
-        return '{0}0/{0}9'.format(dates[0][:3])
-    # otherwise assume that the four digit date is correct.
-    elif len(dates) == 1:
-        return dates[0]
-    else:
-        return ''
+    kept = []
+    kept_sets = []
+    index = {}
+    for lst in list_of_lists:
+        s = frozenset(lst)
+        if not s:
+            continue
+        candidates = min((index.get(e, ()) for e in s), key=len)
+        if any(s <= kept_sets[k] for k in candidates):
+            continue
+        for e in s:
+            index.setdefault(e, []).append(len(kept))
+        kept.append(lst)
+        kept_sets.append(s)
+
+    return kept
 
 def pairwise(iterable):
     iterable = iter(iterable)
@@ -97,6 +88,11 @@ def pairwise(iterable):
 
 class NoidManager():
     """A class to manage NOIDS for digital collections."""
+
+    # objects are assembled in a directory named like this, next to where
+    # they'll go in the pair tree. See ocfl.OcflObject.
+    staging_marker = '.partial-'
+
     def __init__(self, pair_tree_root):
         self.pair_tree_root = pair_tree_root
         self.extended_digits = '0123456789bcdfghjkmnpqrstvwxz'
@@ -106,9 +102,14 @@ class NoidManager():
     
         identifiers = []
         for root, dirs, files in os.walk(self.pair_tree_root):
-            for file in files:
-                if file in ('0=ocfl_object_1.0',):
-                    identifiers.append(root[len(self.pair_tree_root):].replace(os.sep, ''))
+            if '0=ocfl_object_1.0' in files:
+                identifiers.append(root[len(self.pair_tree_root):].replace(os.sep, ''))
+                # objects don't nest, so there's no need to walk their
+                # content.
+                dirs[:] = []
+            else:
+                # skip objects that are still being written.
+                dirs[:] = sorted(d for d in dirs if self.staging_marker not in d)
         return identifiers
 
     def generate_check_digit(self, noid):
@@ -165,66 +166,6 @@ class NoidManager():
         return noid not in self.list(path)
 
 
-class DigitalCollectionToEDM:
-    MAPS = Namespace('https://repository.lib.uchicago.edu/digital_collections/maps')
-    MAPS_AGG = MAPS['/aggregation']
-    MAPS_CHO = MAPS['']
-    MAPS_REM = MAPS['/rem']
-
-    CHISOC = Namespace('https://repository.lib.uchicago.edu/digital_collections/maps/chisoc')
-    CHISOC_AGG = CHISOC['/aggregation']
-    CHISOC_CHO = CHISOC['']
-    CHISOC_REM = CHISOC['/rem']
-
-    graph = Graph()
-    for prefix, ns in (('bf', BF), ('dc', DC), ('dcterms', DCTERMS),
-                       ('edm', EDM), ('erc', ERC), ('madsrdf', MADSRDF),
-                       ('mix', MIX), ('ore', ORE), ('premis', PREMIS),
-                       ('premis2', PREMIS2), ('premis3', PREMIS3)):
-        graph.bind(prefix, ns)
-
-    def __init__(self):
-        self.graph = Graph()
-        for prefix, ns in (('bf', BF), ('dc', DC), ('dcterms', DCTERMS),
-                           ('edm', EDM), ('erc', ERC), ('madsrdf', MADSRDF),
-                           ('mix', MIX), ('ore', ORE), ('premis', PREMIS),
-                           ('premis2', PREMIS2), ('premis3', PREMIS3)):
-            self.graph.bind(prefix, ns)
-
-        self.now = Literal(datetime.datetime.utcnow(), datatype=XSD.dateTime)
-
-    def agg_graph(self, agg, cho, rem, wbr):
-        for p, o in ((RDF.type,          ORE.Aggregation),
-                     (EDM.aggregatedCHO, cho),
-                     (EDM.dataProvider,  Literal("University of Chicago Library")),
-                     (ORE.isDescribedBy, rem),
-                     (EDM.isShownAt,     wbr),
-                     (EDM.isShownBy,     wbr),
-                     (EDM.object,        URIRef('http://example.org/')),
-                     (EDM.provider,      Literal('University of Chicago Library')),
-                     (EDM.rights,        URIRef('http://creativecommons.org/licenses/by-nc/4.0/'))):
-            self.graph.add((agg, p, o))
-   
-    def rem_graph(self, agg, rem, now):
-        # as per CB on 11/6/2020, DCTERMS:creator should be
-        # https://repository.lib.uchicago.edu/ - note https and trailing
-        # slash, while ProvidedCHOs should not include a trailing slash.
-        for p, o in ((RDF.type,         ORE.ResourceMap),
-                     (DCTERMS.modified, now),
-                     (DCTERMS.creator,  URIRef('https://repository.lib.uchicago.edu/')),
-                     (ORE.describes,    agg)):
-            self.graph.add((rem, p, o))
-
-    @classmethod
-    def triples(self):
-        """Return EDM data as a string.
-
-        Returns:
-            str
-        """
-        return self.graph.serialize(format='turtle', base='ark:/61001/').decode("utf-8")
-
-
 class MarcXmlConverter:
     """
     A class to convert MARCXML to other formats. Extend this class to make
@@ -255,6 +196,20 @@ class MarcXmlConverter:
         for element in remove:
             self.record.remove(element)
 
+    @functools.cached_property
+    def fields_by_tag(self):
+        """Control fields and data fields, indexed by tag, so that looking up
+        a field doesn't scan the whole record.
+
+        Returns:
+            dict: e.g. {'245': [Element, ...], ...}
+        """
+        fields = {}
+        for element in self.record:
+            if 'tag' in element.attrib:
+                fields.setdefault(element.attrib['tag'], []).append(element)
+        return fields
+
     def get_marc_field(self, field_tag, subfield_code, ind1, ind2):
         """Get a specific MARC field. 
 
@@ -268,12 +223,7 @@ class MarcXmlConverter:
             list: of strings, all matching MARC tags and subfields.
         """
         results = []
-        for element in self.record:
-            try:
-                if not element.attrib['tag'] == field_tag:
-                    continue
-            except KeyError:
-                continue
+        for element in self.fields_by_tag.get(field_tag, ()):
             if element.tag == '{http://www.loc.gov/MARC21/slim}controlfield':
                 results.append(element.text)
             elif element.tag == '{http://www.loc.gov/MARC21/slim}datafield':
@@ -878,43 +828,241 @@ class MarcXmlToSchemaDotOrg(MarcXmlConverter):
         )
 
 
+class MarcXmlDcExtractor(MarcXmlConverter):
+    """Get individual Dublin Core elements from MARCXML, the way MarcXmlToDc
+    would produce them, without running the whole crosswalk. Elements are
+    computed the first time they're used.
+    """
+
+    def _join_subfields(self, field_tags, subfield_codes):
+        """Join the matching subfields of each matching datafield.
+
+        Args:
+            field_tags (tuple): e.g. ('500', '538')
+            subfield_codes (str): e.g. 'ab'
+
+        Returns:
+            list: one string for each field that had matching subfields.
+        """
+        results = []
+        for field_tag in field_tags:
+            for element in self.fields_by_tag.get(field_tag, ()):
+                sf = [s.text for s in element if s.attrib.get('code') in subfield_codes]
+                if sf:
+                    results.append(' '.join(sf))
+        return results
+
+    @functools.cached_property
+    def description(self):
+        """dc:description from the 500 and 538.
+
+        Returns:
+            list
+        """
+        return sorted(self._join_subfields(('500', '538'), string.ascii_lowercase))
+
+    @functools.cached_property
+    def title(self):
+        """dc:title from the 245 $a and $b.
+
+        Returns:
+            list
+        """
+        return sorted(self._join_subfields(('245',), 'ab'))
+
+
+@functools.lru_cache(maxsize=None)
+def meta_tag_templates():
+    """Get the jinja2 environment for Open Graph and Twitter Card templates.
+    Compiled templates are cached by the environment, and their bytecode is
+    cached on disk so that new processes can skip compiling them.
+
+    Returns:
+        jinja2.Environment
+    """
+    import jinja2
+
+    return jinja2.Environment(
+        bytecode_cache=jinja2.FileSystemBytecodeCache(),
+        loader=jinja2.DictLoader({
+            'opengraph.html': '\n'.join((
+                '<meta property="og:title" content="{{ og_title }}" >',
+                '<meta property="og:type" content="{{ og_type }}" >',
+                '<meta property="og:url" content="{{ og_url }}" >',
+                '<meta property="og:image" content="{{ og_image }}" >',
+                '<meta property="og:description" content="{{ og_description }}" >',
+                '<meta property="og:site_name" content="{{ og_site_name }}" >'
+            )),
+            'twittercard.html': '\n'.join((
+                '<meta name="twitter:card" content="{{ twitter_card }}" >',
+                '<meta name="twitter:site" content="{{ twitter_site }}" >',
+                '<meta name="twitter:title" content="{{ twitter_title }}" >',
+                '<meta name="twitter:url" content="{{ twitter_url }}" >',
+                '<meta name="twitter:description" content="{{ twitter_description }}" >',
+                '<meta name="twitter:image" content="{{ twitter_image }}" >',
+                '<meta name="twitter:image:alt" content="{{ twitter_image_alt }}" >'
+            ))
+        })
+    )
+
+
+def render_opengraph(dc):
+    """Render Open Graph meta tags.
+
+    Args:
+        dc: an object with title and description lists, e.g. a
+        MarcXmlDcExtractor.
+
+    Returns:
+        str
+    """
+    return meta_tag_templates().get_template('opengraph.html').render(
+        og_description=dc.description[0],
+        og_image='image',
+        og_site_name='site_name',
+        og_title=dc.title[0],
+        og_type='website',
+        og_url='url'
+    )
+
+def render_twitter_card(dc):
+    """Render Twitter Card meta tags.
+
+    Args:
+        dc: an object with title and description lists, e.g. a
+        MarcXmlDcExtractor.
+
+    Returns:
+        str
+    """
+    return meta_tag_templates().get_template('twittercard.html').render(
+        twitter_card='card',
+        twitter_description=dc.description[0],
+        twitter_image='image',
+        twitter_image_alt='image_alt',
+        twitter_site='site',
+        twitter_title=dc.title[0],
+        twitter_url='url'
+    )
+
+
 class MarcXmlToOpenGraph(MarcXmlConverter):
     def __init__(self, marcxml):
-        self.dc = MarcToDc(marcxml)
+        self.dc = MarcXmlDcExtractor(marcxml)
     def __str__(self):
-        html = '\n'.join(('<meta property="og:title" content="{{ og_title }}" >',
-                        '<meta property="og:type" content="{{ og_type }}" >',
-                        '<meta property="og:url" content="{{ og_url }}" >',
-                        '<meta property="og:image" content="{{ og_image }}" >',
-                        '<meta property="og:description" content="{{ og_description }}" >',
-                        '<meta property="og:site_name" content="{{ og_site_name }}" >'))
-        return jinja2.Template(html).render(
-            og_description=self.dc.description[0],
-            og_image='image',
-            og_site_name='site_name',
-            og_title=self.dc.title[0],
-            og_type='website',
-            og_url='url'
-        )
+        return render_opengraph(self.dc)
 
 
 class MarcXmlToTwitterCard(MarcXmlConverter):
     def __init__(self, marcxml):
-        self.dc = MarcToDc(marcxml)
+        self.dc = MarcXmlDcExtractor(marcxml)
     def __str__(self):
-        html = '\n'.join(('<meta name="twitter:card" content="{{ twitter_card }}" >',
-                          '<meta name="twitter:site" content="{{ twitter_site }}" >',
-                          '<meta name="twitter:title" content="{{ twitter_title }}" >',
-                          '<meta name="twitter:url" content="{{ twitter_url }}" >',
-                          '<meta name="twitter:description" content="{{ twitter_description }}" >',
-                          '<meta name="twitter:image" content="{{ twitter_image }}" >',
-                          '<meta name="twitter:image:alt" content="{{ twitter_image_alt }}" >'))
-        return jinja2.Template(html).render(
-            twitter_card='card',
-            twitter_description=self.dc.description[0],
-            twitter_image='image',
-            twitter_image_alt='image_alt',
-            twitter_site='site',
-            twitter_title=self.dc.title[0],
-            twitter_url='url'
-        )
+        return render_twitter_card(self.dc)
+
+
+class MarcXmlToWebMetadata(MarcXmlToSchemaDotOrg, MarcXmlDcExtractor):
+    """Produce Schema.org JSON-LD, Open Graph and Twitter Card metadata for a
+    web page from a single parse of the MARCXML."""
+
+    def __call__(self):
+        """Return each kind of metadata as a string.
+
+        Returns:
+            dict: with 'schema_org', 'opengraph' and 'twitter_card' keys.
+        """
+        return {
+            'opengraph':    render_opengraph(self),
+            'schema_org':   json.dumps(
+                                MarcXmlToSchemaDotOrg.__call__(self),
+                                ensure_ascii=False,
+                                indent=4
+                            ),
+            'twitter_card': render_twitter_card(self)
+        }
+
+    def __str__(self):
+        """Return everything as HTML for a page's <head>.
+
+        Returns:
+            str
+        """
+        return web_metadata_html(self())
+
+
+def web_metadata_html(web_metadata):
+    return '\n'.join((
+        '<script type="application/ld+json">',
+        web_metadata['schema_org'],
+        '</script>',
+        web_metadata['opengraph'],
+        web_metadata['twitter_card']
+    ))
+
+
+class RecordCache:
+    """A bounded, least recently used cache of per-record results.
+
+    Records are keyed by their 001 and 005, so a record that changes in the
+    catalog gets a new key. The key is read from the MARCXML without parsing
+    it, so a cache hit skips parsing entirely.
+    """
+
+    CONTROL_FIELD = re.compile(
+        r'<(?:[\w.-]+:)?controlfield\s+tag=["\'](001|005)["\']\s*>([^<]*)<')
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.results = collections.OrderedDict()
+
+    def key(self, marcxml):
+        """Get a (001, 005) key for the first record in a MARCXML string.
+
+        Returns:
+            tuple, or None if the record doesn't have a 001.
+        """
+        fields = {}
+        for tag, value in self.CONTROL_FIELD.findall(marcxml):
+            fields.setdefault(tag, value.strip())
+            if len(fields) == 2:
+                break
+        if '001' not in fields:
+            return None
+        return (fields['001'], fields.get('005'))
+
+    def get(self, key):
+        try:
+            self.results.move_to_end(key)
+        except KeyError:
+            return None
+        return self.results[key]
+
+    def put(self, key, result):
+        self.results[key] = result
+        self.results.move_to_end(key)
+        while len(self.results) > self.maxsize:
+            self.results.popitem(last=False)
+
+
+def marcxml_to_web_metadata(marcxml, cache=None):
+    """Get Schema.org, Open Graph and Twitter Card metadata for a record.
+
+    Args:
+        marcxml (str): a marcxml collection with a single record.
+        cache (RecordCache): optional, results for records that have been
+        seen before.
+
+    Returns:
+        dict: with 'schema_org', 'opengraph' and 'twitter_card' keys.
+    """
+    key = None
+    if cache is not None:
+        key = cache.key(marcxml)
+        if key is not None:
+            result = cache.get(key)
+            if result is not None:
+                return result
+
+    result = MarcXmlToWebMetadata(marcxml)()
+    if key is not None:
+        cache.put(key, result)
+    return result
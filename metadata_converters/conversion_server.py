@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+"""Usage:
+    conversion_server [--host=<host>] [--port=<port>] [--workers=<n>]
+
+A local HTTP service that keeps converters loaded between requests. POST
+MARCXML (application/marcxml+xml, text/xml) or binary MARC
+(application/marc) to one of:
+
+    /dc?noid=<noid>     Dublin Core. Post a digital and a print record. Add
+                        &crosswalk=socscimaps for the social scientists
+                        maps crosswalk.
+    /edm?noid=<noid>    EDM for the social scientists maps, without image
+                        data. Post a digital and a print record.
+    /opengraph          Open Graph meta tags.
+    /schemadotorg       Schema.org JSON-LD.
+    /twittercard        Twitter Card meta tags.
+    /webmetadata        JSON-LD and both sets of meta tags, as HTML.
+
+Options:
+    --host=<host>    Address to listen on. [default: 127.0.0.1]
+    --port=<port>    Port to listen on. [default: 8080]
+    --workers=<n>    Number of converter processes, 0 for one per CPU.
+                     [default: 0]
+"""
+
+import io, sys, traceback, urllib.parse
+import xml.etree.ElementTree as ElementTree
+import xml.sax
+from concurrent.futures import ProcessPoolExecutor
+from docopt import docopt
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pymarc import MARCReader, parse_xml_to_array, record_to_xml
+
+try:
+    from .classes import MarcXmlToDc, MarcXmlToOpenGraph, MarcXmlToSchemaDotOrg, MarcXmlToTwitterCard, MarcXmlToWebMetadata, SocSciMapsMarcXmlToDc, meta_tag_templates
+    from .marc2dc import pair_records
+    from .ssmaps_edm import build_record_triples
+except ImportError:
+    from classes import MarcXmlToDc, MarcXmlToOpenGraph, MarcXmlToSchemaDotOrg, MarcXmlToTwitterCard, MarcXmlToWebMetadata, SocSciMapsMarcXmlToDc, meta_tag_templates
+    from marc2dc import pair_records
+    from ssmaps_edm import build_record_triples
+
+BINARY_MARC_TYPES = ('application/marc', 'application/octet-stream')
+
+
+def warm_up():
+    """Compile templates in each worker before the first request."""
+    for name in meta_tag_templates().list_templates():
+        meta_tag_templates().get_template(name)
+
+def is_binary_marc(content_type):
+    return content_type.split(';')[0].strip() in BINARY_MARC_TYPES
+
+def read_records(body, content_type):
+    if is_binary_marc(content_type):
+        return [r for r in MARCReader(body) if r is not None]
+    else:
+        return parse_xml_to_array(io.BytesIO(body))
+
+def get_marcxml(body, content_type):
+    """MarcXmlConverter takes a MARCXML collection as a string."""
+    if is_binary_marc(content_type):
+        return '<collection xmlns="http://www.loc.gov/MARC21/slim">{}</collection>'.format(
+            ''.join(record_to_xml(r).decode('utf-8') for r in read_records(body, content_type))
+        )
+    else:
+        return body.decode('utf-8')
+
+def get_record_pair(body, content_type):
+    pairs = pair_records(read_records(body, content_type))
+    if not pairs:
+        raise ValueError('post a digital record and the print record in its 776 $w.')
+    _, digital_record, print_record = pairs[0]
+    return digital_record, print_record
+
+def get_noid(params):
+    if not params.get('noid'):
+        raise ValueError('a noid parameter is required.')
+    return params['noid']
+
+def convert_dc(params, body, content_type):
+    digital_record, print_record = get_record_pair(body, content_type)
+    if params.get('crosswalk') == 'socscimaps':
+        converter = SocSciMapsMarcXmlToDc
+    else:
+        converter = MarcXmlToDc
+    return 'application/xml', str(converter(digital_record, print_record, get_noid(params)))
+
+def convert_edm(params, body, content_type):
+    digital_record, print_record = get_record_pair(body, content_type)
+    return 'text/turtle', build_record_triples(
+        digital_record.as_marc(), print_record.as_marc(), get_noid(params), [])
+
+def marcxml_converter(converter, response_type):
+    def convert(params, body, content_type):
+        return response_type, str(converter(get_marcxml(body, content_type)))
+    return convert
+
+# the function for each path takes the query string parameters, the
+# request body and its Content-Type, and returns the Content-Type and body
+# of the response.
+CONVERSIONS = {
+    '/dc':           convert_dc,
+    '/edm':          convert_edm,
+    '/opengraph':    marcxml_converter(MarcXmlToOpenGraph, 'text/html'),
+    '/schemadotorg': marcxml_converter(MarcXmlToSchemaDotOrg, 'application/ld+json'),
+    '/twittercard':  marcxml_converter(MarcXmlToTwitterCard, 'text/html'),
+    '/webmetadata':  marcxml_converter(MarcXmlToWebMetadata, 'text/html')
+}
+
+# errors that mean the request is bad, rather than that something is wrong
+# with the server. Anything else, e.g. a KeyError from a converter, is a
+# bug, and is logged.
+BAD_REQUEST_ERRORS = (ElementTree.ParseError, ValueError, xml.sax.SAXException)
+
+def convert(path, params, body, content_type):
+    """Run a conversion in a worker process.
+
+    Args:
+        path (str): e.g. '/schemadotorg', one of the keys of CONVERSIONS.
+        params (dict): query string parameters.
+        body (bytes): the request body.
+        content_type (str): the request's Content-Type.
+
+    Returns:
+        tuple: Content-Type and body of the response.
+    """
+    return CONVERSIONS[path](params, body, content_type)
+
+
+class ConversionRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        if url.path not in CONVERSIONS:
+            self.respond(404, 'text/plain', 'unknown format {}\n'.format(url.path))
+            return
+
+        try:
+            content_type, content = self.server.executor.submit(
+                convert,
+                url.path,
+                params,
+                body,
+                self.headers.get('Content-Type', 'application/marcxml+xml')
+            ).result()
+        except BAD_REQUEST_ERRORS as e:
+            self.respond(400, 'text/plain', 'could not convert record: {!r}\n'.format(e))
+        except Exception:
+            # anything else is a bug, or a broken worker pool. Log it, and
+            # still answer the client.
+            sys.stderr.write('error converting {}:\n{}'.format(self.path, traceback.format_exc()))
+            self.respond(500, 'text/plain', 'internal error\n')
+        else:
+            self.respond(200, content_type, content)
+
+    def respond(self, status, content_type, content):
+        data = content.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', '{}; charset=utf-8'.format(content_type))
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ConversionServer(ThreadingHTTPServer):
+    """Each request is handled in its own thread, and converted in a pool of
+    worker processes that are started once."""
+
+    daemon_threads = True
+
+    def __init__(self, server_address, workers=0):
+        self.executor = ProcessPoolExecutor(max_workers=workers or None, initializer=warm_up)
+        super().__init__(server_address, ConversionRequestHandler)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown()
+
+def main():
+    options = docopt(__doc__)
+    server = ConversionServer(
+        (options['--host'], int(options['--port'])),
+        int(options['--workers'])
+    )
+    sys.stderr.write('listening on {}:{}\n'.format(*server.server_address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Structural EDM checks in a single pass over N-Triples.
+
+These are the presence rules from the SSMAPS application profile
+(https://dldc.lib.uchicago.edu/local/ldr/ssmaps.pdf), the same ones
+test_ttl.py checks with rdflib. They only need to know which predicates
+each subject has, so they run much faster than ShEx, and validate_edm runs
+them first to reject broken records early.
+"""
+
+import collections
+
+DC      = 'http://purl.org/dc/elements/1.1/'
+DCTERMS = 'http://purl.org/dc/terms/'
+EDM     = 'http://www.europeana.eu/schemas/edm/'
+ORE     = 'http://www.openarchives.org/ore/terms/'
+RDF_TYPE = '<http://www.w3.org/1999/02/22-rdf-syntax-ns#type>'
+
+EDM_TYPES = ('3D', 'IMAGE', 'SOUND', 'TEXT', 'VIDEO')
+
+# rules for each rdf:type, as (kind, severity, arguments, message):
+#   any       at least one of the predicates occurs.
+#   all       every one of the predicates occurs.
+#   implies   if the first predicate occurs, so does the second.
+#   one_of    every value of the predicate is one of the allowed values.
+#   if_value  if the predicate has the value, the other predicate occurs.
+RULES = {
+    EDM + 'ProvidedCHO': (
+        ('any', 'error', (DC + 'description', DC + 'title'),
+         'dc:description, dc:title, or both are mandatory.'),
+        ('any', 'error', (DC + 'coverage', DCTERMS + 'spatial', DC + 'subject', DCTERMS + 'temporal', DC + 'type'),
+         'at least one of dc:coverage, dcterms:spatial, dc:subject, dcterms:temporal, or dc:type is required.'),
+        ('all', 'error', (EDM + 'type',),
+         'edm:type must occur.'),
+        ('one_of', 'error', (EDM + 'type', EDM_TYPES),
+         'edm:type must be one of TEXT, IMAGE, SOUND, VIDEO or 3D.'),
+        ('if_value', 'error', (EDM + 'type', 'TEXT', DC + 'language'),
+         'dc:language must appear for TEXT objects.'),
+        ('all', 'warning', (EDM + 'year',),
+         'edm:year should occur.')
+    ),
+    ORE + 'Aggregation': (
+        ('any', 'error', (EDM + 'isShownAt', EDM + 'isShownBy'),
+         'edm:isShownAt or edm:isShownBy is mandatory.'),
+        ('implies', 'error', (EDM + 'isShownBy', EDM + 'object'),
+         'if edm:isShownBy is used, edm:object must be supplied.'),
+        ('all', 'error', (EDM + 'rights',),
+         'edm:rights is mandatory.')
+    ),
+    ORE + 'ResourceMap': (
+        ('all', 'error', (DCTERMS + 'created', DCTERMS + 'modified'),
+         'dcterms:created and dcterms:modified are mandatory.'),
+    )
+}
+
+class CompiledRules:
+    """RULES compiled to bit masks.
+
+    Each predicate a rule mentions gets a bit, so a subject's state is an int
+    with a bit set for each of those predicates it has, plus the values of
+    the few predicates whose values are checked. Each rule becomes a
+    function of that state.
+    """
+
+    def __init__(self, rules=RULES):
+        self.bits = {}
+        self.value_predicates = set()
+        self.rules = {}
+        for rdf_type, type_rules in rules.items():
+            compiled = []
+            for kind, severity, args, message in type_rules:
+                compiled.append((self.compile(kind, args), severity, message))
+            self.rules['<{}>'.format(rdf_type)] = compiled
+
+    def bit(self, predicate):
+        predicate = '<{}>'.format(predicate)
+        if predicate not in self.bits:
+            self.bits[predicate] = 1 << len(self.bits)
+        return self.bits[predicate]
+
+    def compile(self, kind, args):
+        if kind == 'any':
+            mask = sum(self.bit(p) for p in args)
+            return lambda present, values: present & mask != 0
+        elif kind == 'all':
+            mask = sum(self.bit(p) for p in args)
+            return lambda present, values: present & mask == mask
+        elif kind == 'implies':
+            a, b = self.bit(args[0]), self.bit(args[1])
+            return lambda present, values: not present & a or present & b != 0
+        elif kind == 'one_of':
+            predicate, allowed = '<{}>'.format(args[0]), frozenset(args[1])
+            self.bit(args[0])
+            self.value_predicates.add(predicate)
+            return lambda present, values: values.get(predicate, set()) <= allowed
+        elif kind == 'if_value':
+            predicate, value, b = '<{}>'.format(args[0]), args[1], self.bit(args[2])
+            self.bit(args[0])
+            self.value_predicates.add(predicate)
+            return lambda present, values: value not in values.get(predicate, ()) or present & b != 0
+        else:
+            raise ValueError('unknown rule {}.'.format(kind))
+
+def literal_value(term):
+    if term.startswith('"'):
+        return term[1:term.rindex('"')]
+    return term
+
+def check_ntriples(lines, rules=None):
+    """Check N-Triples against the structural rules in a single pass.
+
+    Only a bit mask, the rdf:types and a few values are kept for each
+    subject, so the input doesn't need to be grouped by subject.
+
+    Args:
+        lines (iterable): N-Triples lines.
+        rules (CompiledRules)
+
+    Returns:
+        list: a dict for each violation, with 'focus', 'type', 'severity'
+        and 'reason', sorted by focus node.
+    """
+    if rules is None:
+        rules = CompiledRules()
+    bits = rules.bits
+    value_predicates = rules.value_predicates
+    typed = rules.rules
+
+    present = collections.defaultdict(int)
+    types = collections.defaultdict(set)
+    values = collections.defaultdict(dict)
+
+    for line in lines:
+        parts = line.split(None, 2)
+        if len(parts) < 3:
+            continue
+        s, p, o = parts
+        if p == RDF_TYPE:
+            o = o.rstrip().rstrip('.').rstrip()
+            if o in typed:
+                types[s].add(o)
+        elif p in bits:
+            present[s] |= bits[p]
+            if p in value_predicates:
+                o = o.rstrip().rstrip('.').rstrip()
+                values[s].setdefault(p, set()).add(literal_value(o))
+
+    violations = []
+    for s in sorted(types):
+        for rdf_type in sorted(types[s]):
+            for check, severity, message in typed[rdf_type]:
+                if not check(present.get(s, 0), values.get(s, {})):
+                    violations.append({
+                        'focus': s[1:-1] if s.startswith('<') else s,
+                        'reason': message,
+                        'severity': severity,
+                        'type': rdf_type[1:-1]
+                    })
+    return violations
@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+"""Usage:
+    fixity_audit [--restart] [--workers=<n>] [--rate=<mb>] [--sample=<fraction>] [--seed=<n>] [--journal=<path>] [--report=<path>] <pair_tree_root>
+    fixity_audit --status [--journal=<path>]
+
+Check the stored digests of every OCFL object in a pair tree. Each object's
+inventory.json is checked against its sidecar, and every content file is
+read again and compared with the inventory's manifest and fixity digests.
+Content files that aren't in the manifest are reported too.
+
+Objects are audited in parallel, in separate processes. Progress is kept in
+a SQLite journal, so an interrupted audit picks up where it left off when
+it's run again. Objects that had problems are checked again too. At the
+end, every object with a problem is written to the report as a JSON line.
+
+Objects that passed aren't checked again while the journal is kept, so a
+journal whose objects have all passed is finished: running the audit
+again with it is an error. Use --restart to start a new audit.
+
+Options:
+    --restart             Remove the journal and audit every object again.
+    --workers=<n>         Number of processes. [default: 4]
+    --rate=<mb>           Limit reads to this many MB/s in total, e.g. to
+                          leave I/O for other users during a maintenance
+                          window. 0 for no limit. [default: 0]
+    --sample=<fraction>   Only audit this fraction of objects, e.g. 0.05.
+                          The same seed picks the same objects, so a sampled
+                          audit can be resumed too. [default: 1.0]
+    --seed=<n>            Seed for picking a sample. [default: 0]
+    --journal=<path>      Journal file. [default: fixity_audit.sqlite]
+    --report=<path>       Report file. [default: fixity_report.jsonl]
+    --status              Report how many objects are audited, have
+                          problems or are still to do.
+"""
+
+import concurrent.futures, hashlib, json, os, sys, time
+from docopt import docopt
+
+try:
+    from .batch_convert import Journal
+    from .classes import NoidManager
+except ImportError:
+    from batch_convert import Journal
+    from classes import NoidManager
+
+BUFFER_SIZE = 8 * 1024 * 1024
+
+
+class RateLimiter:
+    """Keep reads under a number of bytes per second, by sleeping after a
+    chunk that would go over."""
+
+    def __init__(self, bytes_per_second, clock=time.monotonic, sleep=time.sleep):
+        self.bytes_per_second = bytes_per_second
+        self.clock = clock
+        self.sleep = sleep
+        self.started = clock()
+        self.consumed = 0
+
+    def consume(self, n):
+        if not self.bytes_per_second:
+            return
+        self.consumed += n
+        wait = self.consumed / self.bytes_per_second - (self.clock() - self.started)
+        if wait > 0:
+            self.sleep(wait)
+
+# each worker process has its own limiter, with its share of --rate.
+limiter = RateLimiter(0)
+
+def init_worker(bytes_per_second):
+    global limiter
+    limiter = RateLimiter(bytes_per_second)
+
+def digests(path, algorithms, buffer_size=BUFFER_SIZE):
+    """Digests of a file, read in chunks, within the rate limit.
+
+    Returns:
+        dict: a hex digest for each algorithm.
+    """
+    hashes = [(a, hashlib.new(a)) for a in algorithms]
+    buf = bytearray(buffer_size)
+    view = memoryview(buf)
+    with open(path, 'rb') as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            for _, h in hashes:
+                h.update(view[:n])
+            limiter.consume(n)
+    return {a: h.hexdigest() for a, h in hashes}
+
+def in_sample(noid, fraction, seed):
+    """Pick objects for a sample. The same seed always picks the same
+    objects."""
+    if fraction >= 1:
+        return True
+    h = hashlib.sha1('{}:{}'.format(seed, noid).encode('utf-8')).hexdigest()
+    return int(h[:8], 16) / 0x100000000 < fraction
+
+def audit_object(path):
+    """Check an OCFL object's inventory and content files.
+
+    Args:
+        path (str): the object's directory.
+
+    Returns:
+        list: a dict for each problem found, with the path in the object
+        and what's wrong with it. Empty if the object is fine.
+    """
+    problems = []
+    try:
+        with open(os.path.join(path, 'inventory.json'), 'rb') as f:
+            data = f.read()
+        inventory = json.loads(data)
+        algorithm = inventory['digestAlgorithm']
+        hashlib.new(algorithm)
+    except (OSError, KeyError, TypeError, ValueError) as e:
+        return [unreadable('inventory.json', e)]
+
+    limiter.consume(len(data))
+    try:
+        with open(os.path.join(path, 'inventory.json.{}'.format(algorithm))) as f:
+            expected = f.read().split()[0]
+    except (OSError, IndexError):
+        problems.append({'path': 'inventory.json.{}'.format(algorithm), 'problem': 'missing'})
+    else:
+        found = hashlib.new(algorithm, data).hexdigest()
+        if found != expected:
+            problems.append({'path': 'inventory.json', 'problem': 'mismatch', 'algorithm': algorithm, 'expected': expected, 'found': found})
+
+    # an inventory that's valid JSON can still have the wrong shape, e.g. a
+    # manifest that isn't an object.
+    try:
+        problems.extend(audit_content(path, inventory))
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        problems.append(unreadable('inventory.json', e))
+    return problems
+
+def unreadable(path, e):
+    return {'path': path, 'problem': 'unreadable', 'error': '{}: {}'.format(type(e).__name__, e)}
+
+def audit_content(path, inventory):
+    """Check an object's content files against its inventory.
+
+    Returns:
+        list: a dict for each problem found.
+    """
+    problems = []
+    algorithm = inventory['digestAlgorithm']
+    manifest = inventory['manifest']
+
+    # expected digests for each content path, from the manifest and from
+    # fixity, so each file is read once for all of them.
+    expected = {}
+    for digest, content_paths in manifest.items():
+        for p in content_paths:
+            expected.setdefault(p, {})[algorithm] = digest
+    for a, block in inventory.get('fixity', {}).items():
+        for digest, content_paths in block.items():
+            for p in content_paths:
+                if p in expected:
+                    expected[p][a] = digest
+
+    for p, wanted in sorted(expected.items()):
+        try:
+            found = digests(os.path.join(path, *p.split('/')), sorted(wanted))
+        except FileNotFoundError:
+            problems.append({'path': p, 'problem': 'missing'})
+            continue
+        except OSError as e:
+            problems.append(unreadable(p, e))
+            continue
+        for a, digest in sorted(wanted.items()):
+            if found[a] != digest.lower():
+                problems.append({'path': p, 'problem': 'mismatch', 'algorithm': a, 'expected': digest, 'found': found[a]})
+
+    for version in inventory.get('versions', {}):
+        content = os.path.join(path, version, inventory.get('contentDirectory', 'content'))
+        for dirpath, _, files in os.walk(content):
+            for file in files:
+                p = os.path.relpath(os.path.join(dirpath, file), path).replace(os.sep, '/')
+                if p not in expected:
+                    problems.append({'path': p, 'problem': 'unexpected'})
+    return problems
+
+def run(journal, root, noids, workers=4, bytes_per_second=0):
+    """Audit every object in noids that the journal doesn't have as done.
+
+    Objects are submitted a few at a time, so a large pair tree doesn't
+    fill memory with futures.
+
+    Returns:
+        dict: numbers of objects audited, audited with problems, and
+        skipped because they were audited before.
+    """
+    journal.add(noids)
+    todo = journal.unfinished()
+    stats = {'audited': 0, 'problems': 0, 'skipped': len(noids) - len(todo)}
+
+    noid_manager = NoidManager(root)
+    todo = iter(todo)
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(bytes_per_second / workers,)
+    ) as executor:
+        pending = {}
+        while True:
+            for noid in todo:
+                journal.start(noid)
+                pending[executor.submit(audit_object, os.path.join(root, noid_manager.path(noid)))] = noid
+                if len(pending) >= workers * 2:
+                    break
+            if not pending:
+                break
+            finished, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                noid = pending.pop(future)
+                problems = future.result()
+                if problems:
+                    journal.failed(noid, json.dumps(problems, sort_keys=True))
+                    stats['problems'] += 1
+                else:
+                    journal.done(noid)
+                stats['audited'] += 1
+    return stats
+
+def remove_journal(path):
+    """Remove a journal, with SQLite's write-ahead log files."""
+    for p in (path, path + '-wal', path + '-shm'):
+        if os.path.exists(p):
+            os.remove(p)
+
+def write_report(journal, path):
+    """Write a JSON line for each object with problems."""
+    tmp = '{}.tmp'.format(path)
+    with open(tmp, 'w') as f:
+        for noid, _, problems in journal.failures():
+            f.write(json.dumps({'noid': noid, 'problems': json.loads(problems)}, sort_keys=True) + '\n')
+    os.replace(tmp, path)
+
+def main():
+    options = docopt(__doc__)
+    journal_path = options['--journal']
+
+    if options['--status']:
+        if not os.path.exists(journal_path):
+            sys.stderr.write('no journal at {}.\n'.format(journal_path))
+            sys.exit(1)
+        journal = Journal(journal_path)
+        sys.stdout.write(' '.join('{}={}'.format(k, v) for k, v in sorted(journal.counts().items())) + '\n')
+        journal.close()
+        return
+
+    root = os.path.abspath(options['<pair_tree_root>'])
+    fraction = float(options['--sample'])
+    seed = options['--seed']
+    if options['--restart']:
+        remove_journal(journal_path)
+    resumed = os.path.exists(journal_path)
+    journal = Journal(journal_path, {'root': root, 'sample': fraction, 'seed': seed})
+    try:
+        noids = [n for n in NoidManager(root).list() if in_sample(n, fraction, seed)]
+        journal.add(noids)
+        if resumed and not journal.unfinished():
+            sys.stderr.write(
+                'every object in {} has already been audited and passed. '
+                'Use --restart to audit them again.\n'.format(journal_path)
+            )
+            sys.exit(1)
+        stats = run(
+            journal,
+            root,
+            noids,
+            int(options['--workers']),
+            float(options['--rate']) * 1024 * 1024
+        )
+        write_report(journal, options['--report'])
+    finally:
+        journal.close()
+
+    sys.stderr.write('audited {} objects, {} with problems, skipped {} already audited.\n'.format(
+        stats['audited'], stats['problems'], stats['skipped']))
+    if stats['problems']:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
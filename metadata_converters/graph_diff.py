@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+"""Usage:
+    graph_diff [--graph=<uri>] [--buffer=<n>] [--tmpdir=<dir>] [--batch=<n>] [--apply] [--url=<url>] <old> <new>
+
+Compare a newly generated graph with the one that was last published, and
+print SPARQL Update to turn the old graph into the new one.
+
+Options:
+    --graph=<uri>   Named graph to update. Uses the default graph if this
+                    isn't set.
+    --buffer=<n>    Number of triples to sort in memory at a time. Larger
+                    inputs are sorted in runs on disk and merged.
+                    [default: 1000000]
+    --tmpdir=<dir>  Directory for sorted runs.
+    --batch=<n>     Number of triples in each DELETE DATA or INSERT DATA
+                    request. [default: 10000]
+    --apply         Send the updates to the SPARQL endpoint instead of
+                    printing them.
+    --url=<url>     SPARQL update endpoint. Defaults to
+                    $MARKLOGIC_SPARQL_URL, or the library's MarkLogic
+                    server.
+
+<old> and <new> can be .nt or .ttl files, directories of them, as written by
+ssmaps_edm --outdir, or - for N-Triples on stdin.
+
+Blank nodes are replaced with the same skolem IRIs that upload_to_marklogic
+sends, so the deletes match the triples it uploaded and every update is
+ground. The IRIs are made from a digest of each file, so when a file
+changes, all of its blank node triples are replaced. Stdin can't be matched
+with an upload that way, so it can't have blank nodes.
+"""
+
+import heapq, itertools, os, sys, tempfile
+from docopt import docopt
+
+try:
+    from .upload_to_marklogic import NT_TOKEN, SPARQL_UPDATE, GraphStoreUploader, list_files, read_statements
+except ImportError:
+    from upload_to_marklogic import NT_TOKEN, SPARQL_UPDATE, GraphStoreUploader, list_files, read_statements
+
+SPARQL_URL = 'http://marklogic.lib.uchicago.edu:8008/v1/graphs/sparql'
+
+def canonical_lines(paths):
+    """Read N-Triples or Turtle as one canonical N-Triples line per triple,
+    with blank nodes skolemized the way upload_to_marklogic does it.
+
+    N-Triples lines only have their whitespace normalized, so they are
+    expected to be written by rdflib or query_marklogic, which escape
+    literals the same way. Turtle is reparsed with rdflib.
+
+    Args:
+        paths (list): files, directories or '-'.
+
+    Returns:
+        a generator of str, each ending in ' .'.
+    """
+    for path in list_files(paths):
+        if path == '-':
+            lines = stdin_lines()
+        else:
+            lines = (statement.decode('utf-8') for _, statement in read_statements([path]))
+        for line in read_canonical(lines):
+            yield line
+
+def stdin_lines():
+    for line in sys.stdin.buffer:
+        if any(m.group(1) for m in NT_TOKEN.finditer(line)):
+            raise ValueError(
+                'blank nodes on stdin would get different IRIs from the ones that '
+                'were uploaded. Save the graph to a file and compare that instead.'
+            )
+        yield line.decode('utf-8')
+
+def read_canonical(lines):
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.endswith('.'):
+            line = line[:-1].rstrip()
+        s, p, o = line.split(None, 2)
+        yield '{} {} {} .'.format(s, p, o)
+
+def write_run(lines, tmpdir):
+    f = tempfile.TemporaryFile('w+', encoding='utf-8', dir=tmpdir)
+    for line in lines:
+        f.write(line + '\n')
+    f.seek(0)
+    return f
+
+def external_sort(lines, buffer_size=1000000, tmpdir=None):
+    """Sort lines and drop duplicates, holding at most buffer_size of them in
+    memory.
+
+    Lines are sorted in runs of buffer_size, each run is written to a
+    temporary file, and the runs are merged.
+
+    Args:
+        lines (iterable): str.
+        buffer_size (int): lines per run.
+        tmpdir (str): where to put runs.
+
+    Returns:
+        a generator of unique lines, in sorted order.
+    """
+    lines = iter(lines)
+    runs = []
+    try:
+        buffer = sorted(itertools.islice(lines, buffer_size))
+        while len(buffer) == buffer_size:
+            runs.append(write_run(buffer, tmpdir))
+            buffer = sorted(itertools.islice(lines, buffer_size))
+        if runs:
+            if buffer:
+                runs.append(write_run(buffer, tmpdir))
+            buffer = None
+            merged = heapq.merge(*((line.rstrip('\n') for line in run) for run in runs))
+        else:
+            merged = buffer
+
+        previous = None
+        for line in merged:
+            if line != previous:
+                yield line
+                previous = line
+    finally:
+        for run in runs:
+            run.close()
+
+def diff_sorted(old, new):
+    """Compare two sorted, duplicate free sequences of lines.
+
+    Returns:
+        a generator of ('-', line) for lines only in old and ('+', line) for
+        lines only in new, in sorted order.
+    """
+    old = iter(old)
+    new = iter(new)
+    o = next(old, None)
+    n = next(new, None)
+    while o is not None or n is not None:
+        if n is None or (o is not None and o < n):
+            yield '-', o
+            o = next(old, None)
+        elif o is None or n < o:
+            yield '+', n
+            n = next(new, None)
+        else:
+            o = next(old, None)
+            n = next(new, None)
+
+def graph_diff(old_paths, new_paths, buffer_size=1000000, tmpdir=None):
+    """Diff two graphs with bounded memory. Only the differences are held
+    in memory, which are expected to be small.
+
+    Returns:
+        tuple: lists of deleted and inserted N-Triples lines.
+    """
+    deletes = []
+    inserts = []
+    for op, line in diff_sorted(
+        external_sort(canonical_lines(old_paths), buffer_size, tmpdir),
+        external_sort(canonical_lines(new_paths), buffer_size, tmpdir)
+    ):
+        if op == '-':
+            deletes.append(line)
+        else:
+            inserts.append(line)
+    return deletes, inserts
+
+def sparql_updates(deletes, inserts, graph=None, batch=10000):
+    """Turn deletes and inserts into SPARQL Update requests.
+
+    Deletes come first, so a triple whose literal changed is removed before
+    its replacement is added.
+
+    Args:
+        deletes (list): N-Triples lines.
+        inserts (list): N-Triples lines.
+        graph (str): named graph, or None for the default graph.
+        batch (int): triples per request.
+
+    Returns:
+        a generator of str.
+    """
+    for operation, lines in (('DELETE DATA', deletes), ('INSERT DATA', inserts)):
+        for i in range(0, len(lines), batch):
+            triples = '\n'.join(lines[i:i + batch])
+            if graph:
+                yield '{} {{ GRAPH <{}> {{\n{}\n}} }}'.format(operation, graph, triples)
+            else:
+                yield '{} {{\n{}\n}}'.format(operation, triples)
+
+def main():
+    options = docopt(__doc__)
+
+    deletes, inserts = graph_diff(
+        [options['<old>']],
+        [options['<new>']],
+        int(options['--buffer']),
+        options['--tmpdir']
+    )
+    updates = sparql_updates(deletes, inserts, options['--graph'], int(options['--batch']))
+
+    if options['--apply']:
+        from requests.auth import HTTPBasicAuth
+        uploader = GraphStoreUploader(
+            options['--url'] or os.environ.get('MARKLOGIC_SPARQL_URL', SPARQL_URL),
+            auth=HTTPBasicAuth(
+                os.environ['MARKLOGIC_LDR_USER'],
+                os.environ['MARKLOGIC_LDR_PASSWORD']
+            )
+        )
+        for update in updates:
+            uploader.post(SPARQL_UPDATE, update.encode('utf-8'))
+    else:
+        sys.stdout.write(';\n'.join(updates) + '\n')
+
+    sys.stderr.write('{} triples deleted, {} inserted.\n'.format(len(deletes), len(inserts)))
+
+if __name__=="__main__":
+    main()
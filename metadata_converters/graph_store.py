@@ -0,0 +1,221 @@
+"""An on-disk graph store for reports over dumps that don't fit in memory.
+
+Graphs are loaded into an SQLite database, one per input file, in a cache
+directory named by the SHA-256 of the input. Later runs over the same input
+open the database instead of parsing again.
+"""
+
+import functools, hashlib, os, sqlite3, sys, tempfile
+from rdflib import BNode, Graph, Literal, URIRef
+from rdflib.store import Store, VALID_STORE
+
+BATCH_SIZE = 10000
+
+def encode_term(term):
+    """Encode an rdflib term as a string that sorts and compares exactly."""
+    if isinstance(term, URIRef):
+        return 'U' + term
+    elif isinstance(term, BNode):
+        return 'B' + term
+    elif isinstance(term, Literal):
+        return 'L{}\x00{}\x00{}'.format(
+            term.language or '',
+            term.datatype or '',
+            term
+        )
+    else:
+        raise TypeError('cannot store {!r}'.format(term))
+
+@functools.lru_cache(maxsize=65536)
+def decode_term(s):
+    kind = s[0]
+    if kind == 'U':
+        return URIRef(s[1:])
+    elif kind == 'B':
+        return BNode(s[1:])
+    else:
+        language, datatype, value = s[1:].split('\x00', 2)
+        return Literal(value, lang=language or None, datatype=datatype or None)
+
+class SQLiteStore(Store):
+    """A triple store in a single SQLite file.
+
+    Triples are kept in one table with three indexes, like the spo, pos and
+    osp dictionaries of rdflib's memory store. Added triples are buffered
+    and inserted in batches.
+    """
+
+    context_aware = False
+    formula_aware = False
+    transaction_aware = False
+
+    def __init__(self, configuration=None, identifier=None):
+        self.identifier = identifier
+        self.db = None
+        self.pending = []
+        super().__init__(configuration)
+
+    def open(self, configuration, create=True):
+        self.db = sqlite3.connect(configuration)
+        self.db.execute('PRAGMA journal_mode = OFF')
+        self.db.execute('PRAGMA synchronous = OFF')
+        if create:
+            self.db.executescript('''
+                CREATE TABLE IF NOT EXISTS triples (
+                    s TEXT, p TEXT, o TEXT, PRIMARY KEY (s, p, o)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS pos ON triples (p, o, s);
+                CREATE INDEX IF NOT EXISTS osp ON triples (o, s, p);
+                CREATE TABLE IF NOT EXISTS namespaces (
+                    prefix TEXT PRIMARY KEY, namespace TEXT
+                );
+            ''')
+        return VALID_STORE
+
+    def close(self, commit_pending_transaction=False):
+        if self.db is not None:
+            self.commit()
+            self.db.close()
+            self.db = None
+
+    def commit(self):
+        self.flush()
+        self.db.commit()
+
+    def flush(self):
+        if self.pending:
+            self.db.executemany(
+                'INSERT OR IGNORE INTO triples VALUES (?, ?, ?)',
+                self.pending
+            )
+            self.pending = []
+
+    def add(self, triple, context, quoted=False):
+        self.pending.append(tuple(encode_term(t) for t in triple))
+        if len(self.pending) >= BATCH_SIZE:
+            self.flush()
+
+    def addN(self, quads):
+        for s, p, o, _ in quads:
+            self.add((s, p, o), None)
+
+    def where(self, triple_pattern):
+        clauses = []
+        params = []
+        for column, term in zip(('s', 'p', 'o'), triple_pattern):
+            if term is not None:
+                clauses.append('{} = ?'.format(column))
+                params.append(encode_term(term))
+        if clauses:
+            return ' WHERE ' + ' AND '.join(clauses), params
+        return '', params
+
+    def remove(self, triple_pattern, context=None):
+        self.flush()
+        where, params = self.where(triple_pattern)
+        self.db.execute('DELETE FROM triples' + where, params)
+
+    def triples(self, triple_pattern, context=None):
+        self.flush()
+        where, params = self.where(triple_pattern)
+        for s, p, o in self.db.execute('SELECT s, p, o FROM triples' + where, params):
+            yield (decode_term(s), decode_term(p), decode_term(o)), iter(())
+
+    def __len__(self, context=None):
+        self.flush()
+        return self.db.execute('SELECT COUNT(*) FROM triples').fetchone()[0]
+
+    def contexts(self, triple=None):
+        return iter(())
+
+    def bind(self, prefix, namespace, override=True):
+        if not override and self.namespace(prefix) is not None:
+            return
+        self.db.execute('DELETE FROM namespaces WHERE namespace = ?', (str(namespace),))
+        self.db.execute(
+            'INSERT OR REPLACE INTO namespaces VALUES (?, ?)',
+            (prefix, str(namespace))
+        )
+
+    def namespace(self, prefix):
+        row = self.db.execute(
+            'SELECT namespace FROM namespaces WHERE prefix = ?', (prefix,)
+        ).fetchone()
+        return URIRef(row[0]) if row else None
+
+    def prefix(self, namespace):
+        row = self.db.execute(
+            'SELECT prefix FROM namespaces WHERE namespace = ?', (str(namespace),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def namespaces(self):
+        for prefix, namespace in self.db.execute('SELECT prefix, namespace FROM namespaces').fetchall():
+            yield prefix, URIRef(namespace)
+
+def hash_file(f, h):
+    """Hash an open binary file a megabyte at a time."""
+    for chunk in iter(lambda: f.read(1 << 20), b''):
+        h.update(chunk)
+    return h.hexdigest()
+
+def load_graph(path=None, format='n3', store_dir=None):
+    """Load a graph, from a cached on-disk store if there is one.
+
+    Args:
+        path (str): input file, or None to read stdin.
+        format (str): rdflib parser name.
+        store_dir (str): cache directory. If None, the graph is parsed into
+        memory as before.
+
+    Returns:
+        rdflib.Graph
+    """
+    if store_dir is None:
+        g = Graph()
+        g.parse(path or sys.stdin, format=format)
+        return g
+
+    os.makedirs(store_dir, exist_ok=True)
+    tmp = None
+    try:
+        if path is None:
+            # stdin can only be read once, so keep a copy to parse on a
+            # cache miss.
+            tmp = tempfile.NamedTemporaryFile(dir=store_dir, suffix='.input', delete=False)
+            h = hashlib.sha256()
+            for chunk in iter(lambda: sys.stdin.buffer.read(1 << 20), b''):
+                h.update(chunk)
+                tmp.write(chunk)
+            tmp.close()
+            digest = h.hexdigest()
+            path = tmp.name
+        else:
+            with open(path, 'rb') as f:
+                digest = hash_file(f, hashlib.sha256())
+
+        db = os.path.join(store_dir, '{}.{}.sqlite'.format(digest, format))
+        if not os.path.exists(db):
+            # build under a temporary name, so an interrupted load isn't
+            # mistaken for a finished one.
+            building = '{}.{}.tmp'.format(db, os.getpid())
+            g = Graph(store=SQLiteStore())
+            g.open(building, create=True)
+            try:
+                # N3 formulas can't be stored here, and rdflib's N3 parser
+                # refuses stores without them, so N3 input is read as the
+                # Turtle it almost always is.
+                g.parse(path, format='turtle' if format == 'n3' else format)
+            except BaseException:
+                g.close()
+                os.unlink(building)
+                raise
+            g.close()
+            os.replace(building, db)
+    finally:
+        if tmp is not None:
+            os.unlink(tmp.name)
+
+    g = Graph(store=SQLiteStore())
+    g.open(db, create=False)
+    return g
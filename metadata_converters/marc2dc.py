@@ -1,58 +1,334 @@
 #!/usr/bin/env python
 """Usage:
-    marc2dc --socscimaps <digital_record_id> --noid <noid>
+    marc2dc [--profile] [--pstats=<dir>] --socscimaps <digital_record_id> --noid <noid>
+    marc2dc --batch [--socscimaps] --noids=<csv> [--workers=<n>] [--chunksize=<n>] [--outdir=<dir>] [--metrics=<path>] [--metrics-interval=<s>] [--metrics-port=<port>] <path>...
+
+Options:
+    --batch          Convert every digital record found in one or more
+                     directories or multi-record MARC/MARCXML files. Print
+                     records are matched to digital records through the
+                     776 $w. A record that can't be converted is
+                     reported on stderr and the rest are still converted,
+                     and the exit status is 1.
+    --socscimaps     Use the Social Scientists Map Chicago crosswalk.
+    --noids=<csv>    A two column CSV of digital record ids and NOIDs.
+                     Records that aren't listed get a newly minted NOID,
+                     which is added to the file before any record is
+                     converted, so the next run gives them the same one.
+                     The file is created if it doesn't exist.
+    --workers=<n>    Number of worker processes, 0 for one per CPU.
+                     [default: 0]
+    --chunksize=<n>  Number of records sent to a worker at a time.
+                     [default: 64]
+    --outdir=<dir>   Write one <digital_record_id>.dc.xml file per record to
+                     this directory, instead of a single stream to stdout.
+    --metrics=<path>  Append a JSON line of counters to this file every
+                     interval.
+    --metrics-interval=<s>
+                     Seconds between metrics snapshots. [default: 60]
+    --metrics-port=<port>
+                     Serve the same metrics in the Prometheus text format at
+                     http://localhost:<port>/metrics.
+    --profile        Write the time spent in each stage to stderr. Also on
+                     when METADATA_CONVERTERS_PROFILE=1 is set.
+    --pstats=<dir>   Profile the record with cProfile, and write the stats
+                     to <dir>/<digital_record_id>.pstats. Implies --profile.
 """
 
-import io, json, os, paramiko, sys
+import csv, io, json, os, sys
 import xml.etree.ElementTree as ElementTree
 
-from classes import SocSciMapsMarcXmlToDc
+from concurrent.futures import ProcessPoolExecutor
 from docopt import docopt
-from pymarc import MARCReader
+from pymarc import MARCReader, Record, parse_xml_to_array
+
+try:
+    from .classes import MarcXmlToDc, NoidManager, SocSciMapsMarcXmlToDc
+    from .metrics import metrics, start as start_metrics
+    from .profiling import profiler
+except ImportError:
+    from classes import MarcXmlToDc, NoidManager, SocSciMapsMarcXmlToDc
+    from metrics import metrics, start as start_metrics
+    from profiling import profiler
 
 ElementTree.register_namespace('m', 'http://www.loc.gov/MARC21/slim')
 
 def marc_to_dc_soc_sci(digital_record_id, noid):
-    ssh = paramiko.SSHClient()
-    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    ssh.connect(
-        os.environ['SOLR_ACCESS_DOMAIN'],
-        username=os.environ['SOLR_ACCESS_USERNAME'],
-        password=os.environ['SOLR_ACCESS_PASSWORD']
-    )
-
-    # request the digital record
-    url = 'http://vfsolr.uchicago.edu:8080/solr/biblio/select?q=id:{}'.format(str(digital_record_id))
-    _, ssh_stdout, _ = ssh.exec_command('curl "{}"'.format(url))
-    data = json.loads(ssh_stdout.read())
-    fullrecord = data['response']['docs'][0]['fullrecord']
-
-    with io.BytesIO(fullrecord.encode('utf-8')) as fh:
-        reader = MARCReader(fh)
-        for record in reader:
-            digital_record = record
-
-    # get an oclc number for the print record
-    oclc_num = digital_record['776']['w'].replace('(OCoLC)', '')
-
-    # request the print record
-    url = 'http://vfsolr.uchicago.edu:8080/solr/biblio/select?q=oclc_num:{}'.format(str(oclc_num))
-    _, ssh_stdout, _ = ssh.exec_command('curl "{}"'.format(url))
-    data = json.loads(ssh_stdout.read())
-    fullrecord = data['response']['docs'][0]['fullrecord']
-
-    with io.BytesIO(fullrecord.encode('utf-8')) as fh:
-        reader = MARCReader(fh)
-        for record in reader:
-            print_record = record
-
-    return str(SocSciMapsMarcXmlToDc(digital_record, print_record, noid))
+    import paramiko
 
-if __name__ == "__main__":
+    with profiler.record(digital_record_id):
+        ssh = paramiko.SSHClient()
+        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        with profiler.stage('ssh connect'):
+            ssh.connect(
+                os.environ['SOLR_ACCESS_DOMAIN'],
+                username=os.environ['SOLR_ACCESS_USERNAME'],
+                password=os.environ['SOLR_ACCESS_PASSWORD']
+            )
+
+        # request the digital record
+        url = 'http://vfsolr.uchicago.edu:8080/solr/biblio/select?q=id:{}'.format(str(digital_record_id))
+        with profiler.stage('solr'):
+            _, ssh_stdout, _ = ssh.exec_command('curl "{}"'.format(url))
+            data = json.loads(ssh_stdout.read())
+        fullrecord = data['response']['docs'][0]['fullrecord']
+
+        with profiler.stage('marc parse'):
+            with io.BytesIO(fullrecord.encode('utf-8')) as fh:
+                reader = MARCReader(fh)
+                for record in reader:
+                    digital_record = record
+
+        # get an oclc number for the print record
+        oclc_num = digital_record['776']['w'].replace('(OCoLC)', '')
+
+        # request the print record
+        url = 'http://vfsolr.uchicago.edu:8080/solr/biblio/select?q=oclc_num:{}'.format(str(oclc_num))
+        with profiler.stage('solr'):
+            _, ssh_stdout, _ = ssh.exec_command('curl "{}"'.format(url))
+            data = json.loads(ssh_stdout.read())
+        fullrecord = data['response']['docs'][0]['fullrecord']
+
+        with profiler.stage('marc parse'):
+            with io.BytesIO(fullrecord.encode('utf-8')) as fh:
+                reader = MARCReader(fh)
+                for record in reader:
+                    print_record = record
+
+        dc = SocSciMapsMarcXmlToDc(digital_record, print_record, noid)
+        with profiler.stage('asxml'):
+            xml = dc._asxml()
+        with profiler.stage('serialize'):
+            dc_string = ElementTree.tostring(xml, 'utf-8', method='xml').decode('utf-8')
+        profiler.count('records')
+        return dc_string
+
+def read_records(paths):
+    """Read MARC records from binary MARC or MARCXML files.
+
+    Args:
+        paths (list): files, or directories containing .mrc and .xml files.
+
+    Returns:
+        a generator of pymarc Records.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            filenames = [
+                os.path.join(path, f) for f in sorted(os.listdir(path))
+                if f.endswith(('.mrc', '.xml')) and not f.endswith('.dc.xml')
+            ]
+        else:
+            filenames = [path]
+        for filename in filenames:
+            if filename.endswith('.xml'):
+                for record in parse_xml_to_array(filename):
+                    yield record
+            else:
+                with open(filename, 'rb') as fh:
+                    for record in MARCReader(fh):
+                        if record is not None:
+                            yield record
+
+def is_digital_record(record):
+    """Digital records have a 007 for an electronic resource."""
+    for f in record.get_fields('007'):
+        if f.value().startswith('c'):
+            return True
+    return False
+
+def pair_records(records):
+    """Match each digital record with the print record named in its 776 $w.
+
+    A 776 $w can point to the print record by OCLC number, e.g.
+    '(OCoLC)51596250', which is compared against the 035 $a of each print
+    record, or by local identifier, e.g. '(ICU)3451312', which is compared
+    against the 001.
+
+    Args:
+        records (iterable): pymarc Records.
+
+    Returns:
+        list: (digital_record_id, digital record, print record) tuples, in
+        the order the digital records were read.
+    """
+    digital_records = []
+    print_records = {}
+    for record in records:
+        if is_digital_record(record):
+            digital_records.append(record)
+        else:
+            print_records['(ICU){}'.format(record['001'].value())] = record
+            for f in record.get_fields('035'):
+                for sf in f.get_subfields('a'):
+                    print_records[sf] = record
+
+    pairs = []
+    for digital_record in digital_records:
+        print_record = None
+        for f in digital_record.get_fields('776'):
+            for sf in f.get_subfields('w'):
+                if sf in print_records:
+                    print_record = print_records[sf]
+                    break
+        if print_record is None:
+            metrics.count('errors_total', kind='no_print_record')
+            sys.stderr.write('no print record for {}.\n'.format(
+                digital_record['001'].value()))
+            continue
+        pairs.append((digital_record['001'].value(), digital_record, print_record))
+    return pairs
+
+def convert_record(job):
+    """Convert a single record in a worker process. Records are passed as
+    binary MARC because pymarc Records are expensive to pickle.
+
+    Exceptions are returned instead of raised, so that one bad record
+    doesn't stop executor.map.
+
+    Args:
+        job (tuple): converter class, digital record id, digital record and
+        print record as bytes, and NOID.
+
+    Returns:
+        tuple: digital record id, DC as a string or None, and None or an
+        error as an (exception name, message) tuple.
+    """
+    converter, digital_record_id, digital_marc, print_marc, noid = job
+    try:
+        dc = str(converter(Record(data=digital_marc), Record(data=print_marc), noid))
+    except Exception as e:
+        return digital_record_id, None, (type(e).__name__, str(e))
+    return digital_record_id, dc, None
+
+def marc_to_dc_batch(paths, converter, noids=None, workers=0, chunksize=64, minted=None):
+    """Convert a collection of MARC records to DC across a pool of worker
+    processes. Records that fail are reported on stderr and yielded with
+    their error, and the rest are still converted.
+
+    Args:
+        paths (list): files or directories of MARC or MARCXML records.
+        converter (class): MarcXmlToDc or one of its subclasses.
+        noids (dict): digital record ids to NOIDs. Records that aren't
+        listed get a newly minted NOID.
+        workers (int): number of worker processes, 0 for one per CPU.
+        chunksize (int): number of records sent to a worker at a time.
+        minted (function): called with a list of (digital_record_id, noid)
+        tuples for newly minted NOIDs before any record is converted, so
+        that they can be saved.
+
+    Returns:
+        a generator of (digital_record_id, DC string or None, error or None)
+        tuples, in input order.
+    """
+    noids = dict(noids or {})
+    noid_manager = NoidManager(None)
+
+    jobs = []
+    new_noids = []
+    for digital_record_id, digital_record, print_record in pair_records(read_records(paths)):
+        noid = noids.get(digital_record_id)
+        if not noid:
+            noid = noids[digital_record_id] = noid_manager.create()
+            new_noids.append((digital_record_id, noid))
+        jobs.append((
+            converter,
+            digital_record_id,
+            digital_record.as_marc(),
+            print_record.as_marc(),
+            noid
+        ))
+    if new_noids and minted:
+        minted(new_noids)
+
+    queued = len(jobs)
+    metrics.gauge('records_queued', queued)
+    try:
+        with ProcessPoolExecutor(max_workers=workers or None) as executor:
+            for digital_record_id, dc, error in executor.map(convert_record, jobs, chunksize=chunksize):
+                metrics.gauge('records_queued', -1)
+                queued -= 1
+                if error:
+                    metrics.count('errors_total', kind=error[0])
+                    sys.stderr.write('could not convert {}: {}: {}\n'.format(digital_record_id, *error))
+                else:
+                    metrics.count('records_total')
+                yield digital_record_id, dc, error
+    finally:
+        metrics.gauge('records_queued', -queued)
+
+def read_noids(path):
+    noids = {}
+    if not os.path.exists(path):
+        return noids
+    with open(path) as f:
+        for row in csv.reader(f):
+            if len(row) >= 2:
+                noids[row[0].strip()] = row[1].strip()
+    return noids
+
+def append_noids(path, pairs):
+    """Add (digital_record_id, noid) rows to a CSV file."""
+    with open(path, 'a', newline='') as f:
+        csv.writer(f).writerows(pairs)
+        f.flush()
+        os.fsync(f.fileno())
+
+def main():
     options = docopt(__doc__)
-    sys.stdout.write(
-        marc_to_dc_soc_sci(
-            options['<digital_record_id>'],
-            options['<noid>']
+
+    if options['--batch']:
+        if options['--socscimaps']:
+            converter = SocSciMapsMarcXmlToDc
+        else:
+            converter = MarcXmlToDc
+
+        noids_path = options['--noids']
+        noids = read_noids(noids_path)
+        failed = 0
+
+        with start_metrics(
+            options['--metrics'],
+            float(options['--metrics-interval']),
+            int(options['--metrics-port']) if options['--metrics-port'] else None
+        ):
+            results = marc_to_dc_batch(
+                options['<path>'],
+                converter,
+                noids,
+                int(options['--workers']),
+                int(options['--chunksize']),
+                lambda pairs: append_noids(noids_path, pairs)
+            )
+
+            if options['--outdir']:
+                os.makedirs(options['--outdir'], exist_ok=True)
+                for digital_record_id, dc, error in results:
+                    if error:
+                        failed += 1
+                        continue
+                    with open(os.path.join(options['--outdir'], '{}.dc.xml'.format(digital_record_id)), 'w', encoding='utf-8') as f:
+                        f.write(dc)
+            else:
+                sys.stdout.write('<collection>\n')
+                for _, dc, error in results:
+                    if error:
+                        failed += 1
+                        continue
+                    sys.stdout.write('{}\n'.format(dc))
+                sys.stdout.write('</collection>\n')
+        if failed:
+            sys.exit(1)
+    else:
+        if options['--profile'] or options['--pstats']:
+            profiler.enable(options['--pstats'])
+        sys.stdout.write(
+            marc_to_dc_soc_sci(
+                options['<digital_record_id>'],
+                options['<noid>']
+            )
         )
-    )
+        profiler.summary(sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+#!/usr/bin/env python
+"""Convert MARCXML to Schema.org JSON-LD, Facebook Open Graph and Twitter Card
+metadata for a page's <head>"""
+
+import sys
+from . import MarcXmlToWebMetadata
+
+def main():
+    sys.stdout.write(str(MarcXmlToWebMetadata(sys.stdin.read())))
+
+if __name__ == "__main__":
+    main()
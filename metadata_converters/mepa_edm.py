@@ -1,5 +1,11 @@
 #!/usr/bin/env python
-"""Usage: mepa_edm <work_refid>
+"""Usage: mepa_edm [--profile] [--pstats=<dir>] <work_refid>
+
+Options:
+    --profile       Write the time spent in each stage to stderr. Also on
+                    when METADATA_CONVERTERS_PROFILE=1 is set.
+    --pstats=<dir>  Profile the conversion with cProfile, and write the stats
+                    to <dir>/<work_refid>.pstats. Implies --profile.
 """
 
 import copy
@@ -8,6 +14,7 @@ import urllib.parse
 import sys
 import xml.etree.ElementTree as ElementTree
 from docopt import docopt
+from profiling import profiler
 from rdflib import Graph, Literal, Namespace, URIRef
 from rdflib.namespace import RDF, DC, DCTERMS, XSD
 from classes import BASE, BF, EDM, ERC, MADSRDF, MIX, OAI, ORE, PREMIS, PREMIS2, PREMIS3, VRA
@@ -381,14 +388,18 @@ class MepaToEDM(DigitalCollectionToEDM):
         Returns:
             str
         """
-        return self.graph.serialize(format='turtle', base=BASE).decode("utf-8")
+        with profiler.stage('serialize'):
+            return self.graph.serialize(format='turtle', base=BASE).decode("utf-8")
 
 
 if __name__ == "__main__":
     options = docopt(__doc__)
+    if options['--profile'] or options['--pstats']:
+        profiler.enable(options['--pstats'])
 
     # get input data.
-    tmp = ElementTree.parse('input/vcExport_v2.xml')
+    with profiler.stage('vra parse'):
+        tmp = ElementTree.parse('input/vcExport_v2.xml')
     vra = ElementTree.Element('{http://www.vraweb.org/vracore4.htm}vra')
 
     # get the work.
@@ -405,10 +416,13 @@ if __name__ == "__main__":
     ):
         vra.append(copy.deepcopy(e))
 
-    edm = MepaToEDM(
-        vra,
-        'example'
-    )
-    edm.build_work_triples()
-    edm.build_recto_verso_triples()
-    sys.stdout.write(edm.triples())
+    with profiler.record(options['<work_refid>']):
+        edm = MepaToEDM(
+            vra,
+            'example'
+        )
+        with profiler.stage('graph'):
+            edm.build_work_triples()
+            edm.build_recto_verso_triples()
+        sys.stdout.write(edm.triples())
+    profiler.summary(sys.stderr)
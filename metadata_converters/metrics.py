@@ -0,0 +1,273 @@
+"""Metrics for long batch runs.
+
+Counters, gauges and histograms that the batch converters update as they
+go, e.g.:
+
+    metrics.count('records_total')
+    metrics.gauge('records_fetching', 1)
+    with metrics.timer('fetch_seconds', source='solr'):
+        ...
+
+Nothing is recorded until start() is called, e.g. by a script run with
+--metrics=<path>. After that, a snapshot is appended to <path> as a JSON
+line every interval, and with --metrics-port=<port> the current values are
+also served at http://localhost:<port>/metrics in the Prometheus text
+format.
+"""
+
+import bisect, contextlib, datetime, http.server, json, threading, time
+
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PREFIX = 'metadata_converters_'
+
+NULL_TIMER = contextlib.nullcontext()
+
+
+def series(name, labels):
+    """A Prometheus style series name, e.g. 'fetch_seconds{source="solr"}'."""
+    if not labels:
+        return name
+    return '{}{{{}}}'.format(name, ','.join(
+        '{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+        for k, v in labels
+    ))
+
+
+class Timer:
+    __slots__ = ('metrics', 'name', 'labels', 'start')
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Metrics:
+    """Thread safe counters, gauges and histograms, each keyed by name and
+    labels."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.enabled = False
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def count(self, name, n=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def gauge(self, name, n, **labels):
+        """Add n, which can be negative, to a gauge."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.gauges[key] = self.gauges.get(key, 0) + n
+
+    @contextlib.contextmanager
+    def in_progress(self, name, **labels):
+        """Count something in a gauge while it's in progress, e.g. records
+        waiting for a worker."""
+        self.gauge(name, 1, **labels)
+        try:
+            yield
+        finally:
+            self.gauge(name, -1, **labels)
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts, _ = self.histograms[key]
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.histograms[key][1] += value
+
+    def timer(self, name, **labels):
+        if not self.enabled:
+            return NULL_TIMER
+        return Timer(self, name, labels)
+
+    def reset(self):
+        """Clear every value."""
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        """Current values. Histogram buckets are cumulative, as in
+        Prometheus.
+
+        Returns:
+            dict
+        """
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            histograms = {k: (list(v[0]), v[1]) for k, v in self.histograms.items()}
+
+        snapshot = {
+            'counters': {series(n, l): v for (n, l), v in sorted(counters.items())},
+            'gauges': {series(n, l): v for (n, l), v in sorted(gauges.items())},
+            'histograms': {},
+            'time': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'uptime_seconds': round(time.time() - self.started, 3)
+        }
+        for (n, l), (counts, total) in sorted(histograms.items()):
+            cumulative, buckets = 0, {}
+            for le, c in zip(self.buckets + ('+Inf',), counts):
+                cumulative += c
+                buckets[str(le)] = cumulative
+            snapshot['histograms'][series(n, l)] = {
+                'buckets': buckets,
+                'count': cumulative,
+                'sum': round(total, 6)
+            }
+        return snapshot
+
+    def prometheus(self):
+        """Current values in the Prometheus text exposition format.
+
+        Returns:
+            str
+        """
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            histograms = {k: (list(v[0]), v[1]) for k, v in self.histograms.items()}
+
+        lines = []
+        for kind, values in (('counter', counters), ('gauge', gauges)):
+            typed = set()
+            for (n, l), v in sorted(values.items()):
+                if n not in typed:
+                    lines.append('# TYPE {}{} {}'.format(PREFIX, n, kind))
+                    typed.add(n)
+                lines.append('{} {}'.format(series(PREFIX + n, l), v))
+
+        typed = set()
+        for (n, l), (counts, total) in sorted(histograms.items()):
+            if n not in typed:
+                lines.append('# TYPE {}{} histogram'.format(PREFIX, n))
+                typed.add(n)
+            cumulative = 0
+            for le, c in zip(self.buckets + ('+Inf',), counts):
+                cumulative += c
+                lines.append('{} {}'.format(
+                    series(PREFIX + n + '_bucket', l + (('le', le),)), cumulative))
+            lines.append('{} {}'.format(series(PREFIX + n + '_sum', l), total))
+            lines.append('{} {}'.format(series(PREFIX + n + '_count', l), cumulative))
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
+
+
+class SnapshotWriter(threading.Thread):
+    """Append a snapshot to a file as a JSON line every interval, and once
+    more when stopped. Each snapshot also has the records/sec since the last
+    one, from the records_total counter."""
+
+    def __init__(self, metrics, path, interval):
+        super().__init__(daemon=True)
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.last = (time.time(), 0)
+
+    def write(self):
+        snapshot = self.metrics.snapshot()
+        now = time.time()
+        records = snapshot['counters'].get('records_total', 0)
+        then, last_records = self.last
+        snapshot['records_per_second'] = round((records - last_records) / max(now - then, 1e-9), 3)
+        self.last = (now, records)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(snapshot, sort_keys=True) + '\n')
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.write()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.write()
+
+
+def serve_prometheus(metrics, port, host=''):
+    """Serve metrics at /metrics from a daemon thread.
+
+    Returns:
+        http.server.ThreadingHTTPServer: call shutdown() to stop it.
+    """
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+@contextlib.contextmanager
+def start(path=None, interval=60, port=None):
+    """Record metrics for the duration of a batch run. Afterwards, metrics
+    are cleared and turned off again, so a later run in the same process
+    starts from zero.
+
+    Args:
+        path (str): append JSON-lines snapshots to this file.
+        interval (float): seconds between snapshots.
+        port (int): serve the Prometheus text format on this port.
+    """
+    if not path and port is None:
+        yield metrics
+        return
+
+    enabled = metrics.enabled
+    metrics.enabled = True
+    metrics.started = time.time()
+    writer = server = None
+    if path:
+        writer = SnapshotWriter(metrics, path, interval)
+        writer.start()
+    if port is not None:
+        server = serve_prometheus(metrics, port)
+    try:
+        yield metrics
+    finally:
+        if writer:
+            writer.stop()
+        if server:
+            server.shutdown()
+            server.server_close()
+        metrics.enabled = enabled
+        metrics.reset()
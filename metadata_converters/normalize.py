@@ -0,0 +1,62 @@
+"""Text normalization for MARC subfield values.
+
+These functions run for nearly every subfield a crosswalk looks at, and the
+same values (place names, publishers, headings) come up again and again
+across a collection, so results are memoized.
+"""
+
+import functools, re
+
+# find every occurrence of either four digits in a row or three digits
+# followed by a dash.
+DATE_CHUNK = re.compile('[0-9]{3}[0-9-]')
+
+# '$' also matches just before a trailing newline, so values that end in a
+# newline go through the original regular expression.
+TRAILING_MARC_PUNCTUATION = re.compile('[ .,:;]*$')
+
+
+@functools.lru_cache(maxsize=4096)
+def remove_marc_punctuation(s):
+    """Strip leading whitespace, trailing ISBD punctuation and enclosing
+    square brackets.
+
+    Args:
+        s (str): a subfield value, e.g. '[Chicago] :'
+
+    Returns:
+        str: e.g. 'Chicago'
+    """
+    s = s.lstrip()
+    if s.endswith('\n'):
+        s = TRAILING_MARC_PUNCTUATION.sub('', s)
+    else:
+        s = s.rstrip(' .,:;')
+    if s[0] == '[' and s[-1] == ']':
+        s = s[1:-1]
+    return s
+
+@functools.lru_cache(maxsize=4096)
+def process_date_string(s):
+    """Get a date or a date range from a 260 $c or 264 $c.
+
+    Args:
+        s (str): e.g. '[192-]'
+
+    Returns:
+        str: e.g. '1920/1929'
+    """
+    dates = DATE_CHUNK.findall(s)
+    # if there are two date chunks in the string, assume they are a date
+    # range. (e.g. 'yyyy-yyyy'
+    if len(dates) == 2:
+        return '/'.join(dates)
+    # if the date is three digits followed by a dash, assume it is a
+    # date range for a decade. (e.g. 'yyy0-yyy9')
+    elif len(dates) == 1 and dates[0][-1] == '-':
+        return '{0}0/{0}9'.format(dates[0][:3])
+    # otherwise assume that the four digit date is correct.
+    elif len(dates) == 1:
+        return dates[0]
+    else:
+        return ''
@@ -0,0 +1,389 @@
+"""Write OCFL objects into the pair tree.
+
+Each object goes in NoidManager.path(noid) under a storage root, laid out as
+in the OCFL 1.0 spec (https://ocfl.io/1.0/spec/), with a single version:
+
+    0=ocfl_object_1.0
+    inventory.json
+    inventory.json.sha512
+    v1/inventory.json
+    v1/inventory.json.sha512
+    v1/content/...
+
+An object is assembled in a staging directory next to its final location,
+named <path>.partial-<random>, and renamed into place when it's committed.
+NoidManager.list() skips staging directories, so it never returns a
+partial object. Files are copied in a single pass that also computes their
+digests, so a master file is only read once. Copies and hashlib both
+release the GIL, so several objects can be written at once from a pool of
+threads.
+
+When master files are on the same filesystem as the pair tree they don't
+have to be copied at all. With placement='link' content is hard linked
+into the object, and with placement='reflink' it's cloned (FICLONE), or
+failing that copied by the kernel with copy_file_range(), which some
+filesystems turn into a clone or a server side copy. Either way, if the
+filesystem can't do it, the file is copied as usual. Digests for linked
+and cloned files come from a DigestCache, so a master file that was
+hashed before isn't read again.
+"""
+
+import datetime, errno, hashlib, json, os, shutil, threading, uuid
+
+try:
+    from .classes import NoidManager
+    from .metrics import metrics
+except ImportError:
+    from classes import NoidManager
+    from metrics import metrics
+
+BUFFER_SIZE = 8 * 1024 * 1024
+DIGEST_ALGORITHM = 'sha512'
+FIXITY_ALGORITHMS = ('md5',)
+INVENTORY_TYPE = 'https://ocfl.io/1.0/spec/#inventory'
+NAMASTE = '0=ocfl_object_1.0'
+
+COPY = 'copy'
+LINK = 'link'
+REFLINK = 'reflink'
+PLACEMENTS = (COPY, LINK, REFLINK)
+
+# from linux/fs.h.
+FICLONE = 0x40049409
+
+# errors that mean a filesystem can't link or clone a file, rather than
+# that something is wrong.
+UNSUPPORTED = {
+    errno.EINVAL, errno.EMLINK, errno.ENOSYS, errno.ENOTSUP, errno.ENOTTY,
+    errno.EOPNOTSUPP, errno.EPERM, errno.EXDEV
+}
+
+
+def write_atomic(path, data):
+    """Write bytes to a file so that it's either complete or not there at
+    all."""
+    tmp = '{}.tmp'.format(path)
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def copy_with_digests(src, dst, algorithms=(DIGEST_ALGORITHM,) + FIXITY_ALGORITHMS, buffer_size=BUFFER_SIZE):
+    """Copy a file, computing its digests from the same reads.
+
+    Returns:
+        dict: the size and a hex digest for each algorithm.
+    """
+    hashes = [(a, hashlib.new(a)) for a in algorithms]
+    size = 0
+    buf = bytearray(buffer_size)
+    view = memoryview(buf)
+    with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+        while True:
+            n = fin.readinto(buf)
+            if not n:
+                break
+            chunk = view[:n]
+            for _, h in hashes:
+                h.update(chunk)
+            fout.write(chunk)
+            size += n
+        fout.flush()
+        os.fsync(fout.fileno())
+
+    digests = {a: h.hexdigest() for a, h in hashes}
+    digests['size'] = size
+    return digests
+
+def file_digests(path, algorithms=(DIGEST_ALGORITHM,) + FIXITY_ALGORITHMS, buffer_size=BUFFER_SIZE):
+    """Digests of a file, read in chunks.
+
+    Returns:
+        dict: the size and a hex digest for each algorithm.
+    """
+    hashes = [(a, hashlib.new(a)) for a in algorithms]
+    size = 0
+    buf = bytearray(buffer_size)
+    view = memoryview(buf)
+    with open(path, 'rb') as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            for _, h in hashes:
+                h.update(view[:n])
+            size += n
+
+    digests = {a: h.hexdigest() for a, h in hashes}
+    digests['size'] = size
+    return digests
+
+def stat_key(st):
+    return [st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns]
+
+
+class DigestCache:
+    """Digests of source files, kept in a JSON file.
+
+    An entry is only used while the file's device, inode, size and
+    modification time are the same as when it was hashed, e.g.:
+
+        {
+            "/data/.../tifs/1.tif": {
+                "digests": {"md5": "...", "sha512": "...", "size": 100},
+                "stat": [2049, 1234, 100, 1614600000000000000]
+            }
+        }
+
+    Pass path=None to keep the cache in memory only.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        if path:
+            try:
+                with open(path) as f:
+                    self.entries = json.load(f)
+            except FileNotFoundError:
+                pass
+
+    def get(self, path, st):
+        with self.lock:
+            entry = self.entries.get(os.path.abspath(path))
+        if entry is None or entry['stat'] != stat_key(st):
+            return None
+        return entry['digests']
+
+    def put(self, path, st, digests):
+        with self.lock:
+            self.entries[os.path.abspath(path)] = {
+                'digests': digests,
+                'stat': stat_key(st)
+            }
+
+    def digests(self, path, st):
+        """Digests of a file, read from it only if they aren't cached."""
+        digests = self.get(path, st)
+        if digests is None:
+            digests = file_digests(path)
+            for a in (DIGEST_ALGORITHM,) + FIXITY_ALGORITHMS:
+                metrics.count('bytes_hashed_total', digests['size'], algorithm=a)
+            self.put(path, st, digests)
+        return digests
+
+    def save(self):
+        """Write the cache, replacing the old one atomically."""
+        if not self.path:
+            return
+        with self.lock:
+            data = json.dumps(self.entries, indent=2, sort_keys=True)
+        write_atomic(self.path, data.encode('utf-8'))
+
+def clone(src, dst):
+    """Clone a file with FICLONE, sharing its blocks on filesystems that
+    support it, like btrfs and XFS."""
+    import fcntl
+    with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+        fcntl.ioctl(fout.fileno(), FICLONE, fin.fileno())
+
+def kernel_copy(src, dst):
+    """Copy a file with copy_file_range(), so the data doesn't pass through
+    userspace."""
+    if not hasattr(os, 'copy_file_range'):
+        raise OSError(errno.ENOSYS, 'copy_file_range is not available.')
+    with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+        remaining = os.fstat(fin.fileno()).st_size
+        while remaining > 0:
+            n = os.copy_file_range(fin.fileno(), fout.fileno(), remaining)
+            if n == 0:
+                break
+            remaining -= n
+        fout.flush()
+        os.fsync(fout.fileno())
+
+def place_file(src, dst, placement=COPY, cache=None):
+    """Put a file at dst, linking or cloning it if placement asks for that
+    and the filesystem allows it, and copying it otherwise.
+
+    Linked and cloned files aren't read: their digests come from cache, and
+    the source is checked afterwards to make sure it didn't change while it
+    was being placed. Note that a hard linked master file is the same file
+    as the one in the object, so it mustn't be edited in place afterwards.
+
+    Args:
+        src (str): path to the file.
+        dst (str): path in the object.
+        placement (str): COPY, LINK or REFLINK.
+        cache (DigestCache)
+
+    Returns:
+        tuple: how the file was placed ('copy', 'link', 'reflink' or
+        'copy_file_range'), and its size and digests.
+    """
+    if placement not in PLACEMENTS:
+        raise ValueError('placement must be one of {}.'.format(', '.join(PLACEMENTS)))
+    if cache is None:
+        cache = DigestCache()
+
+    st = os.stat(src)
+    if placement != COPY:
+        if placement == LINK:
+            attempts = ((LINK, os.link),)
+        else:
+            attempts = ((REFLINK, clone), ('copy_file_range', kernel_copy))
+        for method, place in attempts:
+            try:
+                place(src, dst)
+            except OSError as e:
+                if e.errno not in UNSUPPORTED:
+                    raise
+                if os.path.lexists(dst):
+                    os.remove(dst)
+                continue
+            if stat_key(os.stat(src)) != stat_key(st) or os.path.getsize(dst) != st.st_size:
+                # the source changed under us, so no cached digest can be
+                # trusted. Copy it instead.
+                os.remove(dst)
+                break
+            digests = cache.digests(src, st)
+            metrics.count('bytes_placed_total', st.st_size, method=method)
+            return method, digests
+
+    digests = copy_with_digests(src, dst)
+    metrics.count('bytes_placed_total', digests['size'], method=COPY)
+    if stat_key(os.stat(src)) == stat_key(st):
+        cache.put(src, st, digests)
+    return COPY, digests
+
+def object_path(root, noid):
+    return os.path.join(root, NoidManager(root).path(noid))
+
+
+class OcflObject:
+    """A new OCFL object, assembled in a staging directory.
+
+    Use it as a context manager, so that the staging directory is removed
+    if anything goes wrong before commit():
+
+        with OcflObject(root, noid) as obj:
+            obj.add_file('/path/to/master.tif', 'file.tif')
+            obj.add_bytes(dc.encode('utf-8'), 'file.dc.xml')
+            obj.commit('Initial ingest.')
+    """
+
+    def __init__(self, root, noid, placement=COPY, cache=None):
+        self.noid = noid
+        self.placement = placement
+        self.cache = cache
+        self.path = object_path(root, noid)
+        if os.path.exists(self.path):
+            raise FileExistsError('an object already exists at {}.'.format(self.path))
+        self.staging = '{}{}{}'.format(self.path, NoidManager.staging_marker, uuid.uuid4().hex[:8])
+        self.content = os.path.join(self.staging, 'v1', 'content')
+        os.makedirs(self.content)
+        self.files = {}
+        self.committed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if not self.committed:
+            self.abort()
+        return False
+
+    def content_path(self, name):
+        if os.path.isabs(name) or '..' in name.split('/'):
+            raise ValueError('{} is not a relative path inside the object.'.format(name))
+        path = os.path.join(self.content, *name.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def add_file(self, src, name):
+        """Copy a file into the object.
+
+        Args:
+            src (str): path to the file.
+            name (str): logical path in the object, e.g. 'file.tif'.
+
+        Returns:
+            dict: the file's size and digests.
+        """
+        _, self.files[name] = place_file(src, self.content_path(name), self.placement, self.cache)
+        return self.files[name]
+
+    def add_bytes(self, data, name):
+        """Write bytes into the object as a file.
+
+        Returns:
+            dict: the file's size and digests.
+        """
+        write_atomic(self.content_path(name), data)
+        digests = {a: hashlib.new(a, data).hexdigest() for a in (DIGEST_ALGORITHM,) + FIXITY_ALGORITHMS}
+        digests['size'] = len(data)
+        self.files[name] = digests
+        return digests
+
+    def inventory(self, message, user=None, created=None):
+        """Returns:
+            dict: an OCFL inventory for the files added so far.
+        """
+        manifest, state = {}, {}
+        fixity = {a: {} for a in FIXITY_ALGORITHMS}
+        for name, digests in sorted(self.files.items()):
+            content_path = 'v1/content/{}'.format(name)
+            manifest.setdefault(digests[DIGEST_ALGORITHM], []).append(content_path)
+            state.setdefault(digests[DIGEST_ALGORITHM], []).append(name)
+            for a in FIXITY_ALGORITHMS:
+                fixity[a].setdefault(digests[a], []).append(content_path)
+
+        version = {
+            'created': created or datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'message': message,
+            'state': state
+        }
+        if user:
+            version['user'] = user
+        return {
+            'digestAlgorithm': DIGEST_ALGORITHM,
+            'fixity': fixity,
+            'head': 'v1',
+            'id': 'ark:61001/{}'.format(self.noid),
+            'manifest': manifest,
+            'type': INVENTORY_TYPE,
+            'versions': {'v1': version}
+        }
+
+    def commit(self, message, user=None, created=None):
+        """Write the inventories, their sidecars and the object declaration,
+        and move the object into the pair tree.
+
+        Args:
+            message (str): a description of the version.
+            user (dict): 'name' and optionally 'address' of who made it.
+            created (str): ISO 8601 date-time. Defaults to now.
+
+        Returns:
+            dict: the inventory.
+        """
+        inventory = self.inventory(message, user, created)
+        data = json.dumps(inventory, indent=2, sort_keys=True).encode('utf-8')
+        sidecar = '{}  inventory.json\n'.format(hashlib.sha512(data).hexdigest()).encode('utf-8')
+        for d in (os.path.join(self.staging, 'v1'), self.staging):
+            write_atomic(os.path.join(d, 'inventory.json'), data)
+            write_atomic(os.path.join(d, 'inventory.json.{}'.format(DIGEST_ALGORITHM)), sidecar)
+        # NoidManager.list() skips the staging directory, so the object
+        # only appears there once it's renamed into place.
+        write_atomic(os.path.join(self.staging, NAMASTE), b'ocfl_object_1.0\n')
+
+        if os.path.exists(self.path):
+            raise FileExistsError('an object already exists at {}.'.format(self.path))
+        os.rename(self.staging, self.path)
+        self.committed = True
+        return inventory
+
+    def abort(self):
+        shutil.rmtree(self.staging, ignore_errors=True)
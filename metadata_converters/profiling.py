@@ -0,0 +1,153 @@
+"""Per-stage timers for the conversion scripts.
+
+Wrap each stage of a conversion in profiler.stage(), e.g.:
+
+    with profiler.stage('serialize'):
+        ttl = graph.serialize(format='turtle')
+
+and each record in profiler.record(). Profiling is off unless a script is
+run with --profile or METADATA_CONVERTERS_PROFILE=1 is set. While it's off,
+stage() and record() return a shared no-op context manager, so the timers
+can stay in the code. Set METADATA_CONVERTERS_PSTATS=<dir>, or use
+--pstats=<dir>, to also write a cProfile dump of each record to
+<dir>/<record>.pstats.
+"""
+
+import collections, contextlib, os, re, threading, time
+
+NULL_STAGE = contextlib.nullcontext()
+
+
+class Stage:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    """Totals of calls and seconds for each stage, and counters. Stages can
+    nest, e.g. hashing inside graph building, and can be timed from several
+    threads at once, so stage totals can add up to more than the run."""
+
+    def __init__(self):
+        self.enabled = False
+        self.pstats_dir = None
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.counters = collections.Counter()
+
+    @classmethod
+    def from_environment(cls):
+        profiler = cls()
+        if os.environ.get('METADATA_CONVERTERS_PROFILE') or os.environ.get('METADATA_CONVERTERS_PSTATS'):
+            profiler.enable(os.environ.get('METADATA_CONVERTERS_PSTATS'))
+        return profiler
+
+    def enable(self, pstats_dir=None):
+        """Turn on timers. The environment is updated too, so that worker
+        processes started after this are profiled as well.
+
+        Args:
+            pstats_dir (str): write a cProfile dump of each record here.
+        """
+        self.enabled = True
+        os.environ['METADATA_CONVERTERS_PROFILE'] = '1'
+        if pstats_dir:
+            os.makedirs(pstats_dir, exist_ok=True)
+            self.pstats_dir = pstats_dir
+            os.environ['METADATA_CONVERTERS_PSTATS'] = pstats_dir
+
+    def stage(self, name):
+        if not self.enabled:
+            return NULL_STAGE
+        return Stage(self, name)
+
+    def record(self, name):
+        """Profile a single record with cProfile. cProfile only sees the
+        thread it was started in, so wrap work that runs in one thread."""
+        if not self.pstats_dir:
+            return NULL_STAGE
+        return self.profile_record(name)
+
+    @contextlib.contextmanager
+    def profile_record(self, name):
+        import cProfile
+
+        p = cProfile.Profile()
+        p.enable()
+        try:
+            yield p
+        finally:
+            p.disable()
+            p.dump_stats(os.path.join(
+                self.pstats_dir,
+                '{}.pstats'.format(re.sub(r'[^\w.-]', '_', str(name)))
+            ))
+
+    def add(self, name, seconds):
+        with self.lock:
+            calls, total = self.stages.get(name, (0, 0.0))
+            self.stages[name] = (calls + 1, total + seconds)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] += n
+
+    def drain(self):
+        """Return and reset what has been recorded, e.g. so that a worker
+        process can send it back to be merged into the parent's totals.
+
+        Returns:
+            tuple: stages and counters as plain dicts.
+        """
+        with self.lock:
+            stages, counters = self.stages, dict(self.counters)
+            self.stages = {}
+            self.counters = collections.Counter()
+        return stages, counters
+
+    def merge(self, drained):
+        stages, counters = drained
+        with self.lock:
+            for name, (calls, seconds) in stages.items():
+                c, s = self.stages.get(name, (0, 0.0))
+                self.stages[name] = (c + calls, s + seconds)
+            self.counters.update(counters)
+
+    def summary(self, out):
+        """Write a table of stages, slowest first, and counters. Does
+        nothing if profiling is off.
+
+        Args:
+            out: a writable text stream, e.g. sys.stderr.
+        """
+        if not self.enabled:
+            return
+        out.write('{:<20} {:>8} {:>11} {:>10}\n'.format('stage', 'calls', 'seconds', 'mean ms'))
+        for name, (calls, seconds) in sorted(self.stages.items(), key=lambda s: -s[1][1]):
+            out.write('{:<20} {:>8} {:>11.3f} {:>10.3f}\n'.format(
+                name, calls, seconds, seconds / calls * 1000))
+        for name, n in sorted(self.counters.items()):
+            out.write('{:<20} {:>8}\n'.format(name, n))
+
+profiler = Profiler.from_environment()
+
+def collect(fn, *args):
+    """Call a function in a worker process and return its result along with
+    the stage times it recorded, for the parent to merge.
+
+    Returns:
+        tuple: fn's result, and profiler.drain().
+    """
+    return fn(*args), profiler.drain()
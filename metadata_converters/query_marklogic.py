@@ -1,9 +1,15 @@
 #!/usr/bin/env python
 """Usage:
-    query_marklogic <collection>
+    query_marklogic [--page-size=<n>] [--url=<url>] <collection>
+
+Options:
+    --page-size=<n>  Number of triples requested from MarkLogic at a time.
+                     [default: 50000]
+    --url=<url>      SPARQL endpoint. Defaults to $MARKLOGIC_SPARQL_URL, or
+                     the library's MarkLogic server.
 """
 
-import json, os, requests, sys
+import codecs, json, os, re, requests, sys
 from docopt import docopt
 from requests.auth import HTTPBasicAuth
 
@@ -11,47 +17,200 @@ from requests.auth import HTTPBasicAuth
 # command:
 # curl --anyauth --user user:password -X DELETE http://server:port/v1/graphs?graph=collection
 
+SPARQL_URL = 'http://marklogic.lib.uchicago.edu:8008/v1/graphs/sparql'
+
+BINDINGS_START = re.compile(r'"bindings"\s*:\s*\[')
+
+WRITE_BUFFER_SIZE = 1 << 20
+
+def iter_bindings(chunks):
+    """Incrementally parse the bindings of a SPARQL JSON result.
+
+    Only the current binding is held in memory, so a result of any size can
+    be read from a streamed response.
+
+    Args:
+        chunks (iterable): the response body, as strings or bytes.
+
+    Returns:
+        a generator of binding dicts, e.g.
+        {'s': {'type': 'uri', 'value': 'http://...'}, ...}
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+
+    def read():
+        for chunk in chunks:
+            if isinstance(chunk, bytes):
+                chunk = utf8.decode(chunk)
+            if chunk:
+                return chunk
+        return None
+
+    buf = ''
+    while True:
+        m = BINDINGS_START.search(buf)
+        if m:
+            break
+        chunk = read()
+        if chunk is None:
+            return
+        buf += chunk
+    buf = buf[m.end():]
+
+    pos = 0
+    while True:
+        while pos < len(buf) and buf[pos] in ' \t\r\n,':
+            pos += 1
+        if pos == len(buf):
+            chunk = read()
+            if chunk is None:
+                raise ValueError('SPARQL result ended inside the bindings.')
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+        if buf[pos] == ']':
+            return
+        try:
+            binding, pos = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            chunk = read()
+            if chunk is None:
+                raise
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+        yield binding
+
+def escape_literal(value):
+    return value.replace('\\', '\\\\') \
+                .replace('"', '\\"') \
+                .replace('\n', '\\n') \
+                .replace('\r', '\\r')
+
+def format_term(term):
+    """Format a SPARQL JSON term as N-Triples.
+
+    Args:
+        term (dict): a term from a binding.
+
+    Returns:
+        str
+    """
+    if term['type'] == 'uri':
+        return '<{}>'.format(term['value'])
+    elif term['type'] == 'bnode':
+        return '_:{}'.format(term['value'])
+    elif term['type'] in ('literal', 'typed-literal'):
+        if 'datatype' in term:
+            return '"{}"^^<{}>'.format(
+                escape_literal(term['value']),
+                term['datatype']
+            )
+        elif 'xml:lang' in term:
+            return '"{}"@{}'.format(
+                escape_literal(term['value']),
+                term['xml:lang']
+            )
+        else:
+            return '"{}"'.format(escape_literal(term['value']))
+    else:
+        raise ValueError('unknown term type {}'.format(term['type']))
+
+def format_triple(binding):
+    return '{} {} {} .\n'.format(
+        format_term(binding['s']),
+        format_term(binding['p']),
+        format_term(binding['o'])
+    )
+
+def query_collection(session, url, collection, page_size=50000):
+    """Query every triple in a named graph, a page at a time.
+
+    Pages are ordered so that LIMIT/OFFSET paging is stable, and each
+    response is parsed as it streams in.
+
+    Args:
+        session (requests.Session): a session, so that the connection is
+        kept alive between pages.
+        url (str): the SPARQL endpoint.
+        collection (str): the named graph.
+        page_size (int): triples per request.
+
+    Returns:
+        a generator of bindings.
+    """
+    offset = 0
+    while True:
+        r = session.get(
+            url,
+            headers={
+                'Accept': 'application/sparql-results+json'
+            },
+            params={
+                'query': 'select ?s ?p ?o from <{}> where {{ ?s ?p ?o . }} order by ?s ?p ?o limit {} offset {}'.format(
+                    collection,
+                    page_size,
+                    offset
+                )
+            },
+            stream=True
+        )
+        r.raise_for_status()
+        n = 0
+        with r:
+            for binding in iter_bindings(r.iter_content(chunk_size=65536)):
+                n += 1
+                yield binding
+        if n < page_size:
+            return
+        offset += page_size
+
+def write_ntriples(bindings, out):
+    """Write bindings as N-Triples.
+
+    Args:
+        bindings (iterable): SPARQL JSON bindings for ?s ?p ?o.
+        out: a text file object.
+
+    Returns:
+        int: the number of triples written.
+    """
+    n = 0
+    for binding in bindings:
+        out.write(format_triple(binding))
+        n += 1
+    return n
+
 def main():
     options = docopt(__doc__)
 
-    r = requests.get(
-        auth=HTTPBasicAuth(
-            os.environ['MARKLOGIC_LDR_USER'],
-            os.environ['MARKLOGIC_LDR_PASSWORD']
-        ),  
-        headers={
-            'Content-type': 'text/turtle'
-        },  
-        params={
-            'query': 'select ?s ?p ?o from <{}> where {{ ?s ?p ?o . }}'.format(
-                options['<collection>']
-            )
-        },
-        url='http://marklogic.lib.uchicago.edu:8008/v1/graphs/sparql'
+    session = requests.Session()
+    session.auth = HTTPBasicAuth(
+        os.environ['MARKLOGIC_LDR_USER'],
+        os.environ['MARKLOGIC_LDR_PASSWORD']
     )
 
-    for r in json.loads(
-        r.content.decode('utf-8')
-    )['results']['bindings']:
-        if r['o']['type'] == 'uri':
-            formatted_string = '<{}> <{}> <{}> .'
-        elif 'datatype' in r['o']:
-            if r['o']['datatype'] == 'http://www.w3.org/2001/XMLSchema#integer':
-                formatted_string = '<{}> <{}> {} .'
-            elif r['o']['datatype'] == 'http://www.w3.org/2001/XMLSchema#dateTime':
-                formatted_string = '<{}> <{}> "{}" .'
-            else:
-                raise NotImplementedError
-        elif r['o']['type'] == 'literal':
-            formatted_string = '<{}> <{}> "{}" .'
-        else:
-            raise NotImplementedError
+    url = options['--url'] or os.environ.get('MARKLOGIC_SPARQL_URL', SPARQL_URL)
 
-        print(formatted_string.format(
-            r['s']['value'], 
-            r['p']['value'],
-            r['o']['value']
-        ))
+    out = open(
+        sys.stdout.fileno(),
+        'w',
+        encoding='utf-8',
+        buffering=WRITE_BUFFER_SIZE,
+        closefd=False
+    )
+    with out:
+        write_ntriples(
+            query_collection(
+                session,
+                url,
+                options['<collection>'],
+                int(options['--page-size'])
+            ),
+            out
+        )
 
 if __name__=="__main__":
     main()
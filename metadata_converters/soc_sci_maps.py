@@ -1,17 +1,42 @@
 #!/usr/bin/env python
 """Usage:
     soc_sci_maps --cat-dc <digital_record_id>
-    soc-sci_maps --cat-edm <digital_record_id>
-    soc_sci_maps --create <digital_record_id>
+    soc_sci_maps --cat-edm <digital_record_id>
+    soc_sci_maps --create [--workers=<n>] [--placement=<method>] [--digest-cache=<path>] <digital_record_id>...
+
+Options:
+    --create       Create a new OCFL object in the pair tree for each record,
+                   with its master file, DC and EDM, and print each digital
+                   record id with its new NOID as soon as the object is
+                   written. Records that fail are reported on stderr,
+                   and the rest are still created.
+    --workers=<n>  Number of objects to create at a time. [default: 4]
+    --placement=<method>
+                   How to put master files in objects: copy, link (hard
+                   link) or reflink (clone, or copy_file_range). link and
+                   reflink fall back to copy when the master files are on
+                   a different filesystem from the pair tree.
+                   [default: copy]
+    --digest-cache=<path>
+                   Keep master file digests in this JSON file, so linked
+                   or cloned files that were hashed before aren't read
+                   again.
 """
 
-import io, json, hashlib, os, paramiko, sys
+import concurrent.futures, os, sys
 import xml.etree.ElementTree as ElementTree
 
-from classes import NoidManager, SocSciMapsMarcXmlToDc, SocSciMapsMarcXmlToEDM
 from docopt import docopt
 from PIL import Image
-from pymarc import MARCReader
+
+try:
+    from .classes import NoidManager, SocSciMapsMarcXmlToDc
+    from .ocfl import PLACEMENTS, DigestCache, OcflObject, file_digests
+    from .ssmaps_edm import build_record_triples, get_digital_record, get_identifier, get_print_record, get_ssh_client
+except ImportError:
+    from classes import NoidManager, SocSciMapsMarcXmlToDc
+    from ocfl import PLACEMENTS, DigestCache, OcflObject, file_digests
+    from ssmaps_edm import build_record_triples, get_digital_record, get_identifier, get_print_record, get_ssh_client
 
 Image.MAX_IMAGE_PIXELS = 1000000000
 
@@ -41,116 +66,160 @@ def get_tiff_dir(data_directory, digital_record_id):
                         return '{}/{}/tifs'.format(data_directory, subdir)
     raise ValueError
 
-def get_image_data(tiff_directory):
-    image_data = []
-    for tiff in os.listdir(tiff_directory):
-            tiff_path = '{}{}{}'.format(tiff_directory, os.sep, tiff)
-            try:
-                mime_type = 'image/tiff'
-                size = os.path.getsize(tiff_path)
-                img = Image.open(tiff_path)
-                width = img.size[0]
-                height = img.size[1]
-            except AttributeError:
-                sys.stdout.write('trouble with {}\n'.format(tiff_path))
-                sys.exit()
-    
-            with open(tiff_path, 'rb') as f:
-                tiff_contents = f.read()
-                md5 = hashlib.md5(tiff_contents).hexdigest()
-                sha512 = hashlib.sha512(tiff_contents).hexdigest()
-
-            image_data.append({
-                'height': height,
-                'md5': md5,
-                'mime_type': mime_type,
-                'name': '{}.tif'.format(identifier),
-                'path': tiff_path,
-                'pair_tree_path': pair_tree_path,
-                'sha512': sha512,
-                'size': size,
-                'width': width
-            })
-    return image_data
-
-def get_catalog_record(url):
-    _, ssh_stdout, _ = ssh.exec_command('curl "{}"'.format(url))
-    data = json.loads(ssh_stdout.read())
-    fullrecord = data['response']['docs'][0]['fullrecord']
-
-    with io.BytesIO(fullrecord.encode('utf-8')) as fh:
-        reader = MARCReader(fh)
-        for record in reader:
-            return record
-
-def get_catalog_record_by_id(id):
-    return get_catalog_record(
-        'http://vfsolr.uchicago.edu:8080/solr/biblio/select?q=id:{}'.format(str(id))
+def get_tiffs(tiff_directory):
+    return sorted(
+        os.path.join(tiff_directory, f)
+        for f in os.listdir(tiff_directory)
+        if f.lower().endswith(('.tif', '.tiff'))
     )
 
-def get_catalog_record_by_oclc_number(oclc_num):
-    return get_catalog_record(
-        'http://vfsolr.uchicago.edu:8080/solr/biblio/select?q=oclc_num:{}'.format(str(oclc_num))
-    )
+def get_image_entry(tiff_path, digests):
+    """Image data for EDM, from a master file and its digests.
+
+    Args:
+        tiff_path (str): path to the TIFF. Only the header is read, for its
+        dimensions.
+        digests (dict): size, md5 and sha512 of the TIFF.
+
+    Returns:
+        dict
+    """
+    with Image.open(tiff_path) as img:
+        width, height = img.size
+    return {
+        'height': height,
+        'md5': digests['md5'],
+        'mime_type': 'image/tiff',
+        'name': os.path.basename(tiff_path),
+        'sha512': digests['sha512'],
+        'size': digests['size'],
+        'width': width
+    }
+
+def get_image_data(tiff_directory):
+    return [get_image_entry(t, file_digests(t)) for t in get_tiffs(tiff_directory)]
 
 def get_dc_str(digital_record, print_record, noid):
     return str(SocSciMapsMarcXmlToDc(digital_record, print_record, noid))
 
-def get_edm_str(digital_record, print_record, noid):
+def get_edm_str(digital_record, print_record, noid, image_data):
     # save EDM as a string of triples. 
-    edm = SocSciMapsMarcXmlToEDM(
-        digital_record,
-        print_record,
-        noid
+    return build_record_triples(
+        digital_record.as_marc(),
+        print_record.as_marc(),
+        noid,
         image_data
-        get_image_data(
-            get_tiff_dir(
-                data_directory, 
-                options['<digital_record_id>']
-            )
-        )
-    )
-    edm.build_item_triples()
-    return str(SocSciMapsMarcXmlToEDM.triples())
-
-def create(options, digital_record, print_record, noid):
-    # create an SSH object.
-    ssh = paramiko.SSHClient()
-    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    ssh.connect(
-        os.environ['SOLR_ACCESS_DOMAIN'],
-        username=os.environ['SOLR_ACCESS_USERNAME'],
-        password=os.environ['SOLR_ACCESS_PASSWORD']
     )
 
-    # get DC data and EDM triples as strings.
-    dc_str = get_dc_str(digital_record, print_record, noid)
-    edm_str = get_edm_str(digital_record, print_record, noid)
+def create(ssh, noid_manager, digital_record_id, placement='copy', cache=None):
+    """Create an OCFL object for a digital record.
 
-    # create OCFL directory in pair tree.
-    # add files. 
+    The master file is copied into the object and hashed in the same pass,
+    or linked and its digests taken from cache, and those digests go into
+    both the inventory and the EDM, so the TIFF is read once at most.
 
-def main():
-    options = docopt(__doc__)
+    Args:
+        ssh (paramiko.SSHClient): a connected client, for Solr.
+        noid_manager (NoidManager)
+        digital_record_id (str)
+        placement (str): 'copy', 'link' or 'reflink'.
+        cache (ocfl.DigestCache)
 
-    # generate a new, unique noid. 
-    noid_manager = NoidManager()
-    noid = noid_manager.create()
+    Returns:
+        str: the new object's NOID.
+    """
+    digital_record = get_digital_record(ssh, digital_record_id)
+    print_record = get_print_record(ssh, digital_record)
 
-    # request the digital record
-    digital_record = get_record_by_id(options['<digital_record_id>'])
+    tiff_directory = get_tiff_dir(data_directory, digital_record_id)
+    tiffs = get_tiffs(tiff_directory)
+    if len(tiffs) != 1:
+        raise ValueError('expected a single master file in {}.'.format(tiff_directory))
 
-    # request the print record
-    print_record = get_record_by_oclc_number(
-        digital_record['776']['w'].replace('(OCoLC)', '')
-    )
+    # generate a new, unique noid. 
+    while True:
+        noid = noid_manager.create()
+        try:
+            obj = OcflObject(noid_manager.pair_tree_root, noid, placement, cache)
+        except FileExistsError:
+            continue
+        break
+
+    with obj:
+        digests = obj.add_file(tiffs[0], 'file.tif')
+        image_data = [get_image_entry(tiffs[0], digests)]
+        obj.add_bytes(
+            get_dc_str(digital_record, print_record, noid).encode('utf-8'),
+            'file.dc.xml'
+        )
+        obj.add_bytes(
+            get_edm_str(digital_record, print_record, noid, image_data).encode('utf-8'),
+            'file.ttl'
+        )
+        obj.commit(
+            'Social Scientists Map of Chicago, {}, {}.'.format(
+                digital_record_id,
+                get_identifier(digital_record)
+            )
+        )
+    return noid
 
-    if options['--cat-dc']:
-        sys.stdout.write(get_dc_str(digital_record, print_record, noid))
-    elif options['--cat-edm']:
-        sys.stdout.write(get_edm_str(digital_record, print_record, noid))
-    elif options['--create']:
-        create()
+def main():
+    options = docopt(__doc__)
+
+    noid_manager = NoidManager(pair_tree_root)
+    ssh = get_ssh_client()
+    try:
+        if options['--create']:
+            if options['--placement'] not in PLACEMENTS:
+                sys.stderr.write('--placement must be one of {}.\n'.format(', '.join(PLACEMENTS)))
+                sys.exit(1)
+            cache = DigestCache(options['--digest-cache'])
+            # objects are written in a pool of threads: copying and hashing
+            # master files release the GIL, and each record waits on Solr.
+            failed = 0
+            try:
+                with concurrent.futures.ThreadPoolExecutor(max_workers=int(options['--workers'])) as executor:
+                    futures = {
+                        executor.submit(create, ssh, noid_manager, i, options['--placement'], cache): i
+                        for i in options['<digital_record_id>']
+                    }
+                    # print each NOID as soon as its object is committed, so
+                    # that no object is left without a record of which
+                    # digital record it's for.
+                    for future in concurrent.futures.as_completed(futures):
+                        digital_record_id = futures[future]
+                        try:
+                            noid = future.result()
+                        except Exception as e:
+                            failed += 1
+                            sys.stderr.write('could not create an object for {}: {}: {}\n'.format(
+                                digital_record_id, type(e).__name__, e))
+                            continue
+                        sys.stdout.write('{}\t{}\n'.format(digital_record_id, noid))
+                        sys.stdout.flush()
+            finally:
+                cache.save()
+            if failed:
+                sys.exit(1)
+            return
+
+        digital_record_id = options['<digital_record_id>'][0]
+        noid = noid_manager.create()
+        digital_record = get_digital_record(ssh, digital_record_id)
+        print_record = get_print_record(ssh, digital_record)
+
+        if options['--cat-dc']:
+            sys.stdout.write(get_dc_str(digital_record, print_record, noid))
+        elif options['--cat-edm']:
+            sys.stdout.write(get_edm_str(
+                digital_record,
+                print_record,
+                noid,
+                get_image_data(get_tiff_dir(data_directory, digital_record_id))
+            ))
+    finally:
+        ssh.close()
 
 if __name__ == "__main__":
     main()
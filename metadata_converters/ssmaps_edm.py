@@ -1,17 +1,54 @@
 #!/usr/bin/env python
-"""Usage: ssmaps_edm [--debug] [--no_images] --digital_record_id <digital_record_id> --noid <noid>
+"""Usage:
+    ssmaps_edm [--debug] [--no_images] [--profile] [--pstats=<dir>] --digital_record_id <digital_record_id> --noid <noid>
+    ssmaps_edm [--debug] [--no_images] [--profile] [--pstats=<dir>] [--concurrency=<n>] [--metrics=<path>] [--metrics-interval=<s>] [--metrics-port=<port>] --collection <csv>
+    ssmaps_edm [--debug] [--no_images] [--profile] [--pstats=<dir>] [--concurrency=<n>] [--metrics=<path>] [--metrics-interval=<s>] [--metrics-port=<port>] --collection <csv> --outdir <dir>
+
+Options:
+    --collection       Convert every record in a two column CSV of digital
+                       record ids and NOIDs. Records are fetched
+                       concurrently and written out as they finish.
+                       Records that fail are reported on stderr, the rest
+                       are still converted, and the exit status is 1.
+    --concurrency=<n>  Number of records to fetch at a time. [default: 8]
+    --metrics=<path>   Append a JSON line of counters, queue depths and
+                       fetch latency histograms to this file every interval.
+    --metrics-interval=<s>
+                       Seconds between metrics snapshots. [default: 60]
+    --metrics-port=<port>
+                       Serve the same metrics in the Prometheus text format
+                       at http://localhost:<port>/metrics.
+    --outdir           Write one <noid>.ttl file per record to a directory,
+                       and only rebuild records whose MARC records or master
+                       file changed since the last run. Input fingerprints
+                       are kept in <dir>/manifest.json.
+    --profile          Write the time spent in each stage to stderr. Also
+                       on when METADATA_CONVERTERS_PROFILE=1 is set.
+    --pstats=<dir>     Profile each record with cProfile, and write the
+                       stats to <dir>/<record>.pstats. Implies --profile.
 """
 
-import datetime, io, json, hashlib, os, paramiko, re, requests, sys
+import asyncio, csv, datetime, io, json, hashlib, os, paramiko, re, requests, sys, threading
 import xml.etree.ElementTree as ElementTree
-from classes import SocSciMapsMarcXmlToDc
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from docopt import docopt
 from io import BytesIO
 from PIL import Image
-from pymarc import MARCReader
+from pymarc import MARCReader, Record
 from rdflib import BNode, Graph, Literal, Namespace, URIRef
 from rdflib.namespace import RDF, DC, DCTERMS, XSD
 
+try:
+    from .classes import SocSciMapsMarcXmlToDc
+    from .metrics import metrics, start as start_metrics
+    from .normalize import process_date_string
+    from .profiling import collect, profiler
+except ImportError:
+    from classes import SocSciMapsMarcXmlToDc
+    from metrics import metrics, start as start_metrics
+    from normalize import process_date_string
+    from profiling import collect, profiler
+
 Image.MAX_IMAGE_PIXELS = 1000000000
 
 
@@ -30,26 +67,6 @@ PREMIS3 = Namespace('http://www.loc.gov/premis/rdf/v3/')
 VRA     = Namespace('http://purl.org/vra/')
 
 
-def process_date_string(s):
-    date_str = False
-    # find every occurrence of either four digits in a row or three
-    # digits followed by a dash.
-    dates = re.findall('[0-9]{3}[0-9-]', s)
-    # if there are two date chunks in the string, assume they are a date
-    # range. (e.g. 'yyyy-yyyy'
-    if len(dates) == 2:
-        return '/'.join(dates)
-    # if the date is three digits followed by a dash, assume it is a
-    # date range for a decade. (e.g. 'yyy0-yyy9')
-    elif len(dates) == 1 and dates[0][-1] == '-':
-        return '{0}0/{0}9'.format(dates[0][:3])
-    # otherwise assume that the four digit date is correct.
-    elif len(dates) == 1:
-        return dates[0]
-    else:
-        return ''
-
-
 class SocSciMapsMarcXmlToEDM():
 
     graph = Graph()
@@ -62,11 +79,16 @@ class SocSciMapsMarcXmlToEDM():
         graph.bind(prefix, ns)
 
     """A class to convert MARCXML to Europeana Data Model (EDM)."""
-    def __init__(self, digital_record, print_record, noid, master_file_metadata):
+    def __init__(self, digital_record, print_record, noid, master_file_metadata, created=None, modified=None):
         """Initialize an instance of the class MarcXmlToEDM.
 
         Args:
             graph (Graph): a EDM graph collection from a single record.
+            created (str): ISO 8601 dateTime for the resource map's
+            dcterms:created, to keep it stable across rebuilds. Defaults to
+            modified.
+            modified (str): ISO 8601 dateTime for dcterms:modified. Defaults
+            to now.
         """
         self.digital_record = digital_record
         self.print_record = print_record
@@ -87,7 +109,14 @@ class SocSciMapsMarcXmlToEDM():
         self.rem = ARK['{}/rem'.format(self.noid)]
         self.wbr = ARK['{}/file.tif'.format(self.noid)]
 
-        self.now = Literal(datetime.datetime.utcnow(), datatype=XSD.dateTime)
+        if modified is None:
+            self.now = Literal(datetime.datetime.utcnow(), datatype=XSD.dateTime)
+        else:
+            self.now = Literal(modified, datatype=XSD.dateTime)
+        if created is None:
+            self.created = self.now
+        else:
+            self.created = Literal(created, datatype=XSD.dateTime)
 
     def build_item_triples(self):
         """Add triples for an individual item.
@@ -126,7 +155,7 @@ class SocSciMapsMarcXmlToEDM():
         self.graph.add((self.pro, ORE.proxyIn,       self.agg))
 
         # resource map for the item.
-        self.graph.add((self.rem, DCTERMS.created,   self.now))
+        self.graph.add((self.rem, DCTERMS.created,   self.created))
         self.graph.add((self.rem, DCTERMS.modified,  self.now))
         self.graph.add((self.rem, DCTERMS.creator,   URIRef('https://www.lib.uchicago.edu/')))
         self.graph.add((self.rem, RDF.type,          ORE.ResourceMap))
@@ -222,95 +251,608 @@ class SocSciMapsMarcXmlToEDM():
         return self.graph.serialize(format='turtle', base='https://www.lib.uchicago.edu/ark:61001/')
 
 
-def marc_to_edm_soc_sci(no_images, digital_record_id, noid, debug=False):
+def get_ssh_client():
     ssh = paramiko.SSHClient()
     ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    ssh.connect(
-        os.environ['SOLR_ACCESS_DOMAIN'],
-        username=os.environ['SOLR_ACCESS_USERNAME'],
-        password=os.environ['SOLR_ACCESS_PASSWORD']
-    )
+    with profiler.stage('ssh connect'):
+        ssh.connect(
+            os.environ['SOLR_ACCESS_DOMAIN'],
+            username=os.environ['SOLR_ACCESS_USERNAME'],
+            password=os.environ['SOLR_ACCESS_PASSWORD']
+        )
+    return ssh
+
+def get_catalog_record(ssh, url):
+    """Request a MARC record from Solr, through an SSH connection.
 
-    if debug:
-        sys.stderr.write('marc_edm requesting digital record.\n')
+    Args:
+        ssh (paramiko.SSHClient): a connected client.
+        url (str): a Solr select URL.
 
-    # request the digital record
-    url = 'http://vfsolr.uchicago.edu:8080/solr/biblio/select?q=id:{}'.format(str(digital_record_id))
-    _, ssh_stdout, _ = ssh.exec_command('curl "{}"'.format(url))
-    data = json.loads(ssh_stdout.read())
+    Returns:
+        a pymarc Record.
+    """
+    with profiler.stage('solr'), metrics.timer('fetch_seconds', source='solr'):
+        _, ssh_stdout, _ = ssh.exec_command('curl "{}"'.format(url))
+        data = json.loads(ssh_stdout.read())
     fullrecord = data['response']['docs'][0]['fullrecord']
 
-    with io.BytesIO(fullrecord.encode('utf-8')) as fh:
-        reader = MARCReader(fh)
-        for record in reader:
-            digital_record = record
+    with profiler.stage('marc parse'):
+        with io.BytesIO(fullrecord.encode('utf-8')) as fh:
+            reader = MARCReader(fh)
+            for record in reader:
+                return record
 
+def get_digital_record(ssh, digital_record_id):
+    return get_catalog_record(
+        ssh,
+        'http://vfsolr.uchicago.edu:8080/solr/biblio/select?q=id:{}'.format(str(digital_record_id))
+    )
+
+def get_print_record(ssh, digital_record):
     # get an oclc number for the print record
     oclc_num = digital_record['776']['w'].replace('(OCoLC)', '')
+    return get_catalog_record(
+        ssh,
+        'http://vfsolr.uchicago.edu:8080/solr/biblio/select?q=oclc_num:{}'.format(str(oclc_num))
+    )
 
-    if debug:
-        sys.stderr.write('marc_edm requesting print record.\n')
+def get_tiff(noid):
+    with profiler.stage('tiff download'), metrics.timer('fetch_seconds', source='tiff'):
+        tiff = requests.get(
+            'https://ocfl.lib.uchicago.edu/ark:61001/{}/file.tif'.format(noid)
+        ).content
+    profiler.count('tiff bytes', len(tiff))
+    metrics.count('tiff_bytes_total', len(tiff))
+    return tiff
+
+def get_image_data(tiff, identifier):
+    """Get size, dimensions and checksums for a master file.
+
+    Args:
+        tiff (bytes): the contents of a TIFF.
+        identifier (str): the last part of the digital record's 856 $u.
+
+    Returns:
+        list: a single dictionary of image data.
+    """
+    with profiler.stage('image size'):
+        img = Image.open(BytesIO(tiff))
+    with profiler.stage('hashing'):
+        md5 = hashlib.md5(tiff).hexdigest()
+        sha512 = hashlib.sha512(tiff).hexdigest()
+    metrics.count('bytes_hashed_total', len(tiff), algorithm='md5')
+    metrics.count('bytes_hashed_total', len(tiff), algorithm='sha512')
+    return [{
+        'height': img.size[1],
+        'md5': md5,
+        'mime_type': 'image/tiff',
+        'name': '{}.tif'.format(identifier),
+        'sha512': sha512,
+        'size': len(tiff),
+        'width': img.size[0]
+    }]
+
+def get_identifier(digital_record):
+    return digital_record['856']['u'].split('/').pop()
+
+def get_master_file_fingerprint(noid):
+    """Identify the current version of a master file without downloading it.
+
+    Returns:
+        dict: the ETag, Last-Modified and Content-Length the server reports
+        for the TIFF.
+    """
+    with profiler.stage('master file head'), metrics.timer('fetch_seconds', source='master_file_head'):
+        r = requests.head(
+            'https://ocfl.lib.uchicago.edu/ark:61001/{}/file.tif'.format(noid),
+            allow_redirects=True
+        )
+    r.raise_for_status()
+    return {
+        'etag': r.headers.get('ETag'),
+        'last_modified': r.headers.get('Last-Modified'),
+        'size': r.headers.get('Content-Length')
+    }
+
+def get_005(record):
+    try:
+        return record['005'].value()
+    except (KeyError, AttributeError, TypeError):
+        return None
+
+def record_fingerprint(digital_record, print_record, master_file=None):
+    """Fingerprint everything a record's EDM is built from.
+
+    Args:
+        digital_record (pymarc.Record)
+        print_record (pymarc.Record)
+        master_file (dict): from get_master_file_fingerprint(), or None if
+        images aren't being described.
+
+    Returns:
+        dict
+    """
+    return {
+        'digital_005': get_005(digital_record),
+        'digital_sha1': hashlib.sha1(digital_record.as_marc()).hexdigest(),
+        'master_file': master_file,
+        'print_005': get_005(print_record),
+        'print_sha1': hashlib.sha1(print_record.as_marc()).hexdigest()
+    }
+
+class EdmManifest:
+    """Fingerprints of the inputs each EDM file in a directory was built
+    from, kept in <outdir>/manifest.json.
+
+    Each entry looks like:
+
+        {
+            "created": "2021-03-01T12:00:00",
+            "digital_record_id": "7641168",
+            "fingerprint": {...},
+            "image_data": [...],
+            "modified": "2021-03-01T12:00:00"
+        }
+
+    image_data holds the size, dimensions and checksums of the master file,
+    so an unchanged TIFF doesn't have to be downloaded again when only its
+    MARC records change.
+    """
+
+    def __init__(self, outdir):
+        self.outdir = outdir
+        self.path = os.path.join(outdir, 'manifest.json')
+        self.lock = threading.Lock()
+        try:
+            with open(self.path) as f:
+                self.records = json.load(f)['records']
+        except FileNotFoundError:
+            self.records = {}
 
-    # request the print record
-    url = 'http://vfsolr.uchicago.edu:8080/solr/biblio/select?q=oclc_num:{}'.format(str(oclc_num))
-    _, ssh_stdout, _ = ssh.exec_command('curl "{}"'.format(url))
-    data = json.loads(ssh_stdout.read())
-    fullrecord = data['response']['docs'][0]['fullrecord']
+    def edm_path(self, noid):
+        return os.path.join(self.outdir, '{}.ttl'.format(noid))
 
-    with io.BytesIO(fullrecord.encode('utf-8')) as fh:
-        reader = MARCReader(fh)
-        for record in reader:
-            print_record = record
+    def is_current(self, noid, fingerprint):
+        """True if a record's EDM exists and was built from these inputs."""
+        with self.lock:
+            entry = self.records.get(noid)
+        return entry is not None and \
+            entry['fingerprint'] == fingerprint and \
+            os.path.exists(self.edm_path(noid))
 
-    identifier = digital_record['856']['u'].split('/').pop()
+    def image_data(self, noid, master_file):
+        """Image data from the last build, if the master file is unchanged.
 
-    if no_images:
+        Returns:
+            list, or None if the master file has to be read again.
+        """
+        with self.lock:
+            entry = self.records.get(noid)
+        if entry is None or master_file is None or \
+                entry['fingerprint']['master_file'] != master_file:
+            return None
+        return entry['image_data']
+
+    def created(self, noid):
+        with self.lock:
+            entry = self.records.get(noid)
+        return entry['created'] if entry else None
+
+    def update(self, noid, digital_record_id, fingerprint, image_data, created, modified):
+        with self.lock:
+            self.records[noid] = {
+                'created': created,
+                'digital_record_id': digital_record_id,
+                'fingerprint': fingerprint,
+                'image_data': image_data,
+                'modified': modified
+            }
+
+    def save(self):
+        """Write the manifest, replacing the old one atomically."""
+        with self.lock:
+            data = json.dumps({'records': self.records}, indent=2, sort_keys=True)
+        tmp = '{}.tmp'.format(self.path)
+        with open(tmp, 'w') as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+
+def update_record(manifest, digital_record, print_record, noid, master_file=None, load_image_data=None, build=None):
+    """Rebuild a record's EDM, but only if its inputs changed.
+
+    A rebuilt record keeps its dcterms:created and gets a new
+    dcterms:modified. The EDM file of an unchanged record isn't touched, so
+    its dcterms:modified still says when it last changed.
+
+    Args:
+        manifest (EdmManifest)
+        digital_record (pymarc.Record)
+        print_record (pymarc.Record)
+        noid (str)
+        master_file (dict): from get_master_file_fingerprint(), or None if
+        images aren't being described.
+        load_image_data (callable): returns image data for the master file.
+        Only called if the manifest doesn't already have it.
+        build (callable): something that runs build_record_triples
+        elsewhere, e.g. in a process pool. Defaults to running it here.
+
+    Returns:
+        bool: True if the record was rebuilt.
+    """
+    fingerprint = record_fingerprint(digital_record, print_record, master_file)
+    if manifest.is_current(noid, fingerprint):
+        return False
+
+    if master_file is None:
         image_data = []
     else:
-        try:
-            if debug:
-                sys.stderr.write('marc_edm requesting tiff.\n')
-            mime_type = 'image/tiff'
-            response = requests.get(
-                'https://ocfl.lib.uchicago.edu/ark:61001/{}/file.tif'.format(noid)
-            )
-            size = len(response.content)
-            img = Image.open(BytesIO(response.content))
-            width = img.size[0]
-            height = img.size[1]
-            md5 = hashlib.md5(response.content).hexdigest()
-            sha512 = hashlib.sha512(response.content).hexdigest()
-        except AttributeError:
-            sys.stdout.write('trouble with tiff file.\n')
-            sys.exit()
-
-        image_data = [{
-            'height': height,
-            'md5': md5,
-            'mime_type': mime_type,
-            'name': '{}.tif'.format(identifier),
-            'sha512': sha512,
-            'size': size,
-            'width': width
-        }]
-
-    edm = SocSciMapsMarcXmlToEDM(
-        digital_record,
-        print_record,
+        image_data = manifest.image_data(noid, master_file)
+        if image_data is None:
+            image_data = load_image_data()
+
+    modified = datetime.datetime.utcnow().replace(microsecond=0).isoformat()
+    created = manifest.created(noid) or modified
+
+    if build is None:
+        build = build_record_triples
+    triples = build(
+        digital_record.as_marc(),
+        print_record.as_marc(),
+        noid,
+        image_data,
+        created,
+        modified
+    )
+
+    path = manifest.edm_path(noid)
+    with open('{}.tmp'.format(path), 'w', encoding='utf-8') as f:
+        f.write(triples)
+    os.replace('{}.tmp'.format(path), path)
+
+    manifest.update(
         noid,
-        image_data
+        digital_record['001'].value(),
+        fingerprint,
+        image_data,
+        created,
+        modified
     )
+    return True
 
-    edm.build_item_triples()
-    return SocSciMapsMarcXmlToEDM.triples()
+def marc_to_edm_soc_sci(no_images, digital_record_id, noid, debug=False):
+    with profiler.record(digital_record_id):
+        ssh = get_ssh_client()
+
+        if debug:
+            sys.stderr.write('marc_edm requesting digital record.\n')
+
+        # request the digital record
+        digital_record = get_digital_record(ssh, digital_record_id)
+
+        if debug:
+            sys.stderr.write('marc_edm requesting print record.\n')
+
+        # request the print record
+        print_record = get_print_record(ssh, digital_record)
+
+        identifier = get_identifier(digital_record)
+
+        if no_images:
+            image_data = []
+        else:
+            try:
+                if debug:
+                    sys.stderr.write('marc_edm requesting tiff.\n')
+                image_data = get_image_data(get_tiff(noid), identifier)
+            except AttributeError:
+                sys.stdout.write('trouble with tiff file.\n')
+                sys.exit()
+
+        edm = SocSciMapsMarcXmlToEDM(
+            digital_record,
+            print_record,
+            noid,
+            image_data
+        )
+
+        with profiler.stage('graph'):
+            edm.build_item_triples()
+        with profiler.stage('serialize'):
+            triples = edm.triples()
+        profiler.count('records')
+        return triples
+
+def build_record_triples(digital_marc, print_marc, noid, image_data, created=None, modified=None):
+    """Build EDM for a single record in its own graph, so that records can be
+    serialized as soon as they are finished. Records are passed as binary
+    MARC so this can run in a worker process.
+
+    Returns:
+        str
+    """
+    with profiler.record(noid):
+        edm = SocSciMapsMarcXmlToEDM(
+            Record(data=digital_marc),
+            Record(data=print_marc),
+            noid,
+            image_data,
+            created,
+            modified
+        )
+        edm.graph = Graph()
+        for prefix, ns in SocSciMapsMarcXmlToEDM.graph.namespaces():
+            edm.graph.bind(prefix, ns)
+        with profiler.stage('graph'):
+            edm.build_item_triples()
+        with profiler.stage('serialize'):
+            triples = edm.graph.serialize(format='turtle', base='https://www.lib.uchicago.edu/ark:61001/')
+    profiler.count('records')
+    return triples
+
+async def marc_to_edm_soc_sci_record(loop, ssh, cpu_executor, semaphore, no_images, digital_record_id, noid, debug=False):
+    """Convert a single record, overlapping its network waits with other
+    records.
+
+    Solr requests and the TIFF download run in the loop's default thread
+    pool. Hashing also runs there, since hashlib releases the GIL for large
+    inputs and the TIFF doesn't have to be copied to another process. Graph
+    building holds the GIL, so it runs in cpu_executor.
+
+    Returns:
+        str: EDM triples for the record.
+    """
+    with metrics.in_progress('records_waiting'):
+        await semaphore.acquire()
+    try:
+        with metrics.in_progress('records_fetching'):
+            if debug:
+                sys.stderr.write('marc_edm requesting records for {}.\n'.format(digital_record_id))
+            digital_record = await loop.run_in_executor(None, get_digital_record, ssh, digital_record_id)
+            print_record = await loop.run_in_executor(None, get_print_record, ssh, digital_record)
+
+            if no_images:
+                image_data = []
+            else:
+                if debug:
+                    sys.stderr.write('marc_edm requesting tiff for {}.\n'.format(digital_record_id))
+                tiff = await loop.run_in_executor(None, get_tiff, noid)
+                image_data = await loop.run_in_executor(
+                    None, get_image_data, tiff, get_identifier(digital_record))
+    finally:
+        semaphore.release()
+
+    with metrics.in_progress('records_building'):
+        triples, stages = await loop.run_in_executor(
+            cpu_executor,
+            collect,
+            build_record_triples,
+            digital_record.as_marc(),
+            print_record.as_marc(),
+            noid,
+            image_data
+        )
+    profiler.merge(stages)
+    metrics.count('records_total')
+    return triples
+
+async def settle(digital_record_id, coroutine):
+    """Await a record, returning its exception instead of raising it, so
+    one bad record doesn't stop a collection.
+
+    Returns:
+        tuple: digital record id, result and exception, one of them None.
+    """
+    try:
+        return digital_record_id, await coroutine, None
+    except Exception as e:
+        return digital_record_id, None, e
+
+def report_failure(digital_record_id, e):
+    metrics.count('errors_total', kind=type(e).__name__)
+    sys.stderr.write('could not convert {}: {}: {}\n'.format(digital_record_id, type(e).__name__, e))
+
+async def marc_to_edm_soc_sci_collection(no_images, records, out, concurrency=8, debug=False):
+    """Convert a collection, writing each record's triples to out as soon as
+    it is finished, so records come out in the order they finish. At most
+    concurrency records are fetched at a time. A record that fails is
+    reported on stderr, and the rest are still converted.
+
+    Args:
+        no_images (bool): skip TIFF downloads.
+        records (list): (digital_record_id, noid) tuples.
+        out: a writable text stream.
+        concurrency (int): number of records to fetch at once.
+
+    Returns:
+        tuple: number of records converted and number that failed.
+    """
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency * 2))
+    semaphore = asyncio.Semaphore(concurrency)
+    ssh = await loop.run_in_executor(None, get_ssh_client)
+
+    converted = failed = 0
+    try:
+        with ProcessPoolExecutor() as cpu_executor:
+            tasks = [
+                settle(digital_record_id, marc_to_edm_soc_sci_record(
+                    loop, ssh, cpu_executor, semaphore, no_images,
+                    digital_record_id, noid, debug
+                ))
+                for digital_record_id, noid in records
+            ]
+            for task in asyncio.as_completed(tasks):
+                digital_record_id, triples, e = await task
+                if e:
+                    report_failure(digital_record_id, e)
+                    failed += 1
+                    continue
+                out.write(triples)
+                out.flush()
+                converted += 1
+    finally:
+        ssh.close()
+    return converted, failed
+
+async def update_soc_sci_record(loop, ssh, cpu_executor, semaphore, manifest, no_images, digital_record_id, noid, debug=False):
+    """Fetch a record's inputs and rebuild its EDM if any of them changed.
+
+    The MARC records are always fetched, since they are small. The master
+    file is only downloaded if the server reports a new version of it.
+
+    Returns:
+        bool: True if the record was rebuilt.
+    """
+    with metrics.in_progress('records_waiting'):
+        await semaphore.acquire()
+    try:
+        with metrics.in_progress('records_fetching'):
+            if debug:
+                sys.stderr.write('marc_edm requesting records for {}.\n'.format(digital_record_id))
+            digital_record = await loop.run_in_executor(None, get_digital_record, ssh, digital_record_id)
+            print_record = await loop.run_in_executor(None, get_print_record, ssh, digital_record)
+
+            if no_images:
+                master_file = None
+            else:
+                master_file = await loop.run_in_executor(None, get_master_file_fingerprint, noid)
+
+        def load_image_data():
+            if debug:
+                sys.stderr.write('marc_edm requesting tiff for {}.\n'.format(digital_record_id))
+            return get_image_data(get_tiff(noid), get_identifier(digital_record))
+
+        def build(*args):
+            with metrics.in_progress('records_building'):
+                triples, stages = cpu_executor.submit(collect, build_record_triples, *args).result()
+            profiler.merge(stages)
+            return triples
+
+        rebuilt = await loop.run_in_executor(
+            None,
+            update_record,
+            manifest,
+            digital_record,
+            print_record,
+            noid,
+            master_file,
+            load_image_data,
+            build
+        )
+    finally:
+        semaphore.release()
+    metrics.count('records_total')
+    if rebuilt:
+        metrics.count('records_rebuilt_total')
+    return rebuilt
+
+async def update_soc_sci_collection(no_images, records, outdir, concurrency=8, debug=False):
+    """Incrementally rebuild a collection's EDM in outdir, one <noid>.ttl
+    file per record. Records whose inputs haven't changed since the last run
+    are skipped. The manifest is saved after each batch of records, so an
+    interrupted run doesn't lose the work it has finished. A record that
+    fails is reported on stderr and tried again on the next run.
+
+    Args:
+        no_images (bool): skip TIFFs.
+        records (list): (digital_record_id, noid) tuples.
+        outdir (str): directory for EDM files and manifest.json.
+        concurrency (int): number of records to fetch at once.
+
+    Returns:
+        tuple: number of records rebuilt, unchanged and failed.
+    """
+    os.makedirs(outdir, exist_ok=True)
+    manifest = EdmManifest(outdir)
+
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency * 2))
+    semaphore = asyncio.Semaphore(concurrency)
+    ssh = await loop.run_in_executor(None, get_ssh_client)
+
+    rebuilt = unchanged = failed = 0
+    try:
+        with ProcessPoolExecutor() as cpu_executor:
+            tasks = [
+                settle(digital_record_id, update_soc_sci_record(
+                    loop, ssh, cpu_executor, semaphore, manifest, no_images,
+                    digital_record_id, noid, debug
+                ))
+                for digital_record_id, noid in records
+            ]
+            for task in asyncio.as_completed(tasks):
+                digital_record_id, result, e = await task
+                if e:
+                    report_failure(digital_record_id, e)
+                    failed += 1
+                elif result:
+                    rebuilt += 1
+                    if rebuilt % 100 == 0:
+                        manifest.save()
+                else:
+                    unchanged += 1
+    finally:
+        ssh.close()
+        manifest.save()
+    return rebuilt, unchanged, failed
+
+def read_collection(path):
+    """Read (digital_record_id, noid) rows from a CSV file."""
+    records = []
+    with open(path) as f:
+        for row in csv.reader(f):
+            if len(row) >= 2:
+                records.append((row[0].strip(), row[1].strip()))
+    return records
 
 if __name__ == "__main__":
     options = docopt(__doc__)
-    sys.stdout.write(
-        marc_to_edm_soc_sci(
-            options['--no_images'],
-            options['<digital_record_id>'], 
-            options['<noid>'],
-            options['--debug']
+    if options['--profile'] or options['--pstats']:
+        profiler.enable(options['--pstats'])
+
+    if options['--outdir']:
+        with start_metrics(
+            options['--metrics'],
+            float(options['--metrics-interval']),
+            int(options['--metrics-port']) if options['--metrics-port'] else None
+        ):
+            rebuilt, unchanged, failed = asyncio.run(
+                update_soc_sci_collection(
+                    options['--no_images'],
+                    read_collection(options['<csv>']),
+                    options['<dir>'],
+                    int(options['--concurrency']),
+                    options['--debug']
+                )
+            )
+        sys.stderr.write('{} records rebuilt, {} unchanged, {} failed.\n'.format(rebuilt, unchanged, failed))
+    elif options['--collection']:
+        with start_metrics(
+            options['--metrics'],
+            float(options['--metrics-interval']),
+            int(options['--metrics-port']) if options['--metrics-port'] else None
+        ):
+            converted, failed = asyncio.run(
+                marc_to_edm_soc_sci_collection(
+                    options['--no_images'],
+                    read_collection(options['<csv>']),
+                    sys.stdout,
+                    int(options['--concurrency']),
+                    options['--debug']
+                )
+            )
+        sys.stderr.write('{} records converted, {} failed.\n'.format(converted, failed))
+    else:
+        failed = 0
+        sys.stdout.write(
+            marc_to_edm_soc_sci(
+                options['--no_images'],
+                options['<digital_record_id>'], 
+                options['<noid>'],
+                options['--debug']
+            )
         )
-    )
+    profiler.summary(sys.stderr)
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,93 @@
+import os, tempfile, unittest
+from batch_convert import DONE, FAILED, RUNNING, Journal, run, write_atomic
+
+SETTINGS = {'format': 'edm', 'no_images': True}
+
+
+class TestBatchConvert(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'journal.sqlite')
+        self.jobs = [(str(n), n) for n in range(10)]
+        self.sleeps = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_batch(self, convert, retries=2):
+        journal = Journal(self.path, SETTINGS)
+        try:
+            return run(journal, self.jobs, convert, 3, retries, 0.5, self.sleeps.append)
+        finally:
+            journal.close()
+
+    def test_failures_are_isolated_and_resumed(self):
+        converted = []
+        def convert(n):
+            if n in (3, 7):
+                raise AttributeError('trouble with tiff file.')
+            converted.append(n)
+
+        self.assertEqual(self.run_batch(convert), {'converted': 8, 'failed': 2, 'skipped': 0})
+        self.assertEqual(sorted(converted), [0, 1, 2, 4, 5, 6, 8, 9])
+        # two retries for each failed record, with the wait doubling.
+        self.assertEqual(len(self.sleeps), 4)
+        sleeps = sorted(self.sleeps)
+        self.assertTrue(all(0.5 <= s < 1.0 for s in sleeps[:2]))
+        self.assertTrue(all(1.0 <= s < 2.0 for s in sleeps[2:]))
+
+        journal = Journal(self.path, SETTINGS)
+        self.assertEqual(journal.counts()[FAILED], 2)
+        self.assertEqual(
+            journal.failures(),
+            [('3', 3, 'AttributeError: trouble with tiff file.'),
+             ('7', 3, 'AttributeError: trouble with tiff file.')]
+        )
+        journal.close()
+
+        # a second run only redoes the failed records.
+        converted.clear()
+        self.assertEqual(self.run_batch(lambda n: converted.append(n)), {'converted': 2, 'failed': 0, 'skipped': 8})
+        self.assertEqual(sorted(converted), [3, 7])
+
+    def test_retry_then_succeed(self):
+        attempts = []
+        def convert(n):
+            attempts.append(n)
+            if attempts.count(n) < 2:
+                raise ConnectionError()
+        self.assertEqual(self.run_batch(convert), {'converted': 10, 'failed': 0, 'skipped': 0})
+        self.assertEqual(len(self.sleeps), 10)
+
+    def test_interrupted_records_are_redone(self):
+        journal = Journal(self.path, SETTINGS)
+        journal.add(k for k, _ in self.jobs)
+        for k, _ in self.jobs[:5]:
+            journal.done(k)
+        journal.start('5')
+        self.assertEqual(journal.counts()[RUNNING], 1)
+        journal.close()
+
+        converted = []
+        self.assertEqual(self.run_batch(converted.append), {'converted': 5, 'failed': 0, 'skipped': 5})
+        self.assertEqual(sorted(converted), [5, 6, 7, 8, 9])
+
+        journal = Journal(self.path)
+        self.assertEqual(journal.counts()[DONE], 10)
+        journal.close()
+
+    def test_refuses_different_settings(self):
+        Journal(self.path, SETTINGS).close()
+        with self.assertRaises(ValueError):
+            Journal(self.path, {'format': 'dc', 'no_images': False})
+
+    def test_write_atomic(self):
+        path = os.path.join(self.tmp.name, 'b2test.ttl')
+        write_atomic(path, 'triples')
+        with open(path) as f:
+            self.assertEqual(f.read(), 'triples')
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ['b2test.ttl'])
+
+
+if __name__ == '__main__':
+    unittest.main()
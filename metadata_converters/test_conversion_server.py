@@ -0,0 +1,96 @@
+import io, threading, unittest, urllib.error, urllib.request
+from unittest import mock
+from classes import MarcXmlToSchemaDotOrg, SocSciMapsMarcXmlToDc
+from conversion_server import ConversionServer
+from pymarc import Field, MARCReader, Subfield
+
+
+class TestConversionServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ConversionServer(('127.0.0.1', 0), workers=1)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.url = 'http://127.0.0.1:{}'.format(cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def post(self, path, body, content_type):
+        request = urllib.request.Request(
+            self.url + path,
+            data=body,
+            headers={'Content-Type': content_type}
+        )
+        with urllib.request.urlopen(request) as response:
+            return response.read().decode('utf-8')
+
+    def test_schemadotorg(self):
+        with open('../test_data/sample_record_03.xml', 'rb') as f:
+            marcxml = f.read()
+        self.assertEqual(
+            self.post('/schemadotorg', marcxml, 'application/marcxml+xml'),
+            str(MarcXmlToSchemaDotOrg(marcxml.decode('utf-8')))
+        )
+
+    def test_dc_from_binary_marc(self):
+        """post a digital and a print record as binary MARC."""
+        records = {}
+        body = b''
+        for m in ('7641168', '3451312'):
+            with open('../test_data/{}.mrc'.format(m), 'rb') as f:
+                data = f.read()
+            body += data
+            records[m] = next(iter(MARCReader(data)))
+        self.assertEqual(
+            self.post('/dc?crosswalk=socscimaps&noid=b2dq0kf6d36z', body, 'application/marc'),
+            str(SocSciMapsMarcXmlToDc(records['7641168'], records['3451312'], 'b2dq0kf6d36z'))
+        )
+
+    def test_unknown_format(self):
+        with self.assertRaises(urllib.error.HTTPError) as e:
+            self.post('/marc21', b'', 'application/marc')
+        self.assertEqual(e.exception.code, 404)
+
+    def test_unknown_path_with_body(self):
+        with self.assertRaises(urllib.error.HTTPError) as e:
+            self.post('/dc/extra?noid=b2dq0kf6d36z', b'<not xml', 'application/marcxml+xml')
+        self.assertEqual(e.exception.code, 404)
+        self.assertEqual(e.exception.read(), b'unknown format /dc/extra\n')
+
+    def test_malformed_body(self):
+        for path in ('/schemadotorg', '/webmetadata', '/dc?noid=b2dq0kf6d36z'):
+            with self.assertRaises(urllib.error.HTTPError) as e:
+                self.post(path, b'<not xml', 'application/marcxml+xml')
+            self.assertEqual(e.exception.code, 400, path)
+            self.assertTrue(e.exception.read().startswith(b'could not convert record'))
+
+    def read_pair(self):
+        records = []
+        for m in ('7641168', '3451312'):
+            with open('../test_data/{}.mrc'.format(m), 'rb') as f:
+                records.append(next(iter(MARCReader(f))))
+        return records
+
+    def test_missing_noid(self):
+        body = b''.join(r.as_marc() for r in self.read_pair())
+        with self.assertRaises(urllib.error.HTTPError) as e:
+            self.post('/dc', body, 'application/marc')
+        self.assertEqual(e.exception.code, 400)
+
+    def test_converter_error(self):
+        """an error in a converter is a server error, and is logged."""
+        digital_record, print_record = self.read_pair()
+        # the DC crosswalk expects a $t in a 700.
+        digital_record.add_ordered_field(Field(tag='700', indicators=['1', ' '], subfields=[Subfield('a', 'Someone.')]))
+        with mock.patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            with self.assertRaises(urllib.error.HTTPError) as e:
+                self.post('/dc?noid=b2dq0kf6d36z', digital_record.as_marc() + print_record.as_marc(), 'application/marc')
+        self.assertEqual(e.exception.code, 500)
+        self.assertIn('KeyError', stderr.getvalue())
+
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from edm_rules import CompiledRules, check_ntriples
+from rdflib import Graph, Literal, URIRef
+from rdflib.namespace import DC, DCTERMS
+
+EDM = 'http://www.europeana.eu/schemas/edm/'
+CHO = URIRef('ark:61001/b2nw3wm8552h')
+AGG = URIRef('ark:61001/b2nw3wm8552h/aggregation')
+REM = URIRef('ark:61001/b2nw3wm8552h/rem')
+
+
+class TestEdmRules(unittest.TestCase):
+    def setUp(self):
+        self.g = Graph()
+        self.g.parse('test_data/3404181.ttl', format='turtle')
+
+    def check(self):
+        return [
+            (v['focus'], v['severity'], v['reason'])
+            for v in check_ntriples(self.g.serialize(format='nt').splitlines())
+        ]
+
+    def test_valid_record(self):
+        self.assertEqual(self.check(), [])
+
+    def test_missing_title_and_description(self):
+        self.g.remove((CHO, DC.title, None))
+        self.g.remove((CHO, DC.description, None))
+        self.assertEqual(self.check(), [
+            (str(CHO), 'error', 'dc:description, dc:title, or both are mandatory.')
+        ])
+
+    def test_edm_type(self):
+        self.g.set((CHO, URIRef(EDM + 'type'), Literal('MAP')))
+        self.assertEqual(self.check(), [
+            (str(CHO), 'error', 'edm:type must be one of TEXT, IMAGE, SOUND, VIDEO or 3D.')
+        ])
+
+        self.g.set((CHO, URIRef(EDM + 'type'), Literal('TEXT')))
+        self.g.remove((CHO, DC.language, None))
+        self.assertEqual(self.check(), [
+            (str(CHO), 'error', 'dc:language must appear for TEXT objects.')
+        ])
+
+    def test_year_is_a_warning(self):
+        self.g.remove((CHO, URIRef(EDM + 'year'), None))
+        self.assertEqual(self.check(), [
+            (str(CHO), 'warning', 'edm:year should occur.')
+        ])
+
+    def test_aggregation(self):
+        self.g.remove((AGG, URIRef(EDM + 'object'), None))
+        self.g.remove((AGG, URIRef(EDM + 'rights'), None))
+        self.assertEqual(self.check(), [
+            (str(AGG), 'error', 'if edm:isShownBy is used, edm:object must be supplied.'),
+            (str(AGG), 'error', 'edm:rights is mandatory.')
+        ])
+
+    def test_resource_map(self):
+        self.g.remove((REM, DCTERMS.modified, None))
+        self.assertEqual(self.check(), [
+            (str(REM), 'error', 'dcterms:created and dcterms:modified are mandatory.')
+        ])
+
+    def test_subjects_need_not_be_grouped(self):
+        lines = sorted(self.g.serialize(format='nt').splitlines(), reverse=True)
+        self.assertEqual(check_ntriples(lines, CompiledRules()), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
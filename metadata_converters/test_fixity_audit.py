@@ -0,0 +1,152 @@
+import io, json, os, tempfile, unittest
+from unittest import mock
+from batch_convert import DONE, FAILED, Journal
+from fixity_audit import RateLimiter, audit_object, in_sample, main, run, write_report
+from ocfl import OcflObject, object_path
+
+NOIDS = ['b2test000{}0k'.format(n) for n in range(6)]
+SETTINGS = {'root': 'pairtree', 'sample': 1.0, 'seed': '0'}
+
+
+class TestFixityAudit(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, 'pairtree')
+        os.makedirs(self.root)
+        for noid in NOIDS:
+            with OcflObject(self.root, noid) as obj:
+                obj.add_bytes(os.urandom(10000), 'file.tif')
+                obj.add_bytes(b'<metadata/>', 'file.dc.xml')
+                obj.commit('Initial ingest.')
+        self.journal_path = os.path.join(self.tmp.name, 'journal.sqlite')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def content(self, noid, name):
+        return os.path.join(object_path(self.root, noid), 'v1', 'content', name)
+
+    def audit(self, noids=NOIDS):
+        journal = Journal(self.journal_path, SETTINGS)
+        try:
+            return run(journal, self.root, noids, 2)
+        finally:
+            journal.close()
+
+    def test_clean_object(self):
+        self.assertEqual(audit_object(object_path(self.root, NOIDS[0])), [])
+
+    def test_problems(self):
+        with open(self.content(NOIDS[0], 'file.tif'), 'r+b') as f:
+            f.write(b'corrupt')
+        os.remove(self.content(NOIDS[1], 'file.dc.xml'))
+        with open(self.content(NOIDS[2], 'extra.txt'), 'w') as f:
+            f.write('extra')
+        with open(os.path.join(object_path(self.root, NOIDS[3]), 'inventory.json'), 'a') as f:
+            f.write(' ')
+
+        self.assertEqual(
+            [(p['problem'], p.get('algorithm')) for p in audit_object(object_path(self.root, NOIDS[0]))],
+            [('mismatch', 'md5'), ('mismatch', 'sha512')]
+        )
+        self.assertEqual(
+            audit_object(object_path(self.root, NOIDS[1])),
+            [{'path': 'v1/content/file.dc.xml', 'problem': 'missing'}]
+        )
+        self.assertEqual(
+            audit_object(object_path(self.root, NOIDS[2])),
+            [{'path': 'v1/content/extra.txt', 'problem': 'unexpected'}]
+        )
+        self.assertEqual(
+            [p['path'] for p in audit_object(object_path(self.root, NOIDS[3]))],
+            ['inventory.json']
+        )
+
+    def test_malformed_inventory(self):
+        path = object_path(self.root, NOIDS[5])
+        with open(os.path.join(path, 'inventory.json')) as f:
+            inventory = json.load(f)
+        inventory['manifest'] = list(inventory['manifest'])
+        with open(os.path.join(path, 'inventory.json'), 'w') as f:
+            json.dump(inventory, f)
+        problems = audit_object(path)
+        self.assertEqual(
+            [(p['path'], p['problem']) for p in problems],
+            [('inventory.json', 'mismatch'), ('inventory.json', 'unreadable')]
+        )
+        self.assertTrue(problems[1]['error'].startswith('AttributeError'))
+
+        # the object is reported, and the audit goes on.
+        self.assertEqual(self.audit(), {'audited': 6, 'problems': 1, 'skipped': 0})
+
+    def main(self, *args):
+        argv = ['fixity_audit', '--workers=2', '--journal={}'.format(self.journal_path),
+                '--report={}'.format(os.path.join(self.tmp.name, 'report.jsonl'))] + list(args) + [self.root]
+        with mock.patch('sys.argv', argv), mock.patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            try:
+                main()
+            except SystemExit as e:
+                return e.code, stderr.getvalue()
+        return 0, stderr.getvalue()
+
+    def test_finished_journal(self):
+        self.assertEqual(self.main(), (0, 'audited 6 objects, 0 with problems, skipped 0 already audited.\n'))
+        # a finished journal isn't a successful audit of nothing.
+        code, stderr = self.main()
+        self.assertEqual(code, 1)
+        self.assertIn('--restart', stderr)
+        self.assertEqual(self.main('--restart'), (0, 'audited 6 objects, 0 with problems, skipped 0 already audited.\n'))
+
+    def test_run_report_and_resume(self):
+        with open(self.content(NOIDS[4], 'file.tif'), 'r+b') as f:
+            f.write(b'corrupt')
+        self.assertEqual(self.audit(), {'audited': 6, 'problems': 1, 'skipped': 0})
+
+        report = os.path.join(self.tmp.name, 'report.jsonl')
+        journal = Journal(self.journal_path)
+        write_report(journal, report)
+        self.assertEqual(journal.counts()[DONE], 5)
+        journal.close()
+        with open(report) as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual([l['noid'] for l in lines], [NOIDS[4]])
+        self.assertEqual(lines[0]['problems'][0]['path'], 'v1/content/file.tif')
+
+        # a second run only checks the object with a problem again.
+        self.assertEqual(self.audit(), {'audited': 1, 'problems': 1, 'skipped': 5})
+
+    def test_interrupted_audit_resumes(self):
+        journal = Journal(self.journal_path, SETTINGS)
+        journal.add(NOIDS)
+        for noid in NOIDS[:4]:
+            journal.done(noid)
+        journal.start(NOIDS[4])
+        journal.close()
+        self.assertEqual(self.audit(), {'audited': 2, 'problems': 0, 'skipped': 4})
+
+        journal = Journal(self.journal_path)
+        self.assertEqual((journal.counts()[DONE], journal.counts()[FAILED]), (6, 0))
+        journal.close()
+
+    def test_sample(self):
+        noids = ['b2{:010d}'.format(n) for n in range(2000)]
+        sample = [n for n in noids if in_sample(n, 0.1, '0')]
+        self.assertTrue(150 < len(sample) < 250)
+        self.assertEqual(sample, [n for n in noids if in_sample(n, 0.1, '0')])
+        self.assertNotEqual(sample, [n for n in noids if in_sample(n, 0.1, '1')])
+
+    def test_rate_limiter(self):
+        now = [0.0]
+        sleeps = []
+        def sleep(s):
+            sleeps.append(s)
+            now[0] += s
+        limiter = RateLimiter(1000, lambda: now[0], sleep)
+        for _ in range(4):
+            limiter.consume(500)
+        self.assertEqual(sleeps, [0.5, 0.5, 0.5, 0.5])
+        self.assertEqual(now[0], 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import glob, os, unittest
+from classes import MarcXmlToSchemaDotOrg, SocSciMapsMarcXmlToDc
+from marc2dc import pair_records, read_records
+from rdflib import Graph
+from rdflib.compare import to_canonical_graph
+from ssmaps_edm import build_record_triples
+
+# compare every fixture's DC, Schema.org and EDM against canonical output in
+# test_data/golden. After an intended change to a converter, rewrite them
+# with:
+#   REGENERATE_GOLDEN=1 python -m unittest test_golden
+
+GOLDEN = os.path.join('test_data', 'golden')
+CREATED = '2020-01-01T00:00:00'
+MODIFIED = '2020-01-02T00:00:00'
+
+
+def canonical_ntriples(turtle):
+    """Sorted N-Triples with blank nodes relabeled, so that output can be
+    compared line by line."""
+    g = Graph()
+    g.parse(data=turtle, format='turtle')
+    lines = to_canonical_graph(g).serialize(format='nt').splitlines()
+    return '\n'.join(sorted(line for line in lines if line)) + '\n'
+
+
+class TestGolden(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Convert every fixture once for the whole class."""
+        cls.outputs = {}
+
+        paths = sorted(glob.glob('../test_data/*.mrc'))
+        for digital_record_id, digital_record, print_record in pair_records(read_records(paths)):
+            noid = 'b2test{}'.format(digital_record_id)
+            cls.outputs['{}.dc.xml'.format(digital_record_id)] = str(
+                SocSciMapsMarcXmlToDc(digital_record, print_record, noid)
+            ) + '\n'
+            cls.outputs['{}.edm.nt'.format(digital_record_id)] = canonical_ntriples(
+                build_record_triples(
+                    digital_record.as_marc(),
+                    print_record.as_marc(),
+                    noid,
+                    [],
+                    CREATED,
+                    MODIFIED
+                )
+            )
+
+        for path in sorted(glob.glob('../test_data/sample_record_*.xml')):
+            with open(path) as f:
+                marcxml = f.read()
+            name = os.path.splitext(os.path.basename(path))[0]
+            cls.outputs['{}.schema.json'.format(name)] = str(
+                MarcXmlToSchemaDotOrg(marcxml)
+            ) + '\n'
+
+        if os.environ.get('REGENERATE_GOLDEN'):
+            os.makedirs(GOLDEN, exist_ok=True)
+            for name, output in cls.outputs.items():
+                with open(os.path.join(GOLDEN, name), 'w') as f:
+                    f.write(output)
+
+    def test_every_fixture_is_converted(self):
+        self.assertEqual(
+            sorted(self.outputs),
+            sorted(os.listdir(GOLDEN))
+        )
+
+    def test_matches_golden_output(self):
+        for name, output in sorted(self.outputs.items()):
+            with self.subTest(name=name):
+                with open(os.path.join(GOLDEN, name)) as f:
+                    self.assertEqual(output, f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import io, os, random, rdflib, tempfile, unittest
+from unittest import mock
+from graph_diff import canonical_lines, diff_sorted, external_sort, graph_diff, sparql_updates
+from upload_to_marklogic import read_statements
+
+
+class TestGraphDiff(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def test_external_sort(self):
+        """sorting in runs on disk matches sorting in memory."""
+        r = random.Random(37)
+        lines = ['<https://example.org/{}> <p> "o" .'.format(r.randrange(500)) for _ in range(2000)]
+        for buffer_size in (1, 7, 100, 2000, 5000):
+            self.assertEqual(
+                list(external_sort(lines, buffer_size, self.tmp.name)),
+                sorted(set(lines))
+            )
+        self.assertEqual(list(external_sort([], 10)), [])
+
+    def test_diff_sorted(self):
+        self.assertEqual(
+            list(diff_sorted(['a', 'b', 'd'], ['b', 'c', 'd', 'e'])),
+            [('-', 'a'), ('+', 'c'), ('+', 'e')]
+        )
+
+    def test_canonical_lines(self):
+        path = self.write('g.nt', '# a comment\n\n<s>\t<p>   "a b" .\n<s> <p> <o>.\n')
+        self.assertEqual(
+            list(canonical_lines([path])),
+            ['<s> <p> "a b" .', '<s> <p> <o> .']
+        )
+
+    def test_graph_diff(self):
+        old = self.write('old.nt', '<s> <p> "old title" .\n<s> <q> <o> .\n<t> <p> "same" .\n')
+        new = self.write('new.nt', '<t> <p> "same" .\n<s> <q> <o> .\n<s> <p> "new title" .\n')
+        deletes, inserts = graph_diff([old], [new], 2, self.tmp.name)
+        self.assertEqual(deletes, ['<s> <p> "old title" .'])
+        self.assertEqual(inserts, ['<s> <p> "new title" .'])
+        self.assertEqual(
+            list(sparql_updates(deletes, inserts, 'https://example.org/g')),
+            [
+                'DELETE DATA { GRAPH <https://example.org/g> {\n<s> <p> "old title" .\n} }',
+                'INSERT DATA { GRAPH <https://example.org/g> {\n<s> <p> "new title" .\n} }'
+            ]
+        )
+
+    def test_turtle_against_ntriples(self):
+        """a graph compared with its own N-Triples has no differences."""
+        nt = self.write('3404181.nt', '\n'.join(canonical_lines(['test_data/3404181.ttl'])))
+        self.assertEqual(graph_diff(['test_data/3404181.ttl'], [nt]), ([], []))
+
+    def test_blank_nodes_match_upload(self):
+        """applying the diff to what upload_to_marklogic sent for the old
+        graph gives what it would send for the new one."""
+        old = self.write('old.ttl',
+            '@prefix e: <https://example.org/> .\n'
+            'e:s e:p [ e:q "x" ] , [ e:q "y" ] ; e:r "same" .\n')
+        new = self.write('new.ttl',
+            '@prefix e: <https://example.org/> .\n'
+            'e:s e:p [ e:q "x" ] , [ e:q "z" ] ; e:r "same" .\n')
+
+        def uploaded(path):
+            g = rdflib.Graph()
+            g.parse(data=b''.join(s for _, s in read_statements([path])).decode('utf-8'), format='nt')
+            return g
+
+        # an unchanged file has no differences.
+        nt = self.write('old.nt', '\n'.join(canonical_lines([old])))
+        self.assertEqual(graph_diff([old], [nt]), ([], []))
+
+        deletes, inserts = graph_diff([old], [new])
+        updates = list(sparql_updates(deletes, inserts))
+        self.assertTrue(all(u.startswith(('DELETE DATA', 'INSERT DATA')) for u in updates))
+        self.assertFalse(any('_:' in u for u in updates))
+
+        store = uploaded(old)
+        for update in updates:
+            store.update(update)
+        self.assertEqual(set(store), set(uploaded(new)))
+        self.assertFalse(any(isinstance(t, rdflib.BNode) for triple in store for t in triple))
+
+    def test_blank_nodes_on_stdin_are_refused(self):
+        stdin = io.TextIOWrapper(io.BytesIO(b'<https://example.org/s> <https://example.org/p> _:b0 .\n'))
+        with mock.patch('sys.stdin', stdin):
+            with self.assertRaises(ValueError):
+                list(canonical_lines(['-']))
+
+    def test_sparql_update_batches(self):
+        inserts = ['<s> <p> "{}" .'.format(i) for i in range(5)]
+        updates = list(sparql_updates([], inserts, batch=2))
+        self.assertEqual(len(updates), 3)
+        self.assertTrue(all(u.startswith('INSERT DATA {\n') for u in updates))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import os, tempfile, unittest
+from graph_store import SQLiteStore, decode_term, encode_term, load_graph
+from rdflib import BNode, Graph, Literal, URIRef
+from rdflib.namespace import XSD
+
+
+class TestGraphStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.memory = Graph()
+        self.memory.parse('test_data/3404181.ttl', format='turtle')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_terms_round_trip(self):
+        for term in (
+            URIRef('https://example.org/a'),
+            BNode('b0'),
+            Literal('plain'),
+            Literal('tab\tand\nnewline'),
+            Literal('chat', lang='fr'),
+            Literal('1930', datatype=XSD.integer)
+        ):
+            self.assertEqual(decode_term(encode_term(term)), term)
+
+    def test_same_triples_as_memory(self):
+        g = load_graph('test_data/3404181.ttl', 'turtle', self.tmp.name)
+        self.assertEqual(set(g), set(self.memory))
+        self.assertEqual(len(g), len(self.memory))
+        query = 'SELECT ?s ?o WHERE { ?s dc:title ?o . }'
+        self.assertEqual(list(g.query(query)), list(self.memory.query(query)))
+        g.close()
+
+    def test_cache_is_reused(self):
+        load_graph('test_data/3404181.ttl', 'turtle', self.tmp.name).close()
+        (db,) = os.listdir(self.tmp.name)
+        mtime = os.stat(os.path.join(self.tmp.name, db)).st_mtime_ns
+
+        g = load_graph('test_data/3404181.ttl', 'turtle', self.tmp.name)
+        self.assertEqual(os.listdir(self.tmp.name), [db])
+        self.assertEqual(os.stat(os.path.join(self.tmp.name, db)).st_mtime_ns, mtime)
+        self.assertEqual(set(g), set(self.memory))
+        g.close()
+
+    def test_failed_load_is_not_cached(self):
+        path = os.path.join(self.tmp.name, 'bad.ttl')
+        with open(path, 'w') as f:
+            f.write('<a> <b> .\n')
+        store_dir = os.path.join(self.tmp.name, 'store')
+        with self.assertRaises(Exception):
+            load_graph(path, 'turtle', store_dir)
+        self.assertEqual(os.listdir(store_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
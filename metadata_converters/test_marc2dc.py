@@ -0,0 +1,94 @@
+import io, os, tempfile, unittest
+from unittest import mock
+from classes import SocSciMapsMarcXmlToDc
+from marc2dc import append_noids, marc_to_dc_batch, pair_records, read_noids, read_records
+from metrics import Metrics
+from pymarc import Field, MARCReader, Subfield
+
+
+class TestMarc2DcBatch(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.paths = [
+            '../test_data/{}.mrc'.format(m) for m in ('3451312', '5999566', '7368094', '7641168')
+        ]
+
+        self.mrc = {}
+        for path in self.paths:
+            with open(path, 'rb') as fh:
+                for record in MARCReader(fh):
+                    self.mrc[record['001'].value()] = record
+
+    def test_pair_records(self):
+        """digital records are matched to print records through the 776 $w."""
+        self.assertEqual(
+            [(d, p['001'].value()) for d, _, p in pair_records(read_records(self.paths))],
+            [('5999566', '7368094'), ('7641168', '3451312')]
+        )
+
+    def test_batch_matches_single_record_conversion(self):
+        noids = {'5999566': 'b2k40qk4wc8z', '7641168': 'b2dq0kf6d36z'}
+        self.assertEqual(
+            list(marc_to_dc_batch(self.paths, SocSciMapsMarcXmlToDc, noids, 2, 1)),
+            [
+                ('5999566', str(SocSciMapsMarcXmlToDc(self.mrc['5999566'], self.mrc['7368094'], 'b2k40qk4wc8z')), None),
+                ('7641168', str(SocSciMapsMarcXmlToDc(self.mrc['7641168'], self.mrc['3451312'], 'b2dq0kf6d36z')), None)
+            ]
+        )
+
+    def test_failed_record_does_not_stop_the_batch(self):
+        # a 700 without a $t can't be converted.
+        bad = self.mrc['5999566']
+        bad.add_ordered_field(Field(tag='700', indicators=['1', ' '], subfields=[Subfield('a', 'Someone.')]))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bad.mrc')
+            with open(path, 'wb') as f:
+                f.write(bad.as_marc())
+            paths = [path] + [p for p in self.paths if not p.endswith('5999566.mrc')]
+
+            noids = {'5999566': 'b2k40qk4wc8z', '7641168': 'b2dq0kf6d36z'}
+            metrics = Metrics()
+            metrics.enabled = True
+            with mock.patch('marc2dc.metrics', metrics), mock.patch('sys.stderr', new_callable=io.StringIO) as stderr:
+                results = list(marc_to_dc_batch(paths, SocSciMapsMarcXmlToDc, noids, 2, 1))
+
+        self.assertEqual([(d, dc is None, e and e[0]) for d, dc, e in results], [
+            ('5999566', True, 'KeyError'),
+            ('7641168', False, None)
+        ])
+        self.assertIn('could not convert 5999566: KeyError', stderr.getvalue())
+        self.assertEqual(metrics.counters[('errors_total', (('kind', 'KeyError'),))], 1)
+        self.assertEqual(metrics.counters[('records_total', ())], 1)
+        self.assertEqual(metrics.gauges[('records_queued', ())], 0)
+
+    def test_queue_gauge_is_reset_when_stopped_early(self):
+        metrics = Metrics()
+        metrics.enabled = True
+        with mock.patch('marc2dc.metrics', metrics):
+            results = marc_to_dc_batch(self.paths, SocSciMapsMarcXmlToDc, {'5999566': 'b2k40qk4wc8z', '7641168': 'b2dq0kf6d36z'}, 2, 1)
+            next(results)
+            results.close()
+        self.assertEqual(metrics.gauges[('records_queued', ())], 0)
+
+    def test_minted_noids_are_saved(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'noids.csv')
+            append_noids(path, [('5999566', 'b2k40qk4wc8z')])
+            first = list(marc_to_dc_batch(
+                self.paths, SocSciMapsMarcXmlToDc, read_noids(path), 2, 1,
+                lambda pairs: append_noids(path, pairs)
+            ))
+            noids = read_noids(path)
+            self.assertEqual(sorted(noids), ['5999566', '7641168'])
+            self.assertEqual(noids['5999566'], 'b2k40qk4wc8z')
+
+            # the next run uses the same NOIDs, so gives the same output.
+            minted = []
+            second = list(marc_to_dc_batch(self.paths, SocSciMapsMarcXmlToDc, noids, 2, 1, minted.append))
+            self.assertEqual(second, first)
+            self.assertEqual(minted, [])
+
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import jinja2, string, unittest
+from classes import MarcXmlDcExtractor, MarcXmlToOpenGraph, MarcXmlToTwitterCard, meta_tag_templates
+from pymarc import parse_xml_to_array
+
+SAMPLE_RECORDS = ['../test_data/sample_record_0{}.xml'.format(n) for n in (1, 2, 3)]
+
+# the templates as they were rendered before they were cached, each with a
+# new jinja2.Template.
+OPENGRAPH = '\n'.join(('<meta property="og:title" content="{{ og_title }}" >',
+                       '<meta property="og:type" content="{{ og_type }}" >',
+                       '<meta property="og:url" content="{{ og_url }}" >',
+                       '<meta property="og:image" content="{{ og_image }}" >',
+                       '<meta property="og:description" content="{{ og_description }}" >',
+                       '<meta property="og:site_name" content="{{ og_site_name }}" >'))
+
+TWITTER_CARD = '\n'.join(('<meta name="twitter:card" content="{{ twitter_card }}" >',
+                          '<meta name="twitter:site" content="{{ twitter_site }}" >',
+                          '<meta name="twitter:title" content="{{ twitter_title }}" >',
+                          '<meta name="twitter:url" content="{{ twitter_url }}" >',
+                          '<meta name="twitter:description" content="{{ twitter_description }}" >',
+                          '<meta name="twitter:image" content="{{ twitter_image }}" >',
+                          '<meta name="twitter:image:alt" content="{{ twitter_image_alt }}" >'))
+
+
+def dc_title_and_description(path):
+    """dc:title and dc:description as MarcXmlToDc builds them, from pymarc."""
+    record = parse_xml_to_array(path)[0]
+    title = sorted(' '.join(f.get_subfields('a', 'b')) for f in record.get_fields('245'))
+    description = sorted(
+        ' '.join(f.get_subfields(*string.ascii_lowercase))
+        for f in record.get_fields('500', '538')
+    )
+    return title, description
+
+
+class TestMetaTags(unittest.TestCase):
+    def setUp(self):
+        self.records = []
+        for path in SAMPLE_RECORDS:
+            with open(path, encoding='utf-8') as f:
+                self.records.append((path, f.read()))
+
+    def test_dc_extractor(self):
+        for path, marcxml in self.records:
+            dc = MarcXmlDcExtractor(marcxml)
+            self.assertEqual((dc.title, dc.description), dc_title_and_description(path), path)
+
+    def test_opengraph_matches_uncached_template(self):
+        for path, marcxml in self.records:
+            title, description = dc_title_and_description(path)
+            self.assertEqual(
+                str(MarcXmlToOpenGraph(marcxml)),
+                jinja2.Template(OPENGRAPH).render(
+                    og_description=description[0],
+                    og_image='image',
+                    og_site_name='site_name',
+                    og_title=title[0],
+                    og_type='website',
+                    og_url='url'
+                ),
+                path
+            )
+
+    def test_twitter_card_matches_uncached_template(self):
+        for path, marcxml in self.records:
+            title, description = dc_title_and_description(path)
+            self.assertEqual(
+                str(MarcXmlToTwitterCard(marcxml)),
+                jinja2.Template(TWITTER_CARD).render(
+                    twitter_card='card',
+                    twitter_description=description[0],
+                    twitter_image='image',
+                    twitter_image_alt='image_alt',
+                    twitter_site='site',
+                    twitter_title=title[0],
+                    twitter_url='url'
+                ),
+                path
+            )
+
+    def test_templates_are_compiled_once(self):
+        self.assertIs(meta_tag_templates(), meta_tag_templates())
+        self.assertIs(
+            meta_tag_templates().get_template('opengraph.html'),
+            meta_tag_templates().get_template('opengraph.html')
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import json, os, tempfile, time, unittest, urllib.request
+from metrics import NULL_TIMER, Metrics, SnapshotWriter, metrics, serve_prometheus, start
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics(buckets=(0.1, 1.0))
+        self.metrics.enabled = True
+
+    def test_off_until_started(self):
+        m = Metrics()
+        m.count('records_total')
+        m.gauge('records_fetching', 1)
+        m.observe('fetch_seconds', 0.5, source='solr')
+        self.assertIs(m.timer('fetch_seconds'), NULL_TIMER)
+        self.assertEqual(
+            (m.counters, m.gauges, m.histograms),
+            ({}, {}, {})
+        )
+
+    def test_start_restores_state(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'metrics.jsonl')
+            for run in (1, 2):
+                with start(path, interval=3600):
+                    metrics.count('records_total')
+                    metrics.gauge('records_queued', 5)
+                self.assertFalse(metrics.enabled)
+                self.assertEqual((metrics.counters, metrics.gauges, metrics.histograms), ({}, {}, {}))
+            with open(path) as f:
+                snapshots = [json.loads(line) for line in f]
+        # each run starts from zero, and its last snapshot is still written.
+        self.assertEqual([s['counters'] for s in snapshots], [{'records_total': 1}] * 2)
+
+    def test_snapshot(self):
+        self.metrics.count('records_total')
+        self.metrics.count('records_total', 2)
+        self.metrics.count('errors_total', kind='KeyError')
+        with self.metrics.in_progress('records_fetching'):
+            self.assertEqual(self.metrics.snapshot()['gauges'], {'records_fetching': 1})
+        for seconds in (0.05, 0.5, 0.5, 3.0):
+            self.metrics.observe('fetch_seconds', seconds, source='solr')
+
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot['counters'], {
+            'errors_total{kind="KeyError"}': 1,
+            'records_total': 3
+        })
+        self.assertEqual(snapshot['gauges'], {'records_fetching': 0})
+        self.assertEqual(snapshot['histograms'], {
+            'fetch_seconds{source="solr"}': {
+                'buckets': {'0.1': 1, '1.0': 3, '+Inf': 4},
+                'count': 4,
+                'sum': 4.05
+            }
+        })
+
+    def test_prometheus(self):
+        self.metrics.count('records_total', 3)
+        self.metrics.observe('fetch_seconds', 0.5, source='tiff')
+        self.assertEqual(
+            self.metrics.prometheus().splitlines(),
+            [
+                '# TYPE metadata_converters_records_total counter',
+                'metadata_converters_records_total 3',
+                '# TYPE metadata_converters_fetch_seconds histogram',
+                'metadata_converters_fetch_seconds_bucket{source="tiff",le="0.1"} 0',
+                'metadata_converters_fetch_seconds_bucket{source="tiff",le="1.0"} 1',
+                'metadata_converters_fetch_seconds_bucket{source="tiff",le="+Inf"} 1',
+                'metadata_converters_fetch_seconds_sum{source="tiff"} 0.5',
+                'metadata_converters_fetch_seconds_count{source="tiff"} 1'
+            ]
+        )
+
+    def test_snapshot_writer(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'metrics.jsonl')
+            writer = SnapshotWriter(self.metrics, path, 0.01)
+            writer.start()
+            self.metrics.count('records_total', 5)
+            time.sleep(0.05)
+            writer.stop()
+
+            with open(path) as f:
+                snapshots = [json.loads(line) for line in f]
+        self.assertGreater(len(snapshots), 1)
+        self.assertEqual(snapshots[-1]['counters'], {'records_total': 5})
+        self.assertIn('records_per_second', snapshots[-1])
+
+    def test_prometheus_endpoint(self):
+        self.metrics.count('records_total', 7)
+        server = serve_prometheus(self.metrics, 0, 'localhost')
+        try:
+            url = 'http://localhost:{}/metrics'.format(server.server_address[1])
+            with urllib.request.urlopen(url) as r:
+                self.assertIn('metadata_converters_records_total 7', r.read().decode('utf-8'))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+import concurrent.futures, errno, hashlib, json, os, tempfile, unittest
+from unittest import mock
+from classes import NoidManager
+from ocfl import COPY, LINK, NAMASTE, REFLINK, DigestCache, OcflObject, copy_with_digests, object_path, place_file
+
+CREATED = '2020-01-01T00:00:00+00:00'
+
+
+class TestOcfl(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, 'pairtree')
+        os.makedirs(self.root)
+        self.master = os.path.join(self.tmp.name, 'master.tif')
+        self.master_data = os.urandom(100000)
+        with open(self.master, 'wb') as f:
+            f.write(self.master_data)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_object(self, noid):
+        with OcflObject(self.root, noid) as obj:
+            obj.add_file(self.master, 'file.tif')
+            obj.add_bytes(b'<metadata/>', 'file.dc.xml')
+            return obj.commit('Initial ingest.', {'name': 'tester'}, CREATED)
+
+    def test_copy_with_digests(self):
+        dst = os.path.join(self.tmp.name, 'copy.tif')
+        digests = copy_with_digests(self.master, dst, buffer_size=4096)
+        with open(dst, 'rb') as f:
+            self.assertEqual(f.read(), self.master_data)
+        self.assertEqual(digests, {
+            'md5': hashlib.md5(self.master_data).hexdigest(),
+            'sha512': hashlib.sha512(self.master_data).hexdigest(),
+            'size': len(self.master_data)
+        })
+
+    def test_object_layout(self):
+        inventory = self.write_object('b2test00000k')
+        path = object_path(self.root, 'b2test00000k')
+        self.assertEqual(
+            sorted(os.listdir(path)),
+            [NAMASTE, 'inventory.json', 'inventory.json.sha512', 'v1']
+        )
+        with open(os.path.join(path, 'v1', 'content', 'file.tif'), 'rb') as f:
+            self.assertEqual(f.read(), self.master_data)
+
+        sha512 = hashlib.sha512(self.master_data).hexdigest()
+        self.assertEqual(inventory['id'], 'ark:61001/b2test00000k')
+        self.assertEqual(inventory['manifest'][sha512], ['v1/content/file.tif'])
+        self.assertEqual(inventory['versions']['v1']['state'][sha512], ['file.tif'])
+        self.assertEqual(inventory['versions']['v1']['created'], CREATED)
+        self.assertEqual(
+            inventory['fixity']['md5'][hashlib.md5(self.master_data).hexdigest()],
+            ['v1/content/file.tif']
+        )
+
+        for d in (path, os.path.join(path, 'v1')):
+            with open(os.path.join(d, 'inventory.json'), 'rb') as f:
+                data = f.read()
+            self.assertEqual(json.loads(data), inventory)
+            with open(os.path.join(d, 'inventory.json.sha512')) as f:
+                self.assertEqual(f.read(), '{}  inventory.json\n'.format(hashlib.sha512(data).hexdigest()))
+
+        self.assertEqual(NoidManager(self.root).list(), ['b2test00000k'])
+
+    def test_abort_leaves_nothing(self):
+        with self.assertRaises(RuntimeError):
+            with OcflObject(self.root, 'b2test00000k') as obj:
+                obj.add_file(self.master, 'file.tif')
+                raise RuntimeError()
+        self.assertFalse(os.path.exists(object_path(self.root, 'b2test00000k')))
+        self.assertEqual(NoidManager(self.root).list(), [])
+        parent = os.path.dirname(object_path(self.root, 'b2test00000k'))
+        self.assertEqual(os.listdir(parent), [])
+
+    def test_list_skips_staging(self):
+        real_rename = os.rename
+        seen = []
+        def rename(src, dst):
+            # the object is complete, namaste file and all, but not in place.
+            self.assertTrue(os.path.exists(os.path.join(src, NAMASTE)))
+            seen.append(NoidManager(self.root).list())
+            real_rename(src, dst)
+
+        self.write_object('b2test00010k')
+        with mock.patch('os.rename', side_effect=rename):
+            self.write_object('b2test00000k')
+        self.assertEqual(seen, [['b2test00010k']])
+        self.assertEqual(NoidManager(self.root).list(), ['b2test00000k', 'b2test00010k'])
+
+    def test_existing_object(self):
+        self.write_object('b2test00000k')
+        with self.assertRaises(FileExistsError):
+            OcflObject(self.root, 'b2test00000k')
+
+    def test_relative_names_only(self):
+        with OcflObject(self.root, 'b2test00000k') as obj:
+            with self.assertRaises(ValueError):
+                obj.add_bytes(b'', '../escape')
+
+    def test_concurrent_objects(self):
+        noids = ['b2test000{}0k'.format(n) for n in range(8)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(self.write_object, noids))
+        self.assertEqual(sorted(NoidManager(self.root).list()), noids)
+
+
+class TestPlacement(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, 'master.tif')
+        self.data = os.urandom(50000)
+        with open(self.src, 'wb') as f:
+            f.write(self.data)
+        self.dst = os.path.join(self.tmp.name, 'file.tif')
+        self.digests = {
+            'md5': hashlib.md5(self.data).hexdigest(),
+            'sha512': hashlib.sha512(self.data).hexdigest(),
+            'size': len(self.data)
+        }
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_link(self):
+        self.assertEqual(place_file(self.src, self.dst, LINK), (LINK, self.digests))
+        self.assertEqual(os.stat(self.src).st_ino, os.stat(self.dst).st_ino)
+
+    def test_link_uses_cached_digests(self):
+        cache = DigestCache()
+        cached = dict(self.digests, sha512='cached')
+        cache.put(self.src, os.stat(self.src), cached)
+        # the file isn't read again, so the cached digest is what comes back.
+        self.assertEqual(place_file(self.src, self.dst, LINK, cache), (LINK, cached))
+
+    def test_changed_source_is_hashed_again(self):
+        cache = DigestCache()
+        cache.put(self.src, os.stat(self.src), dict(self.digests, sha512='stale'))
+        with open(self.src, 'ab') as f:
+            f.write(b'more')
+        _, digests = place_file(self.src, self.dst, LINK, cache)
+        self.assertEqual(digests['sha512'], hashlib.sha512(self.data + b'more').hexdigest())
+
+    def test_reflink(self):
+        method, digests = place_file(self.src, self.dst, REFLINK)
+        self.assertIn(method, (REFLINK, 'copy_file_range', COPY))
+        self.assertEqual(digests, self.digests)
+        with open(self.dst, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_falls_back_to_copy(self):
+        cache = DigestCache()
+        with mock.patch('os.link', side_effect=OSError(errno.EXDEV, 'cross-device link')):
+            self.assertEqual(place_file(self.src, self.dst, LINK, cache), (COPY, self.digests))
+        self.assertNotEqual(os.stat(self.src).st_ino, os.stat(self.dst).st_ino)
+        # the copy's digests are cached for next time.
+        self.assertEqual(cache.get(self.src, os.stat(self.src)), self.digests)
+
+    def test_other_errors_are_raised(self):
+        with mock.patch('os.link', side_effect=OSError(errno.ENOSPC, 'no space')):
+            with self.assertRaises(OSError):
+                place_file(self.src, self.dst, LINK)
+
+    def test_cache_file(self):
+        path = os.path.join(self.tmp.name, 'digests.json')
+        cache = DigestCache(path)
+        cache.digests(self.src, os.stat(self.src))
+        cache.save()
+        self.assertEqual(DigestCache(path).get(self.src, os.stat(self.src)), self.digests)
+
+    def test_object_with_links(self):
+        root = os.path.join(self.tmp.name, 'pairtree')
+        with OcflObject(root, 'b2test00000k', LINK) as obj:
+            obj.add_file(self.src, 'file.tif')
+            inventory = obj.commit('Initial ingest.')
+        self.assertEqual(inventory['manifest'][self.digests['sha512']], ['v1/content/file.tif'])
+        linked = os.path.join(object_path(root, 'b2test00000k'), 'v1', 'content', 'file.tif')
+        self.assertEqual(os.stat(self.src).st_ino, os.stat(linked).st_ino)
+
+
+if __name__ == '__main__':
+    unittest.main()
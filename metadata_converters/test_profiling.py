@@ -0,0 +1,84 @@
+import io, os, pstats, tempfile, unittest
+from profiling import NULL_STAGE, Profiler, collect
+from pymarc import MARCReader
+from ssmaps_edm import build_record_triples
+
+
+def read_record(identifier):
+    with open('../test_data/{}.mrc'.format(identifier), 'rb') as f:
+        return next(iter(MARCReader(f)))
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.environ = dict(os.environ)
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.environ)
+
+    def test_off_by_default(self):
+        os.environ.pop('METADATA_CONVERTERS_PROFILE', None)
+        os.environ.pop('METADATA_CONVERTERS_PSTATS', None)
+        p = Profiler.from_environment()
+        self.assertIs(p.stage('graph'), NULL_STAGE)
+        self.assertIs(p.record('b2test'), NULL_STAGE)
+        with p.stage('graph'):
+            p.count('records')
+        self.assertEqual(p.drain(), ({}, {}))
+
+        out = io.StringIO()
+        p.summary(out)
+        self.assertEqual(out.getvalue(), '')
+
+    def test_stages_and_counters(self):
+        p = Profiler()
+        p.enable()
+        for _ in range(3):
+            with p.stage('graph'):
+                pass
+        with p.stage('serialize'):
+            p.count('records', 2)
+        self.assertEqual(p.stages['graph'][0], 3)
+        self.assertEqual(p.counters['records'], 2)
+
+        out = io.StringIO()
+        p.summary(out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0].split(), ['stage', 'calls', 'seconds', 'mean', 'ms'])
+        self.assertEqual(sorted(l.split()[0] for l in lines[1:]), ['graph', 'records', 'serialize'])
+
+    def test_drain_and_merge(self):
+        worker = Profiler()
+        worker.enable()
+        with worker.stage('graph'):
+            worker.count('records')
+
+        parent = Profiler()
+        parent.enable()
+        with parent.stage('graph'):
+            pass
+        parent.merge(worker.drain())
+
+        self.assertEqual(parent.stages['graph'][0], 2)
+        self.assertEqual(parent.counters['records'], 1)
+        self.assertEqual(worker.drain(), ({}, {}))
+
+    def test_collect_returns_result_and_stages(self):
+        result, (stages, counters) = collect(build_record_triples, read_record('7641168').as_marc(), read_record('3451312').as_marc(), 'b2test', [])
+        self.assertIn('ark:61001/b2test', result)
+        self.assertIsInstance(stages, dict)
+
+    def test_pstats_for_each_record(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            p = Profiler()
+            p.enable(tmp)
+            self.assertEqual(os.environ['METADATA_CONVERTERS_PSTATS'], tmp)
+            with p.record('ark:61001/b2test'):
+                sum(range(1000))
+            self.assertEqual(os.listdir(tmp), ['ark_61001_b2test.pstats'])
+            pstats.Stats(os.path.join(tmp, 'ark_61001_b2test.pstats'))
+
+
+if __name__ == '__main__':
+    unittest.main()
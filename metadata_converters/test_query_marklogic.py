@@ -0,0 +1,105 @@
+import io, json, re, requests, threading, unittest, urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from query_marklogic import format_term, iter_bindings, query_collection, write_ntriples
+
+TRIPLES = [
+    {
+        's': {'type': 'uri', 'value': 'https://example.org/{}'.format(i)},
+        'p': {'type': 'uri', 'value': 'http://purl.org/dc/elements/1.1/title'},
+        'o': {'type': 'literal', 'value': 'Map "{}"\nof Chicago'.format(i)}
+    } for i in range(7)
+] + [
+    {
+        's': {'type': 'uri', 'value': 'https://example.org/7'},
+        'p': {'type': 'uri', 'value': 'http://purl.org/dc/terms/modified'},
+        'o': {
+            'type': 'literal',
+            'value': '2020-01-01T00:00:00',
+            'datatype': 'http://www.w3.org/2001/XMLSchema#dateTime'
+        }
+    }
+]
+
+
+class SparqlHandler(BaseHTTPRequestHandler):
+    """A stand-in SPARQL endpoint that serves canned, paged results."""
+
+    def do_GET(self):
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)['query'][0]
+        self.server.queries.append(query)
+        limit = int(re.search(r'limit (\d+)', query).group(1))
+        offset = int(re.search(r'offset (\d+)', query).group(1))
+        body = json.dumps({
+            'head': {'vars': ['s', 'p', 'o']},
+            'results': {'bindings': TRIPLES[offset:offset + limit]}
+        }, indent=1).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/sparql-results+json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestQueryMarkLogic(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), SparqlHandler)
+        cls.server.queries = []
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.url = 'http://127.0.0.1:{}/v1/graphs/sparql'.format(cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_iter_bindings_across_chunk_boundaries(self):
+        """bindings parse the same no matter where the chunks are split."""
+        body = json.dumps({
+            'head': {'vars': ['s', 'p', 'o']},
+            'results': {'bindings': TRIPLES}
+        }).encode('utf-8')
+        for size in (1, 3, 17, len(body)):
+            chunks = [body[i:i + size] for i in range(0, len(body), size)]
+            self.assertEqual(list(iter_bindings(chunks)), TRIPLES)
+
+    def test_iter_bindings_empty(self):
+        self.assertEqual(
+            list(iter_bindings(['{"head": {}, "results": {"bindings": []}}'])),
+            []
+        )
+
+    def test_query_collection_pages(self):
+        self.server.queries.clear()
+        with requests.Session() as session:
+            bindings = list(query_collection(session, self.url, 'https://example.org/g', 3))
+        self.assertEqual(bindings, TRIPLES)
+        self.assertEqual(len(self.server.queries), 3)
+
+    def test_write_ntriples(self):
+        out = io.StringIO()
+        with requests.Session() as session:
+            n = write_ntriples(query_collection(session, self.url, 'https://example.org/g', 4), out)
+        self.assertEqual(n, len(TRIPLES))
+        lines = out.getvalue().splitlines()
+        self.assertEqual(
+            lines[0],
+            '<https://example.org/0> <http://purl.org/dc/elements/1.1/title> "Map \\"0\\"\\nof Chicago" .'
+        )
+        self.assertEqual(
+            lines[-1],
+            '<https://example.org/7> <http://purl.org/dc/terms/modified> "2020-01-01T00:00:00"^^<http://www.w3.org/2001/XMLSchema#dateTime> .'
+        )
+
+    def test_unknown_term_type(self):
+        with self.assertRaises(ValueError) as cm:
+            format_term({'type': 'triple', 'value': 'x'})
+        self.assertEqual(str(cm.exception), 'unknown term type triple')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import random, unittest
+from classes import remove_subsets
+
+
+def list_is_a_subset_of_lists(l, lists_to_check):
+    for lst in lists_to_check:
+        if set(l).issubset(set(lst)):
+            return True
+    return False
+
+def reference_remove_subsets(list_of_lists):
+    """The original pairwise implementation of remove_subsets."""
+    list_of_lists = sorted(list_of_lists, key=lambda l: len(l), reverse=True)
+
+    i = len(list_of_lists) - 1
+    while i >= 0:
+        if len(list_of_lists[i]) == 0:
+            del list_of_lists[i]
+        elif list_is_a_subset_of_lists(list_of_lists[i], list_of_lists[0:i]):
+            del list_of_lists[i]
+        i -= 1
+
+    return list_of_lists
+
+
+class TestRemoveSubsets(unittest.TestCase):
+    def test_spatial_headings(self):
+        """keep the most specific 651 headings."""
+        self.assertEqual(
+            remove_subsets([
+                ['Illinois'],
+                ['Illinois', 'Chicago'],
+                [],
+                ['Illinois', 'Chicago', 'Woodlawn'],
+                ['Indiana']
+            ]),
+            [['Illinois', 'Chicago', 'Woodlawn'], ['Indiana']]
+        )
+
+    def test_matches_reference_implementation(self):
+        """compare against the original implementation on random inputs,
+        including duplicate elements, duplicate lists and empty lists."""
+        rng = random.Random(651)
+        for _ in range(2000):
+            alphabet = ['Chicago', 'Illinois', 'Cook County', 'Woodlawn', 'Hyde Park', 'Indiana'][:rng.randint(1, 6)]
+            list_of_lists = [
+                [rng.choice(alphabet) for _ in range(rng.randint(0, 4))]
+                for _ in range(rng.randint(0, 12))
+            ]
+            expected = reference_remove_subsets([list(l) for l in list_of_lists])
+            self.assertEqual(remove_subsets(list_of_lists), expected, list_of_lists)
+
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import importlib.machinery, importlib.util, io, unittest
+from rdflib import Graph, Literal, URIRef
+
+# report_graph is a script without a .py extension.
+loader = importlib.machinery.SourceFileLoader('report_graph', 'report_graph')
+report_graph = importlib.util.module_from_spec(
+    importlib.util.spec_from_loader('report_graph', loader))
+loader.exec_module(report_graph)
+
+
+class TestReportGraph(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = Graph()
+        cls.graph.parse('test_data/3404181.ttl', format='turtle')
+        cls.lines = cls.graph.serialize(format='nt').splitlines(True)
+
+    def sparql_values(self, predicate):
+        return sorted(
+            str(row[0]) for row in
+            self.graph.query('SELECT ?o WHERE {{ ?s {} ?o . }}'.format(predicate))
+        )
+
+    def report(self, predicates, mode=None, as_csv=False):
+        out = io.StringIO()
+        report_graph.report(self.lines, predicates, out, mode, as_csv)
+        return out.getvalue()
+
+    def test_values_match_sparql(self):
+        for predicate in ('dc:title', 'dc:subject', 'rdf:type', 'dcterms:spatial', 'edm:rights'):
+            self.assertEqual(
+                sorted(self.report([predicate]).splitlines()),
+                self.sparql_values(predicate)
+            )
+
+    def test_predicate_forms(self):
+        for predicate in (
+            'dc:title',
+            'http://purl.org/dc/elements/1.1/title',
+            '<http://purl.org/dc/elements/1.1/title>'
+        ):
+            self.assertEqual(
+                report_graph.expand_predicate(predicate),
+                '<http://purl.org/dc/elements/1.1/title>'
+            )
+
+    def test_escaped_literals(self):
+        g = Graph()
+        value = 'a "quoted"\tvalue\nwith é and \\'
+        g.add((URIRef('https://example.org/a'), URIRef('https://example.org/p'), Literal(value, lang='en')))
+        out = io.StringIO()
+        report_graph.report(g.serialize(format='nt').splitlines(True), ['https://example.org/p'], out)
+        self.assertEqual(out.getvalue(), value + '\n')
+        self.assertEqual(report_graph.ntriples_value('"\\u00e9\\U0001F5FA"'), 'é\U0001F5FA')
+
+    def test_count_and_histogram(self):
+        self.assertEqual(
+            self.report(['rdf:type', 'dc:title', 'dc:nothing'], 'count', True).splitlines(),
+            ['rdf:type,4', 'dc:title,1', 'dc:nothing,0']
+        )
+        histogram = self.report(['rdf:type'], 'histogram').splitlines()
+        self.assertEqual(len(histogram), 4)
+        self.assertTrue(all(line.startswith('1\trdf:type\t') for line in histogram))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+import asyncio, io, os, tempfile, threading, time, unittest
+from unittest import mock
+from PIL import Image
+from pymarc import Field, MARCReader, Subfield
+from rdflib import Graph, URIRef
+from rdflib.namespace import DCTERMS
+from ssmaps_edm import EdmManifest, marc_to_edm_soc_sci_collection, update_record
+
+MASTER_FILE = {'etag': '"1"', 'last_modified': None, 'size': '1000'}
+
+IMAGE_DATA = [{
+    'height': 10,
+    'md5': 'd41d8cd98f00b204e9800998ecf8427e',
+    'mime_type': 'image/tiff',
+    'name': '7641168.tif',
+    'sha512': 'cf83e1357eefb8bdf1542850d66d8007d620e4050b5715dc83f4a921d36ce9ce47d0d13c5d85f2b0ff8318d2877eec2f63b931bd47417a81a538327af927da3e',
+    'size': 1000,
+    'width': 10
+}]
+
+
+def read_record(identifier):
+    with open('../test_data/{}.mrc'.format(identifier), 'rb') as f:
+        return next(iter(MARCReader(f)))
+
+
+class TestIncrementalEdm(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.digital_record = read_record('7641168')
+        self.print_record = read_record('3451312')
+        self.noid = 'b2dq0kf6d36z'
+        self.image_loads = 0
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def load_image_data(self):
+        self.image_loads += 1
+        return IMAGE_DATA
+
+    def update(self, master_file=MASTER_FILE):
+        manifest = EdmManifest(self.tmp.name)
+        rebuilt = update_record(
+            manifest,
+            self.digital_record,
+            self.print_record,
+            self.noid,
+            master_file,
+            self.load_image_data
+        )
+        manifest.save()
+        return rebuilt
+
+    def rem_dates(self):
+        g = Graph()
+        g.parse(os.path.join(self.tmp.name, '{}.ttl'.format(self.noid)), format='turtle')
+        rem = URIRef('https://www.lib.uchicago.edu/ark:61001/{}/rem'.format(self.noid))
+        return str(g.value(rem, DCTERMS.created)), str(g.value(rem, DCTERMS.modified))
+
+    def test_unchanged_records_are_skipped(self):
+        self.assertTrue(self.update())
+        path = os.path.join(self.tmp.name, '{}.ttl'.format(self.noid))
+        mtime = os.stat(path).st_mtime_ns
+        dates = self.rem_dates()
+
+        self.assertFalse(self.update())
+        self.assertEqual(os.stat(path).st_mtime_ns, mtime)
+        self.assertEqual(self.rem_dates(), dates)
+        self.assertEqual(self.image_loads, 1)
+
+    def test_changed_marc_is_rebuilt(self):
+        self.assertTrue(self.update())
+        manifest = EdmManifest(self.tmp.name)
+        manifest.records[self.noid]['created'] = '2020-01-01T00:00:00'
+        manifest.records[self.noid]['modified'] = '2020-01-01T00:00:00'
+        manifest.save()
+
+        self.print_record.add_ordered_field(
+            Field(tag='500', indicators=[' ', ' '], subfields=[Subfield('a', 'A new note.')])
+        )
+        self.assertTrue(self.update())
+        created, modified = self.rem_dates()
+        self.assertEqual(created, '2020-01-01T00:00:00')
+        self.assertGreater(modified, '2020-01-01T00:00:00')
+        # the master file didn't change, so its image data is reused.
+        self.assertEqual(self.image_loads, 1)
+
+    def test_changed_master_file_is_rebuilt(self):
+        self.assertTrue(self.update())
+        self.assertTrue(self.update(dict(MASTER_FILE, etag='"2"')))
+        self.assertEqual(self.image_loads, 2)
+
+    def test_missing_output_is_rebuilt(self):
+        self.assertTrue(self.update())
+        os.remove(os.path.join(self.tmp.name, '{}.ttl'.format(self.noid)))
+        self.assertTrue(self.update())
+
+
+class TestCollection(unittest.TestCase):
+    """marc_to_edm_soc_sci_collection, with Solr and the TIFF server
+    stubbed."""
+
+    def setUp(self):
+        self.records = {
+            'digital': read_record('7641168'),
+            'print': read_record('3451312')
+        }
+        with io.BytesIO() as f:
+            Image.new('L', (10, 10)).save(f, format='TIFF')
+            self.tiff = f.getvalue()
+        self.delays = {}
+        self.lock = threading.Lock()
+        self.fetching = 0
+        self.most_fetching = 0
+
+    def get_catalog_record(self, ssh, url):
+        return self.records['print' if 'oclc_num' in url else 'digital']
+
+    def get_tiff(self, noid):
+        with self.lock:
+            self.fetching += 1
+            self.most_fetching = max(self.most_fetching, self.fetching)
+        try:
+            time.sleep(self.delays.get(noid, 0.05))
+            if noid == 'b2fail00000k':
+                raise ValueError('no master file')
+            return self.tiff
+        finally:
+            with self.lock:
+                self.fetching -= 1
+
+    def convert(self, noids, concurrency):
+        out = io.StringIO()
+        with mock.patch('ssmaps_edm.get_ssh_client'), \
+                mock.patch('ssmaps_edm.get_catalog_record', side_effect=self.get_catalog_record), \
+                mock.patch('ssmaps_edm.get_tiff', side_effect=self.get_tiff), \
+                mock.patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            result = asyncio.run(marc_to_edm_soc_sci_collection(
+                False,
+                [('7641168', noid) for noid in noids],
+                out,
+                concurrency
+            ))
+        return result, out.getvalue(), stderr.getvalue()
+
+    def written(self, out, noids):
+        return sorted(noids, key=lambda noid: out.index('ark:61001/{}'.format(noid)))
+
+    def test_records_are_written_as_they_finish(self):
+        noids = ['b2test000{}0k'.format(n) for n in range(4)]
+        # later records finish first.
+        self.delays = {noid: 0.4 - 0.1 * n for n, noid in enumerate(noids)}
+        result, out, _ = self.convert(noids, 4)
+        self.assertEqual(result, (4, 0))
+        self.assertEqual(self.written(out, noids), noids[::-1])
+        self.assertEqual(self.most_fetching, 4)
+
+    def test_concurrency(self):
+        noids = ['b2test000{}0k'.format(n) for n in range(6)]
+        result, out, _ = self.convert(noids, 2)
+        self.assertEqual(result, (6, 0))
+        self.assertEqual(self.most_fetching, 2)
+
+    def test_failed_record_does_not_stop_the_rest(self):
+        noids = ['b2test00000k', 'b2fail00000k', 'b2test00010k']
+        result, out, stderr = self.convert(noids, 2)
+        self.assertEqual(result, (2, 1))
+        self.assertIn('ark:61001/b2test00000k', out)
+        self.assertIn('ark:61001/b2test00010k', out)
+        self.assertNotIn('b2fail00000k', out)
+        self.assertIn('could not convert 7641168: ValueError: no master file', stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
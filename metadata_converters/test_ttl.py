@@ -6,11 +6,10 @@ from rdflib import Graph, Literal, URIRef
 
 
 class TestTTL(unittest.TestCase):
-    def __init__(self, *args, **kwargs):
-        self.g_3404181 = Graph()
-        self.g_3404181.parse('test_data/3404181.ttl', format='ttl')
-
-        super(TestTTL, self).__init__(*args, **kwargs)
+    @classmethod
+    def setUpClass(cls):
+        cls.g_3404181 = Graph()
+        cls.g_3404181.parse('test_data/3404181.ttl', format='ttl')
 
     def test_maps_chisoc_cho(self):
         # dc:description, dc:title, or both are manditory.
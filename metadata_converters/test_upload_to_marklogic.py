@@ -0,0 +1,195 @@
+import os, tempfile, threading, unittest, urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from upload_to_marklogic import SKOLEM_BASE, Checkpoint, GraphStoreUploader, checkpoint_settings, chunk_statements, read_statements, upload
+
+TRIPLES = [
+    '<https://example.org/{0}> <http://purl.org/dc/elements/1.1/title> "Map {0}" .\n'.format(i)
+    for i in range(200)
+]
+
+
+class GraphStoreHandler(BaseHTTPRequestHandler):
+    """A stand-in graph store that fails the first few requests it gets."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        with self.server.lock:
+            self.server.connections.add(self.client_address)
+            if self.server.failures > 0:
+                self.server.failures -= 1
+                status = 503
+            else:
+                self.server.requests.append((
+                    urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query, keep_blank_values=True),
+                    self.headers['Content-Type'],
+                    body
+                ))
+                status = 204
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestUploadToMarkLogic(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), GraphStoreHandler)
+        cls.server.lock = threading.Lock()
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.url = 'http://127.0.0.1:{}/v1/graphs'.format(cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.requests = []
+        self.server.connections = set()
+        self.server.failures = 0
+        self.tmp = tempfile.TemporaryDirectory()
+        self.nt = os.path.join(self.tmp.name, 'collection.nt')
+        with open(self.nt, 'w') as f:
+            f.write(''.join(TRIPLES))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def uploaded(self):
+        return sorted(
+            line.decode('utf-8') + '\n'
+            for _, _, body in self.server.requests
+            for line in body.splitlines()
+        )
+
+    def test_blank_nodes_are_skolemized(self):
+        nt = os.path.join(self.tmp.name, 'fixity.nt')
+        with open(nt, 'w') as f:
+            for i in range(50):
+                f.write('<https://example.org/{0}> <http://www.loc.gov/premis/rdf/v3/fixity> _:f{0} .\n'.format(i))
+                f.write('_:f{0} <http://www.w3.org/1999/02/22-rdf-syntax-ns#value> "_:not.a.node {0}" .\n'.format(i))
+        ttl = os.path.join(self.tmp.name, 'fixity.ttl')
+        with open(ttl, 'w') as f:
+            f.write('<https://example.org/1> <http://www.loc.gov/premis/rdf/v3/fixity> [ <http://www.w3.org/1999/02/22-rdf-syntax-ns#value> "abc" ] .\n')
+
+        # small chunks split each file's blank node statements across
+        # requests, but they still share one IRI.
+        chunks = list(chunk_statements(read_statements([nt, ttl]), 500))
+        self.assertGreater(len(chunks), 2)
+        body = b''.join(body for _, _, body in chunks).decode('utf-8')
+        self.assertNotIn(' _:', body)
+        self.assertNotIn('\n_:', '\n' + body)
+        self.assertEqual(body.count('"_:not.a.node 7"'), 1)
+        lines = body.splitlines()
+        subject = lines[1].split(' ')[0]
+        self.assertTrue(subject.startswith('<' + SKOLEM_BASE))
+        self.assertEqual(lines[0].split(' ')[2], subject)
+
+        # sending the same files again sends the same IRIs, so a retry or
+        # a resumed upload doesn't add copies.
+        self.assertEqual(
+            [c for c in chunk_statements(read_statements([nt, ttl]), 500)],
+            chunks
+        )
+
+    def test_chunk_statements(self):
+        chunks = list(chunk_statements(read_statements([self.nt]), 1000))
+        self.assertEqual([n for n, _, _ in chunks], list(range(len(chunks))))
+        self.assertTrue(all(len(body) <= 1000 for _, _, body in chunks))
+        self.assertEqual(
+            b''.join(body for _, _, body in chunks).decode('utf-8'),
+            ''.join(TRIPLES)
+        )
+
+    def test_upload(self):
+        uploader = GraphStoreUploader(self.url, 'https://example.org/g', backoff=0)
+        stats = upload([self.nt], uploader, chunk_size=2000, workers=2)
+        self.assertEqual(stats['statements'], len(TRIPLES))
+        self.assertEqual(stats['chunks'], len(self.server.requests))
+        self.assertLess(len(self.server.requests), 20)
+        self.assertEqual(self.uploaded(), sorted(TRIPLES))
+        for params, content_type, _ in self.server.requests:
+            self.assertEqual(params, {'graph': ['https://example.org/g']})
+            self.assertEqual(content_type, 'application/n-triples')
+        # connections are kept alive between chunks.
+        self.assertLessEqual(len(self.server.connections), 2)
+
+    def test_retry(self):
+        self.server.failures = 3
+        uploader = GraphStoreUploader(self.url, backoff=0)
+        upload([self.nt], uploader, chunk_size=2000, workers=2)
+        self.assertEqual(self.uploaded(), sorted(TRIPLES))
+
+    def test_retries_exhausted(self):
+        self.server.failures = 100
+        uploader = GraphStoreUploader(self.url, retries=2, backoff=0)
+        with self.assertRaises(Exception):
+            upload([self.nt], uploader, chunk_size=2000, workers=1)
+
+    def test_resume_from_checkpoint(self):
+        path = os.path.join(self.tmp.name, 'checkpoint')
+        settings = checkpoint_settings([self.nt], 2000)
+        checkpoint = Checkpoint(path, settings)
+        for n in (0, 1, 2):
+            checkpoint.mark(n)
+        checkpoint.close()
+
+        checkpoint = Checkpoint(path, settings)
+        stats = upload([self.nt], GraphStoreUploader(self.url, backoff=0), 2000, 2, checkpoint)
+        checkpoint.close()
+        self.assertEqual(stats['skipped'], 3)
+
+        chunks = list(chunk_statements(read_statements([self.nt]), 2000))
+        self.assertEqual(
+            self.uploaded(),
+            sorted(
+                line.decode('utf-8') + '\n'
+                for _, _, body in chunks[3:]
+                for line in body.splitlines()
+            )
+        )
+
+        # a second restart has nothing left to send.
+        self.server.requests = []
+        checkpoint = Checkpoint(path, settings)
+        stats = upload([self.nt], GraphStoreUploader(self.url, backoff=0), 2000, 2, checkpoint)
+        checkpoint.close()
+        self.assertEqual(stats['chunks'], 0)
+        self.assertEqual(self.server.requests, [])
+
+        with self.assertRaises(ValueError):
+            Checkpoint(path, checkpoint_settings([self.nt], 4000))
+
+    def test_changed_input_is_refused(self):
+        path = os.path.join(self.tmp.name, 'checkpoint')
+        checkpoint = Checkpoint(path, checkpoint_settings([self.nt], 2000))
+        checkpoint.mark(0)
+        checkpoint.close()
+
+        # the same size, but different triples.
+        with open(self.nt, 'rb') as f:
+            data = f.read()
+        st = os.stat(self.nt)
+        with open(self.nt, 'wb') as f:
+            f.write(data.replace(b'<https://example.org/0>', b'<https://example.org/X>'))
+        os.utime(self.nt, ns=(st.st_atime_ns, st.st_mtime_ns + 1000000000))
+        self.assertEqual(os.stat(self.nt).st_size, st.st_size)
+
+        with self.assertRaises(ValueError):
+            Checkpoint(path, checkpoint_settings([self.nt], 2000))
+
+    def test_turtle(self):
+        uploader = GraphStoreUploader(self.url, backoff=0)
+        stats = upload(['test_data/3404181.ttl'], uploader)
+        self.assertEqual(stats['chunks'], 1)
+        self.assertEqual(self.server.requests[0][0], {'default': ['']})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+from pymarc import MARCReader
+from rdflib import Graph, URIRef
+from ssmaps_edm import build_record_triples
+from validate_edm import SCHEMA, focus_nodes_by_shape, load_schema, split_by_aggregation, validate
+
+PAIRS = (('7641168', '3451312'), ('5999566', '7368094'), ('11435665', '7368097'))
+
+
+def read_record(identifier):
+    with open('../test_data/{}.mrc'.format(identifier), 'rb') as f:
+        return next(iter(MARCReader(f)))
+
+
+class TestValidateEdm(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = Graph()
+        for n, (digital, print_) in enumerate(PAIRS):
+            cls.graph.parse(
+                data=build_record_triples(
+                    read_record(digital).as_marc(),
+                    read_record(print_).as_marc(),
+                    'b2test{}'.format(n),
+                    []
+                ),
+                format='turtle'
+            )
+
+    def test_schema_is_compiled_once(self):
+        self.assertIs(load_schema(SCHEMA), load_schema(SCHEMA))
+
+    def test_focus_nodes_by_shape(self):
+        _, shapes = load_schema(SCHEMA)
+        groups = focus_nodes_by_shape(self.graph, shapes)
+        self.assertEqual(
+            sorted(groups),
+            [
+                'https://www.lib.uchicago.edu/ProvidedCHO',
+                'https://www.lib.uchicago.edu/Proxy',
+                'https://www.lib.uchicago.edu/ResourceMap',
+                'https://www.lib.uchicago.edu/aggregation'
+            ]
+        )
+        self.assertTrue(all(len(nodes) == len(PAIRS) for nodes in groups.values()))
+
+    def test_split_by_aggregation(self):
+        pieces = list(split_by_aggregation(self.graph, 1))
+        self.assertEqual(len(pieces), len(PAIRS))
+        focus = [n for _, nodes in pieces for n in nodes]
+        self.assertEqual(len(focus), len(set(focus)))
+        self.assertEqual(len(focus), 4 * len(PAIRS))
+
+    def test_report(self):
+        report = validate(self.graph)
+        self.assertEqual(len(report), 4 * len(PAIRS))
+        for result in report:
+            self.assertEqual(sorted(result), ['focus', 'reason', 'shape', 'valid'])
+            self.assertEqual(result['valid'], result['reason'] == '')
+
+    def test_process_pool_matches_single_process(self):
+        self.assertEqual(
+            validate(self.graph, workers=2, batch=1),
+            validate(self.graph)
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import importlib.machinery, importlib.util, io, unittest
+import xml.etree.ElementTree as ElementTree
+from rdflib import Graph
+
+# visualize_graph is a script without a .py extension.
+loader = importlib.machinery.SourceFileLoader('visualize_graph', 'visualize_graph')
+visualize_graph = importlib.util.module_from_spec(
+    importlib.util.spec_from_loader('visualize_graph', loader))
+loader.exec_module(visualize_graph)
+
+
+class TestVisualizeGraph(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = Graph()
+        cls.graph.parse('test_data/3404181.ttl', format='turtle')
+
+    def test_all(self):
+        nodes, edges = visualize_graph.scan_graph(self.graph)
+        labels = [str(n) for n in nodes]
+        self.assertEqual(labels, [
+            'ark:61001/b2nw3wm8552h',
+            'ark:61001/b2nw3wm8552h/aggregation',
+            'ark:61001/b2nw3wm8552h/file.xml',
+            'ark:61001/b2nw3wm8552h/rem'
+        ])
+        self.assertEqual(
+            set((labels[i].split('/')[-1], labels[j].split('/')[-1]) for i, j in edges),
+            set([
+                ('aggregation', 'b2nw3wm8552h'),
+                ('aggregation', 'rem'),
+                ('file.xml', 'b2nw3wm8552h'),
+                ('file.xml', 'aggregation'),
+                ('rem', 'aggregation')
+            ])
+        )
+
+    def test_cho(self):
+        nodes, edges = visualize_graph.scan_graph(self.graph, True)
+        self.assertEqual(len(nodes), 3)
+        self.assertEqual(edges, [(0, 1), (0, 2)])
+
+    def test_outputs_agree(self):
+        nodes, edges = visualize_graph.scan_graph(self.graph)
+        labels = [str(n) for n in nodes]
+
+        out = io.StringIO()
+        visualize_graph.write_gexf(out, labels, edges, True)
+        gexf = ElementTree.fromstring(out.getvalue())
+        ns = {'g': 'http://gexf.net/1.3'}
+        self.assertEqual(len(gexf.findall('.//g:node', ns)), len(labels))
+        self.assertEqual(
+            [(int(e.get('source')), int(e.get('target'))) for e in gexf.findall('.//g:edge', ns)],
+            edges
+        )
+
+        out = io.StringIO()
+        visualize_graph.write_gephi_matrix(out, labels, edges, True)
+        rows = [line.split(',') for line in out.getvalue().splitlines()[1:]]
+        self.assertEqual(
+            sorted((i, j) for j, row in enumerate(rows) for i, cell in enumerate(row[1:]) if cell == '1'),
+            edges
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
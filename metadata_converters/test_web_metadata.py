@@ -0,0 +1,44 @@
+import unittest
+from classes import MarcXmlToOpenGraph, MarcXmlToSchemaDotOrg, MarcXmlToTwitterCard, MarcXmlToWebMetadata, RecordCache, marcxml_to_web_metadata
+
+
+class TestMarcXmlToWebMetadata(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        with open('../test_data/sample_record_03.xml', 'r', encoding='utf-8') as f:
+            self.marcxml = f.read()
+
+    def test_matches_individual_converters(self):
+        """one parse produces the same output as the three converters."""
+        web_metadata = MarcXmlToWebMetadata(self.marcxml)()
+        self.assertEqual(web_metadata['schema_org'], str(MarcXmlToSchemaDotOrg(self.marcxml)))
+        self.assertEqual(web_metadata['opengraph'], str(MarcXmlToOpenGraph(self.marcxml)))
+        self.assertEqual(web_metadata['twitter_card'], str(MarcXmlToTwitterCard(self.marcxml)))
+
+    def test_opengraph(self):
+        self.assertIn(
+            '<meta property="og:title" content="Functional pattern of the railways in Metropolitan Chicago /" >',
+            str(MarcXmlToOpenGraph(self.marcxml))
+        )
+
+    def test_cache_key(self):
+        """records are cached by 001 and 005."""
+        self.assertEqual(
+            RecordCache().key(self.marcxml),
+            ('1582888', '20180216105341.0')
+        )
+
+    def test_cache(self):
+        """a record with the same 001 and 005 comes from the cache, a new
+        005 is converted again."""
+        cache = RecordCache(maxsize=1)
+        result = marcxml_to_web_metadata(self.marcxml, cache)
+        self.assertIs(marcxml_to_web_metadata(self.marcxml, cache), result)
+
+        changed = self.marcxml.replace('20180216105341.0', '20200101000000.0')
+        self.assertIsNot(marcxml_to_web_metadata(changed, cache), result)
+        self.assertEqual(len(cache.results), 1)
+
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,423 @@
+#!/usr/bin/env python
+"""Usage:
+    upload_to_marklogic [--graph=<uri>] [--url=<url>] [--chunk-size=<bytes>] [--workers=<n>] [--retries=<n>] [--checkpoint=<file>] <path>...
+
+Options:
+    --graph=<uri>         Named graph for N-Triples and Turtle. Statements
+                          go to the default graph if this isn't set. N-Quads
+                          carry their own graph.
+    --url=<url>           Graph store endpoint. Defaults to
+                          $MARKLOGIC_GRAPHS_URL, or the library's MarkLogic
+                          server.
+    --chunk-size=<bytes>  Largest request body to send. [default: 8388608]
+    --workers=<n>         Number of concurrent uploads. [default: 4]
+    --retries=<n>         Number of times to retry a failed request.
+                          [default: 5]
+    --checkpoint=<file>   Record finished chunks in this file, and skip them
+                          if the upload is restarted.
+
+Paths can be .nt, .nq or .ttl files, directories of them, or - for
+N-Triples on stdin. Statements are merged into the graph, so resending a
+chunk is harmless.
+
+Each request would get its own blank node scope, so blank nodes are
+replaced with IRIs under SKOLEM_BASE before they're sent, so that a file's
+statements stay connected however they're split into chunks. The IRIs are
+made from a digest of the file and the blank node's label, with Turtle's
+blank nodes labelled canonically first, so uploading a file again sends
+the same IRIs instead of adding copies. That isn't possible for stdin,
+which gets new IRIs each run, so an upload from stdin shouldn't be resumed
+if it has blank nodes.
+"""
+
+import concurrent.futures, hashlib, json, os, random, re, requests, sys, threading, time, uuid
+from docopt import docopt
+from requests.auth import HTTPBasicAuth
+
+GRAPHS_URL = 'http://marklogic.lib.uchicago.edu:8008/v1/graphs'
+
+CONTENT_TYPES = {
+    '.nq': 'application/n-quads',
+    '.nt': 'application/n-triples',
+    '.ttl': 'application/n-triples'
+}
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+SPARQL_UPDATE = 'application/sparql-update'
+
+SKOLEM_BASE = 'https://www.lib.uchicago.edu/.well-known/genid/'
+
+# literals and IRIs are matched so that they're skipped; group 1 is the
+# label of a blank node.
+NT_TOKEN = re.compile(
+    rb'"(?:[^"\\]|\\.)*"|<[^>]*>|_:([A-Za-z0-9_](?:[A-Za-z0-9_.\-]*[A-Za-z0-9_\-])?)'
+)
+
+def list_files(paths):
+    """Expand directories into the RDF files they contain.
+
+    Args:
+        paths (list): files, directories or '-'.
+
+    Returns:
+        list: paths, sorted within each directory so that chunks are the
+        same from one run to the next.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, filenames in os.walk(path):
+                dirs.sort()
+                for f in sorted(filenames):
+                    if os.path.splitext(f)[1] in CONTENT_TYPES:
+                        files.append(os.path.join(root, f))
+        else:
+            files.append(path)
+    return files
+
+def file_scope(path):
+    """Part of the skolem IRIs for a file's blank nodes, from a digest of
+    its contents."""
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1048576), b''):
+            h.update(block)
+    return h.hexdigest()[:16]
+
+class Skolemizer:
+    """Replace the blank nodes in N-Triples or N-Quads lines with IRIs.
+
+    The scope, e.g. a digest of the file, is only worked out when the first
+    blank node turns up, so files without blank nodes aren't read twice.
+    """
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.prefix = None
+
+    def iri(self, match):
+        if match.group(1) is None:
+            return match.group(0)
+        if self.prefix is None:
+            self.prefix = '<{}{}/'.format(SKOLEM_BASE, self.scope()).encode('utf-8')
+        return self.prefix + match.group(1) + b'>'
+
+    def __call__(self, line):
+        if b'_:' not in line:
+            return line
+        return NT_TOKEN.sub(self.iri, line)
+
+def read_statements(paths):
+    """Read N-Triples, N-Quads or Turtle one statement at a time, with
+    blank nodes replaced by skolem IRIs.
+
+    Turtle is reparsed with rdflib and written out as sorted N-Triples.
+
+    Args:
+        paths (list): files, or '-' for N-Triples on stdin.
+
+    Returns:
+        a generator of (content type, statement as bytes) tuples.
+    """
+    for path in paths:
+        if path == '-':
+            run = uuid.uuid4().hex[:16]
+            skolemize = Skolemizer(lambda: run)
+            for line in sys.stdin.buffer:
+                if line.strip() and not line.lstrip().startswith(b'#'):
+                    yield CONTENT_TYPES['.nt'], skolemize(line)
+            continue
+        skolemize = Skolemizer(lambda path=path: file_scope(path))
+        ext = os.path.splitext(path)[1]
+        if ext == '.ttl':
+            import rdflib
+            from rdflib.compare import to_canonical_graph
+            g = rdflib.Graph()
+            g.parse(path, format='turtle')
+            if any(isinstance(t, rdflib.BNode) for triple in g for t in triple):
+                # rdflib gives blank nodes new labels each time it parses.
+                g = to_canonical_graph(g)
+            for line in sorted(g.serialize(format='nt').splitlines()):
+                if line.strip():
+                    yield CONTENT_TYPES[ext], skolemize(line.encode('utf-8') + b'\n')
+        else:
+            content_type = CONTENT_TYPES.get(ext, CONTENT_TYPES['.nt'])
+            with open(path, 'rb') as f:
+                for line in f:
+                    if line.strip() and not line.lstrip().startswith(b'#'):
+                        if not line.endswith(b'\n'):
+                            line += b'\n'
+                        yield content_type, skolemize(line)
+
+def chunk_statements(statements, chunk_size):
+    """Group statements into request bodies of at most chunk_size bytes.
+
+    A chunk only holds one content type, and a single statement larger than
+    chunk_size gets a chunk of its own.
+
+    Args:
+        statements (iterable): (content type, bytes) tuples.
+        chunk_size (int): largest body, in bytes.
+
+    Returns:
+        a generator of (chunk number, content type, body) tuples.
+    """
+    n = 0
+    current_type = None
+    lines = []
+    size = 0
+    for content_type, line in statements:
+        if lines and (content_type != current_type or size + len(line) > chunk_size):
+            yield n, current_type, b''.join(lines)
+            n += 1
+            lines = []
+            size = 0
+        current_type = content_type
+        lines.append(line)
+        size += len(line)
+    if lines:
+        yield n, current_type, b''.join(lines)
+
+def checkpoint_settings(paths, chunk_size, graph=None):
+    """The settings an upload's chunks depend on, for a Checkpoint.
+
+    Each file's size and modification time are included, so a checkpoint
+    isn't used to resume after an input file has changed.
+
+    Args:
+        paths (list): files, or '-' for stdin.
+        chunk_size (int)
+        graph (str)
+
+    Returns:
+        dict
+    """
+    files = []
+    for path in paths:
+        if path == '-':
+            files.append({'path': path})
+        else:
+            st = os.stat(path)
+            files.append({'mtime_ns': st.st_mtime_ns, 'path': path, 'size': st.st_size})
+    return {'chunk_size': chunk_size, 'files': files, 'graph': graph}
+
+class Checkpoint:
+    """A log of finished chunks, so that an interrupted upload can resume.
+
+    The first line of the file records the settings the chunks depend on,
+    from checkpoint_settings. A checkpoint written with different settings,
+    or for input files that have changed since, is refused, because its
+    chunk numbers would refer to different statements.
+    """
+
+    def __init__(self, path, settings):
+        self.path = path
+        self.done = set()
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                header = json.loads(f.readline() or 'null')
+                if header != settings:
+                    raise ValueError(
+                        '{} was written for a different upload.'.format(path)
+                    )
+                for line in f:
+                    try:
+                        self.done.add(json.loads(line)['chunk'])
+                    except ValueError:
+                        # a line cut off when the last run was interrupted.
+                        pass
+            self.f = open(path, 'a')
+        else:
+            self.f = open(path, 'w')
+            self.f.write(json.dumps(settings) + '\n')
+            self.f.flush()
+
+    def __contains__(self, n):
+        return n in self.done
+
+    def mark(self, n):
+        with self.lock:
+            self.done.add(n)
+            self.f.write(json.dumps({'chunk': n}) + '\n')
+            self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+class GraphStoreUploader:
+    """Post chunks to a graph store endpoint, with retries.
+
+    Each thread keeps its own requests.Session, so connections are reused
+    across the chunks it sends.
+    """
+
+    def __init__(self, url, graph=None, auth=None, retries=5, backoff=0.5):
+        self.url = url
+        self.graph = graph
+        self.auth = auth
+        self.retries = retries
+        self.backoff = backoff
+        self.local = threading.local()
+
+    @property
+    def session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+            self.local.session.auth = self.auth
+        return self.local.session
+
+    def params(self, content_type):
+        if content_type in (CONTENT_TYPES['.nq'], SPARQL_UPDATE):
+            return {}
+        elif self.graph:
+            return {'graph': self.graph}
+        else:
+            return {'default': ''}
+
+    def post(self, content_type, body):
+        """Merge one chunk into the graph store.
+
+        Connection errors and 429 or 5xx responses are retried with
+        exponential backoff. Other errors are raised immediately.
+
+        Args:
+            content_type (str): application/n-triples, application/n-quads,
+            or application/sparql-update to post to a SPARQL endpoint.
+            body (bytes): statements, or an update.
+
+        Returns:
+            requests.Response
+        """
+        attempt = 0
+        while True:
+            try:
+                r = self.session.post(
+                    self.url,
+                    data=body,
+                    headers={'Content-Type': content_type},
+                    params=self.params(content_type)
+                )
+                if r.status_code not in RETRY_STATUS_CODES:
+                    r.raise_for_status()
+                    return r
+                error = requests.HTTPError(
+                    '{} {}'.format(r.status_code, r.reason), response=r
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            if attempt >= self.retries:
+                raise error
+            time.sleep(self.backoff * 2 ** attempt * (1 + random.random()))
+            attempt += 1
+
+def upload(paths, uploader, chunk_size=8388608, workers=4, checkpoint=None):
+    """Upload RDF files to a graph store in size-bounded chunks.
+
+    At most twice as many chunks as workers are held in memory at once. If
+    a chunk fails, no new chunks are started, the ones in flight finish, and
+    the error is raised.
+
+    Args:
+        paths (list): .nt, .nq or .ttl files, or '-'.
+        uploader (GraphStoreUploader)
+        chunk_size (int): largest request body, in bytes.
+        workers (int): number of concurrent uploads.
+        checkpoint (Checkpoint): chunks to skip, and where to record
+        finished ones.
+
+    Returns:
+        dict: counts of chunks and statements sent and skipped.
+    """
+    stats = {'chunks': 0, 'skipped': 0, 'statements': 0, 'bytes': 0}
+
+    def send(n, content_type, body):
+        uploader.post(content_type, body)
+        if checkpoint is not None:
+            checkpoint.mark(n)
+        return body.count(b'\n'), len(body)
+
+    pending = set()
+    error = None
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        def collect(return_when):
+            nonlocal pending, error
+            finished, pending = concurrent.futures.wait(
+                pending, return_when=return_when
+            )
+            for future in finished:
+                try:
+                    statements, size = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                stats['chunks'] += 1
+                stats['statements'] += statements
+                stats['bytes'] += size
+
+        for n, content_type, body in chunk_statements(read_statements(paths), chunk_size):
+            if checkpoint is not None and n in checkpoint:
+                stats['skipped'] += 1
+                continue
+            pending.add(executor.submit(send, n, content_type, body))
+            if len(pending) >= workers * 2:
+                collect(concurrent.futures.FIRST_COMPLETED)
+            if error:
+                break
+        collect(concurrent.futures.ALL_COMPLETED)
+
+    if error:
+        raise error
+    return stats
+
+def main():
+    options = docopt(__doc__)
+
+    auth = None
+    if 'MARKLOGIC_LDR_USER' in os.environ:
+        auth = HTTPBasicAuth(
+            os.environ['MARKLOGIC_LDR_USER'],
+            os.environ['MARKLOGIC_LDR_PASSWORD']
+        )
+
+    uploader = GraphStoreUploader(
+        options['--url'] or os.environ.get('MARKLOGIC_GRAPHS_URL', GRAPHS_URL),
+        options['--graph'],
+        auth,
+        int(options['--retries'])
+    )
+
+    paths = list_files(options['<path>'])
+    chunk_size = int(options['--chunk-size'])
+
+    checkpoint = None
+    if options['--checkpoint']:
+        checkpoint = Checkpoint(
+            options['--checkpoint'],
+            checkpoint_settings(paths, chunk_size, options['--graph'])
+        )
+
+    try:
+        stats = upload(
+            paths,
+            uploader,
+            chunk_size,
+            int(options['--workers']),
+            checkpoint
+        )
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+
+    sys.stderr.write(
+        'sent {} statements ({} bytes) in {} requests, skipped {} finished chunks.\n'.format(
+            stats['statements'],
+            stats['bytes'],
+            stats['chunks'],
+            stats['skipped']
+        )
+    )
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+"""Usage:
+    validate_edm [--schema=<shex>] [--format=<fmt>] [--workers=<n>] [--batch=<n>] [--no-precheck] <path>...
+    validate_edm --precheck-only [--format=<fmt>] <path>...
+
+Validate EDM against a ShEx schema, and write a JSON lines report with one
+result for each focus node and shape.
+
+Before ShEx, the structural rules in edm_rules.py are checked in a single
+pass over the input as N-Triples. If any of them fail, the violations are
+reported and ShEx isn't run.
+
+Options:
+    --schema=<shex>  ShEx schema. Defaults to
+                     shex/uchicago_library_ssmaps.shex.
+    --format=<fmt>   rdflib format of the input. [default: turtle]
+    --workers=<n>    Number of worker processes. With more than one, the
+                     graph is split by aggregation and the pieces are
+                     validated in parallel. [default: 1]
+    --batch=<n>      Number of aggregations sent to a worker at a time.
+                     [default: 100]
+    --no-precheck    Go straight to ShEx.
+    --precheck-only  Only check the structural rules. N-Triples input is
+                     streamed without building a graph.
+
+Focus nodes are found by rdf:type, and each type is validated against the
+shape with the same local name, e.g. ore:ResourceMap against
+<https://www.lib.uchicago.edu/ResourceMap>. The exit status is 1 if any
+node fails.
+"""
+
+import collections, functools, json, os, sys
+from concurrent.futures import ProcessPoolExecutor
+from docopt import docopt
+from pyshex.shex_evaluator import ShExEvaluator
+from pyshex.utils.schema_loader import SchemaLoader
+from rdflib import BNode, Graph, URIRef
+from rdflib.namespace import RDF
+
+try:
+    from .edm import EDM, ORE
+    from .edm_rules import check_ntriples
+except ImportError:
+    from edm import EDM, ORE
+    from edm_rules import check_ntriples
+
+SCHEMA = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    'shex',
+    'uchicago_library_ssmaps.shex'
+)
+
+# links from an aggregation to the rest of its record, and from the rest of
+# the record back to it.
+AGGREGATION_LINKS = (
+    EDM.aggregatedCHO, EDM.hasView, EDM.isShownAt, EDM.isShownBy,
+    EDM.object, ORE.isDescribedBy
+)
+AGGREGATION_BACKLINKS = (ORE.describes, ORE.proxyIn)
+
+@functools.lru_cache(maxsize=None)
+def load_schema(path):
+    """Parse a ShEx schema once per process.
+
+    Returns:
+        tuple: the compiled ShExJ.Schema, and a dict of shape IRIs keyed by
+        their lowercased local names.
+    """
+    with open(path) as f:
+        schema = SchemaLoader().loads(f.read())
+    if schema is None:
+        raise ValueError('unable to parse {}.'.format(path))
+    shapes = {}
+    for shape in schema.shapes or ():
+        shapes[local_name(str(shape.id)).lower()] = str(shape.id)
+    return schema, shapes
+
+def local_name(iri):
+    return iri.rstrip('/#').replace('#', '/').split('/')[-1]
+
+def focus_nodes_by_shape(g, shapes, focus=None):
+    """Group focus nodes by the shape their rdf:type maps to.
+
+    Args:
+        g (Graph)
+        shapes (dict): from load_schema().
+        focus (set): only include these nodes, if given.
+
+    Returns:
+        dict: lists of nodes, keyed by shape IRI.
+    """
+    groups = collections.defaultdict(set)
+    for s, _, o in g.triples((None, RDF.type, None)):
+        if focus is not None and s not in focus:
+            continue
+        shape = shapes.get(local_name(str(o)).lower())
+        if shape is not None:
+            groups[shape].add(s)
+    return {shape: sorted(nodes) for shape, nodes in groups.items()}
+
+def validate_graph(g, schema_path=SCHEMA, focus=None):
+    """Validate every focus node in a graph, one evaluation per shape.
+
+    Args:
+        g (Graph)
+        schema_path (str)
+        focus (set): only validate these nodes, if given.
+
+    Returns:
+        list: a dict for each focus node and shape, with 'focus', 'shape',
+        'valid' and 'reason'.
+    """
+    schema, shapes = load_schema(schema_path)
+    report = []
+    for shape, nodes in sorted(focus_nodes_by_shape(g, shapes, focus).items()):
+        evaluator = ShExEvaluator(rdf=g, schema=schema, focus=nodes, start=shape)
+        for result in evaluator.evaluate():
+            report.append({
+                'focus': str(result.focus),
+                'reason': (result.reason or '').strip(),
+                'shape': str(result.start),
+                'valid': bool(result.result)
+            })
+    return report
+
+def closure(g, seeds):
+    """Triples about a set of nodes, following links into blank nodes."""
+    seen = set()
+    queue = list(seeds)
+    while queue:
+        node = queue.pop()
+        if node in seen:
+            continue
+        seen.add(node)
+        for s, p, o in g.triples((node, None, None)):
+            yield s, p, o
+            if isinstance(o, BNode):
+                queue.append(o)
+
+def split_by_aggregation(g, batch=100):
+    """Split a graph into pieces that can be validated on their own.
+
+    Each aggregation's record is the aggregation, the nodes it links to,
+    and the proxies and resource maps that link back to it. Each piece
+    holds the records of up to batch aggregations. Nodes that aren't part
+    of any record are validated in a last piece of their own, against the
+    whole graph.
+
+    Returns:
+        a generator of (N-Triples, focus nodes) tuples.
+    """
+    assigned = set()
+    records = []
+    for agg in sorted(g.subjects(RDF.type, ORE.Aggregation)):
+        nodes = set([agg])
+        for p in AGGREGATION_LINKS:
+            nodes.update(o for o in g.objects(agg, p) if isinstance(o, URIRef))
+        for p in AGGREGATION_BACKLINKS:
+            nodes.update(g.subjects(p, agg))
+        records.append(nodes)
+
+    for i in range(0, len(records), batch):
+        piece = Graph()
+        focus = set()
+        for nodes in records[i:i + batch]:
+            for triple in closure(g, nodes):
+                piece.add(triple)
+            focus.update(n for n in nodes - assigned if (n, RDF.type, None) in g)
+            assigned.update(nodes)
+        yield piece.serialize(format='nt'), sorted(str(n) for n in focus)
+
+    rest = set(g.subjects(RDF.type, None)) - assigned
+    if rest:
+        yield g.serialize(format='nt'), sorted(str(n) for n in rest)
+
+def validate_piece(job):
+    ntriples, focus, schema_path = job
+    g = Graph()
+    g.parse(data=ntriples, format='nt')
+    return validate_graph(g, schema_path, set(URIRef(n) for n in focus))
+
+def validate(g, schema_path=SCHEMA, workers=1, batch=100):
+    """Validate a graph, in parallel if workers > 1.
+
+    Returns:
+        list: results, sorted by focus node and shape.
+    """
+    if workers > 1:
+        report = []
+        jobs = (
+            (ntriples, focus, schema_path)
+            for ntriples, focus in split_by_aggregation(g, batch)
+        )
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for results in executor.map(validate_piece, jobs):
+                report.extend(results)
+    else:
+        report = validate_graph(g, schema_path)
+    return sorted(report, key=lambda r: (r['focus'], r['shape']))
+
+def read_ntriples(paths):
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                yield line
+
+def main():
+    options = docopt(__doc__)
+
+    g = None
+    if options['--format'] in ('nt', 'ntriples'):
+        lines = read_ntriples(options['<path>'])
+    else:
+        g = Graph()
+        for path in options['<path>']:
+            g.parse(path, format=options['--format'])
+        lines = g.serialize(format='nt').splitlines()
+
+    if not options['--no-precheck']:
+        violations = check_ntriples(lines)
+        for violation in violations:
+            sys.stdout.write(json.dumps(violation, sort_keys=True) + '\n')
+        errors = sum(1 for v in violations if v['severity'] == 'error')
+        sys.stderr.write('structural check: {} errors, {} warnings.\n'.format(
+            errors, len(violations) - errors))
+        if errors or options['--precheck-only']:
+            sys.exit(1 if errors else 0)
+
+    if g is None:
+        g = Graph()
+        for path in options['<path>']:
+            g.parse(path, format=options['--format'])
+
+    report = validate(
+        g,
+        options['--schema'] or SCHEMA,
+        int(options['--workers']),
+        int(options['--batch'])
+    )
+    for result in report:
+        sys.stdout.write(json.dumps(result, sort_keys=True) + '\n')
+
+    invalid = sum(1 for r in report if not r['valid'])
+    sys.stderr.write('{} nodes checked, {} invalid.\n'.format(len(report), invalid))
+    sys.exit(1 if invalid else 0)
+
+if __name__ == "__main__":
+    main()
@@ -9,13 +9,19 @@ setuptools.setup(
     description='Scripts to convert metadata to and from different formats.',
     entry_points={
         'console_scripts': [
+            'batch_convert = metadata_converters.batch_convert:main',
+            'conversion_server = metadata_converters.conversion_server:main',
+            'fixity_audit = metadata_converters.fixity_audit:main',
+            'graph_diff = metadata_converters.graph_diff:main',
             'marc2dc = metadata_converters.marc2dc:main',
             'marc2edm = metadata_converters.marc2edm:main',
             'marc2opengraph = metadata_converters.marc2opengraph:main',
             'marc2schemadotorg = metadata_converters.marc2schemadotorg:main',
             'marc2twittercard = metadata_converters.marc2twittercard:main',
+            'marc2webmetadata = metadata_converters.marc2webmetadata:main',
             'query_marklogic = metadata_converters.query_marklogic:main',
-            'upload_to_marklogic = metadata_converters.upload_to_marklogic:main'
+            'upload_to_marklogic = metadata_converters.upload_to_marklogic:main',
+            'validate_edm = metadata_converters.validate_edm:main'
         ]
     },
     install_requires=[
@@ -26,7 +32,7 @@ setuptools.setup(
     name='Metadata Converters',
     packages=setuptools.find_packages(),
     package_data={
-        'metadata_converters': ['json/*.json']
+        'metadata_converters': ['json/*.json', 'shex/*.shex']
     },
     url='https://github.com/johnjung/metadata_converters',
     version='0.0.1'
@@ -4,37 +4,49 @@ from metadata_converters import SocSciMapsMarcXmlToDc
 from pymarc import MARCReader
 
 class TestSocSciMapsMarcXmlToDc(unittest.TestCase):
-    def __init__(self, *args, **kwargs):
-        """See specs for this converter at:
-        https://docs.google.com/spreadsheets/d/1Kz1nfTSBjc2PTJ8hrZ--JCBpKV061sdXQxRxVo8VY_Y/edit#gid=0"""
+    """See specs for this converter at:
+    https://docs.google.com/spreadsheets/d/1Kz1nfTSBjc2PTJ8hrZ--JCBpKV061sdXQxRxVo8VY_Y/edit#gid=0"""
 
-        super().__init__(*args, **kwargs)
+    @classmethod
+    def setUpClass(cls):
+        """Read the MARC records once for the whole class, and convert each
+        pair of records only once."""
 
-        self.mrc = {}
+        cls.mrc = {}
         for m in ('11435665', '3451312', '5999566', '7368094', '7368097', '7641168'):
             with open('./test_data/{}.mrc'.format(m), 'rb') as fh:
                 reader = MARCReader(fh)
                 for record in reader:
-                    self.mrc[m] = record
+                    cls.mrc[m] = record
 
-        self.ns = {
+        cls.ns = {
             'bf': 'http://id.loc.gov/ontologies/bibframe/',
             'dc': 'http://purl.org/dc/elements/1.1/',
             'dcterms': 'http://purl.org/dc/terms/',
             'madsrdf': 'http://www.loc.gov/mads/rdf/v1#'
         }
 
+        cls.dc = {}
+
+    def dc_xml(self, digital, print_, noid):
+        """DC for a digital and a print record, as an ElementTree element.
+        Tests only read the element, so it is shared between them."""
+        k = (digital, print_, noid)
+        if k not in self.dc:
+            self.dc[k] = SocSciMapsMarcXmlToDc(
+                self.mrc[digital],
+                self.mrc[print_],
+                noid
+            )._asxml()
+        return self.dc[k]
+
     def test_classification_lcc(self):
         """get bf:ClassificationLcc from 929 $a of linked record
 
            use 7641168.mrc (digital) and 3451312.mrc (print)"""
 
         self.assertEqual(
-            SocSciMapsMarcXmlToDc(
-                self.mrc['7641168'],
-                self.mrc['3451312'],
-                'b2dq0kf6d36z'
-            )._asxml().find('bf:ClassificationLcc', self.ns).text,
+            self.dc_xml('7641168', '3451312', 'b2dq0kf6d36z').find('bf:ClassificationLcc', self.ns).text,
             'G4104.C6:2W9 1920z .U5'
         )
 
@@ -47,11 +59,7 @@ class TestSocSciMapsMarcXmlToDc(unittest.TestCase):
            use 7641168.mrc (digital) and 3451312.mrc (print)"""
 
         self.assertEqual(
-            SocSciMapsMarcXmlToDc(
-                self.mrc['7641168'],
-                self.mrc['3451312'],
-                'b2dq0kf6d36z'
-            )._asxml().find('bf:coordinates', self.ns).text,
+            self.dc_xml('7641168', '3451312', 'b2dq0kf6d36z').find('bf:coordinates', self.ns).text,
             '''$$c(W 87°37'49"-W 87°34'20"/N 41°47'12"-N 41°45'53")'''
         )
 
@@ -61,11 +69,7 @@ class TestSocSciMapsMarcXmlToDc(unittest.TestCase):
            use 7641168.mrc (digital) and 3451312.mrc (print)"""
 
         self.assertEqual(
-            SocSciMapsMarcXmlToDc(
-                self.mrc['7641168'],
-                self.mrc['3451312'],
-                'b2dq0kf6d36z'
-            )._asxml().find('madsrdf:CorporateName', self.ns).text,
+            self.dc_xml('7641168', '3451312', 'b2dq0kf6d36z').find('madsrdf:CorporateName', self.ns).text,
             'University of Chicago. Department of Sociology.'
         )
 
@@ -75,11 +79,7 @@ class TestSocSciMapsMarcXmlToDc(unittest.TestCase):
            use 7641168.mrc (digital) and 3451312.mrc (print)"""
         test_descriptions = set()
 
-        for d in SocSciMapsMarcXmlToDc(
-            self.mrc['7641168'],
-            self.mrc['3451312'],
-            'b2dq0kf6d36z'
-        )._asxml().findall('dc:description', self.ns):
+        for d in self.dc_xml('7641168', '3451312', 'b2dq0kf6d36z').findall('dc:description', self.ns):
             test_descriptions.add(d.text)
 
         self.assertEqual(
@@ -98,11 +98,7 @@ class TestSocSciMapsMarcXmlToDc(unittest.TestCase):
 
         test_formats = set()
 
-        for f in SocSciMapsMarcXmlToDc(
-            self.mrc['7641168'],
-            self.mrc['3451312'],
-            'b2dq0kf6d36z'
-        )._asxml().findall('dc:format', self.ns):
+        for f in self.dc_xml('7641168', '3451312', 'b2dq0kf6d36z').findall('dc:format', self.ns):
             test_formats.add(f.text)
 
         self.assertEqual(
@@ -119,11 +115,7 @@ class TestSocSciMapsMarcXmlToDc(unittest.TestCase):
            use 7641168.mrc (digital) and 3451312.mrc (print)"""
 
         self.assertEqual(
-            SocSciMapsMarcXmlToDc(
-                self.mrc['7641168'],
-                self.mrc['3451312'],
-                'b2dq0kf6d36z'
-            )._asxml().find('dcterms:hasFormat', self.ns).text,
+            self.dc_xml('7641168', '3451312', 'b2dq0kf6d36z').find('dcterms:hasFormat', self.ns).text,
             'Print version'
         )
 
@@ -133,11 +125,7 @@ class TestSocSciMapsMarcXmlToDc(unittest.TestCase):
            use 7641168.mrc (digital) and 3451312.mrc (print)"""
 
         self.assertEqual(
-            SocSciMapsMarcXmlToDc(
-                self.mrc['7641168'],
-                self.mrc['3451312'],
-                'b2dq0kf6d36z'
-            )._asxml().find('dc:identifier', self.ns).text,
+            self.dc_xml('7641168', '3451312', 'b2dq0kf6d36z').find('dc:identifier', self.ns).text,
             'ark:61001/b2dq0kf6d36z'
         )
 
@@ -148,11 +136,7 @@ class TestSocSciMapsMarcXmlToDc(unittest.TestCase):
 
         test_is_part_ofs = set()
 
-        for i in SocSciMapsMarcXmlToDc(
-            self.mrc['11435665'],
-            self.mrc['7368097'],
-            'b2dq0kf6d36z'
-        )._asxml().findall('dcterms:isPartOf', self.ns):
+        for i in self.dc_xml('11435665', '7368097', 'b2dq0kf6d36z').findall('dcterms:isPartOf', self.ns):
             test_is_part_ofs.add(i.text)
 
         self.assertEqual(
@@ -169,11 +153,7 @@ class TestSocSciMapsMarcXmlToDc(unittest.TestCase):
 
            use 7641168.mrc (digital) and 3451312.mrc (print)"""
         self.assertEqual(
-            SocSciMapsMarcXmlToDc(
-                self.mrc['7641168'],
-                self.mrc['3451312'],
-                'b2dq0kf6d36z'
-            )._asxml().find('dcterms:issued', self.ns).text,
+            self.dc_xml('7641168', '3451312', 'b2dq0kf6d36z').find('dcterms:issued', self.ns).text,
             '1920/1929'
         )
 
@@ -183,11 +163,7 @@ class TestSocSciMapsMarcXmlToDc(unittest.TestCase):
            use 7641168.mrc (digital) and 3451312.mrc (print)"""
 
         self.assertEqual(
-            SocSciMapsMarcXmlToDc(
-                self.mrc['7641168'],
-                self.mrc['3451312'],
-                'b2dq0kf6d36z'
-            )._asxml().find('dc:language', self.ns).text,
+            self.dc_xml('7641168', '3451312', 'b2dq0kf6d36z').find('dc:language', self.ns).text,
             'en'
         )
 
@@ -197,11 +173,7 @@ class TestSocSciMapsMarcXmlToDc(unittest.TestCase):
            use 7641168.mrc (digital) and 3451312.mrc (print)"""
 
         self.assertEqual(
-            SocSciMapsMarcXmlToDc(
-                self.mrc['7641168'],
-                self.mrc['3451312'],
-                'b2dq0kf6d36z'
-            )._asxml().find('bf:Local', self.ns).text,
+            self.dc_xml('7641168', '3451312', 'b2dq0kf6d36z').find('bf:Local', self.ns).text,
             'http://pi.lib.uchicago.edu/1001/cat/bib/3451312'
         )
 
@@ -211,11 +183,7 @@ class TestSocSciMapsMarcXmlToDc(unittest.TestCase):
            use 7641168.mrc (digital) and 3451312.mrc (print)"""
 
         self.assertEqual(
-            SocSciMapsMarcXmlToDc(
-                self.mrc['7641168'],
-                self.mrc['3451312'],
-                'b2dq0kf6d36z'
-            )._asxml().find('bf:place', self.ns).text,
+            self.dc_xml('7641168', '3451312', 'b2dq0kf6d36z').find('bf:place', self.ns).text,
             'Chicago'
         )
 
@@ -225,11 +193,7 @@ class TestSocSciMapsMarcXmlToDc(unittest.TestCase):
            use 7641168.mrc (digital) and 3451312.mrc (print)"""
 
         self.assertEqual(
-            SocSciMapsMarcXmlToDc(
-                self.mrc['7641168'],
-                self.mrc['3451312'],
-                'b2dq0kf6d36z'
-            )._asxml().find('dc:publisher', self.ns).text,
+            self.dc_xml('7641168', '3451312', 'b2dq0kf6d36z').find('dc:publisher', self.ns).text,
             'Dept. of Sociology'
         )
 
@@ -238,11 +202,7 @@ class TestSocSciMapsMarcXmlToDc(unittest.TestCase):
 
            use 7641168.mrc (digital) and 3451312.mrc (print)"""
         self.assertEqual(
-            SocSciMapsMarcXmlToDc(
-                self.mrc['7641168'],
-                self.mrc['3451312'],
-                'b2dq0kf6d36z'
-            )._asxml().find('dcterms:accessRights', self.ns).text,
+            self.dc_xml('7641168', '3451312', 'b2dq0kf6d36z').find('dcterms:accessRights', self.ns).text,
             'Digital version available with restrictions Unrestricted online access'
         )
 
@@ -252,11 +212,7 @@ class TestSocSciMapsMarcXmlToDc(unittest.TestCase):
            use 7641168.mrc (digital) and 3451312.mrc (print)"""
 
         self.assertEqual(
-            SocSciMapsMarcXmlToDc(
-                self.mrc['7641168'],
-                self.mrc['3451312'],
-                'b2dq0kf6d36z'
-            )._asxml().find('bf:scale', self.ns).text,
+            self.dc_xml('7641168', '3451312', 'b2dq0kf6d36z').find('bf:scale', self.ns).text,
             'Scale [ca. 1:8,000]'
         )
 
@@ -266,11 +222,7 @@ class TestSocSciMapsMarcXmlToDc(unittest.TestCase):
            use 5999566.mrc (digital) and 7368094.mrc (print)"""
 
         self.assertEqual(
-            SocSciMapsMarcXmlToDc(
-                self.mrc['5999566'],
-                self.mrc['7368094'],
-                'b2dq0kf6d36z'
-            )._asxml().find('dcterms:spatial', self.ns).text,
+            self.dc_xml('5999566', '7368094', 'b2dq0kf6d36z').find('dcterms:spatial', self.ns).text,
             'Illinois -- Chicago'
         )
 
@@ -281,11 +233,7 @@ class TestSocSciMapsMarcXmlToDc(unittest.TestCase):
 
         test_subjects = set()
 
-        for f in SocSciMapsMarcXmlToDc(
-            self.mrc['5999566'],
-            self.mrc['7368094'],
-            'b2dq0kf6d36z'
-        )._asxml().findall('dc:subject', self.ns):
+        for f in self.dc_xml('5999566', '7368094', 'b2dq0kf6d36z').findall('dc:subject', self.ns):
             test_subjects.add(f.text)
 
         self.assertEqual(
@@ -302,11 +250,7 @@ class TestSocSciMapsMarcXmlToDc(unittest.TestCase):
            use 7641168.mrc (digital) and 3451312.mrc (print)"""
 
         self.assertEqual(
-            SocSciMapsMarcXmlToDc(
-                self.mrc['7641168'],
-                self.mrc['3451312'],
-                'b2dq0kf6d36z'
-            )._asxml().find('dc:title', self.ns).text,
+            self.dc_xml('7641168', '3451312', 'b2dq0kf6d36z').find('dc:title', self.ns).text,
             'Woodlawn Community /'
         )
 
@@ -316,11 +260,7 @@ class TestSocSciMapsMarcXmlToDc(unittest.TestCase):
            use 7641168.mrc (digital) and 3451312.mrc (print)"""
 
         self.assertEqual(
-            SocSciMapsMarcXmlToDc(
-                self.mrc['7641168'],
-                self.mrc['3451312'],
-                'b2dq0kf6d36z'
-            )._asxml().find('dc:type', self.ns).text,
+            self.dc_xml('7641168', '3451312', 'b2dq0kf6d36z').find('dc:type', self.ns).text,
             'Maps'
         )
 
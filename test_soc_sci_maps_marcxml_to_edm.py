@@ -7,38 +7,38 @@ from rdflib.namespace import DC, DCTERMS
 
 
 class TestSocSciMapsMarcXmlToEDM(unittest.TestCase):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-        self.mrc = {}
+    @classmethod
+    def setUpClass(cls):
+        """Read and convert the records once for the whole class."""
+        cls.mrc = {}
         for m in ('3451312', '5999566', '7368094', '7641168'):
             with open('./test_data/{}.mrc'.format(m), 'rb') as fh:
                 reader = MARCReader(fh)
                 for record in reader:
-                    self.mrc[m] = record
+                    cls.mrc[m] = record
 
-        self.edm = {}
+        cls.edm = {}
         for d, p in (('7641168', '3451312'), ('5999566', '7368094')):
             k = '{},{}'.format(d, p)
-            self.edm[k] = SocSciMapsMarcXmlToEDM(
-                self.mrc[d],
-                self.mrc[p],
+            cls.edm[k] = SocSciMapsMarcXmlToEDM(
+                cls.mrc[d],
+                cls.mrc[p],
                 d,
                 []
             )
-            self.edm[k].build_item_triples()
+            cls.edm[k].build_item_triples()
 
-        self.agg = {
+        cls.agg = {
             '7641168,3451312': URIRef('ark:61001/aggregation/7641168'),
             '5999566,7368094': URIRef('ark:61001/aggregation/5999566')
         }
 
-        self.cho = {
+        cls.cho = {
             '7641168,3451312': URIRef('ark:61001/7641168'),
             '5999566,7368094': URIRef('ark:61001/5999566')
         }
 
-        self.rem = {
+        cls.rem = {
             '7641168,3451312': URIRef('ark:61001/rem/7641168'),
             '5999566,7368094': URIRef('ark:61001/rem/5999566')
         }